@@ -0,0 +1,92 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import hashlib
+import os
+import pathlib
+from collections.abc import Iterable
+from platform import system as running_system
+
+from r34wrapper.config import Config
+from r34wrapper.containers import Queries
+from r34wrapper.defs import OS_WINDOWS, UTF8
+from r34wrapper.logger import trace
+from r34wrapper.storage import load_pickle, save_pickle
+from r34wrapper.version import APP_NAME, APP_VERSION
+
+__all__ = ('ParseCacheEntry', 'load_parse_cache', 'parse_cache_dir', 'parse_cache_key', 'parse_cache_path', 'save_parse_cache')
+
+PARSE_CACHE_VERSION = 1
+PARSE_CACHE_IDS_LINE_MASK = b'#<ids>\n'
+# Config fields assigned by text parser, restored from cache instead of re-parsing script header
+PARSED_CONFIG_FIELDS = (
+    'title', 'title_increment', 'dest_base', 'dest_bak_base', 'dest_run_base', 'dest_logs_base', 'datesub', 'update',
+    'update_prefetch', 'python', 'update_offsets', 'noproxy_fetches', 'concurrency', 'max_processes', 'process_weights',
+    'query_timeouts', 'stall_timeouts', 'query_retries',
+)
+# Config paths restored from cache, these have to exist
+PARSED_CONFIG_DIR_FIELDS = ('dest_base', 'dest_bak_base', 'dest_run_base', 'dest_logs_base')
+
+
+class ParseCacheEntry:
+    """
+    Parsed script state: queries (without file lines), config fields set by script and locations of id lines
+    (line index, category, downloader), which are the only lines re-parsed on cache hit
+    """
+    def __init__(self, key: str, queries: Queries, ids_lines: list[tuple[int, str, str]]) -> None:
+        self.key = key
+        self.queries = Queries()
+        for slot in Queries.__slots__.difference(Queries.compare_exclude_slots):
+            setattr(self.queries, slot, getattr(queries, slot))
+        self.config = {field: getattr(Config, field) for field in PARSED_CONFIG_FIELDS}
+        self.ids_lines = ids_lines.copy()
+
+
+def parse_cache_dir() -> pathlib.Path:
+    """
+    Parse caches folder within user cache folder. Script's own destination folders can't be used
+    since they are only known after script is parsed
+    """
+    cache_base = os.environ.get('LOCALAPPDATA' if running_system() == OS_WINDOWS else 'XDG_CACHE_HOME')
+    return (pathlib.Path(cache_base) if cache_base else pathlib.Path.home() / '.cache') / APP_NAME / 'parse_cache'
+
+
+def parse_cache_path(script_path: pathlib.Path) -> pathlib.Path:
+    """Parse cache file of script **script_path**, keyed by its full path"""
+    path_hash = hashlib.sha1(script_path.resolve().as_posix().encode(UTF8)).hexdigest()
+    return parse_cache_dir() / f'{script_path.name}_{path_hash[:16]}.parsed'
+
+
+def parse_cache_key(lines: Iterable[str | None]) -> str:
+    """Hash of script **lines** (masked out id lines are None) and of cmdline arguments affecting parsing"""
+    key_hash = hashlib.sha1(
+        f'{PARSE_CACHE_VERSION:d}|{APP_VERSION}|{Config.ignored_args!s}|{Config.extra_args!s}|'
+        f'{Config.install!s}|{Config.no_update!s}|{Config.max_processes:d}|{Config.DEFAULT_PATH.as_posix()}\n'.encode(UTF8),
+    )
+    for line in lines:
+        key_hash.update(PARSE_CACHE_IDS_LINE_MASK if line is None else line.encode(UTF8))
+    return key_hash.hexdigest()
+
+
+def load_parse_cache(path: pathlib.Path, key: str) -> ParseCacheEntry | None:
+    entry = load_pickle(path)
+    if isinstance(entry, ParseCacheEntry) and entry.key == key:
+        return entry
+    return None
+
+
+def save_parse_cache(path: pathlib.Path, entry: ParseCacheEntry) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_pickle(path, entry)
+    except OSError as e:
+        trace(f'Warning: unable to save parse cache to \'{path.as_posix()}\': {e!s}')
+
+#
+#
+#########################################
@@ -15,6 +15,7 @@ from r34wrapper.defs import (
     BOOL_STRS,
     COLOR_LOG_DOWNLOADERS,
     DOWNLOADERS,
+    LOG_LEVEL_DEBUG,
     MAX_CATEGORY_NAME_LENGTH,
     MIN_IDS_SEQ_LENGTH,
     PAGE_DOWNLOADERS,
@@ -27,7 +28,9 @@ from r34wrapper.defs import (
 )
 from r34wrapper.logger import ensure_logfile, trace
 from r34wrapper.strings import all_tags_negative, all_tags_positive, remove_trailing_comments
-from r34wrapper.validators import positive_int, valid_dir_path
+from r34wrapper.validators import positive_int, valid_dir_path, valid_downloaders_dict
+
+from .tag_list import TagList
 
 __all__ = ('ParserJson',)
 
@@ -49,10 +52,10 @@ class ParserJson:
 
     def parse_queries_file(self) -> None:
         args_to_ignore = Config.ignored_args.copy()
-        cur_tags_list: list[str] = []
+        cur_tags_list = TagList()
 
         json_clear = '\n'.join(filter(lambda l: l and not l.startswith('#'),
-                                      (remove_trailing_comments(_.strip(' \n\ufeff')) for _ in self.queries.queries_file_lines)))
+                                      (remove_trailing_comments(line.strip(' \n\ufeff')) for _, line in self.queries.queries_file)))
         try:
             self._json.update(json.loads(json_clear))
         except Exception:
@@ -60,29 +63,48 @@ class ParserJson:
             raise
 
         Config.title = self._json['title']
-        trace(f'Parsed title: \'{Config.title}\'')
+        trace(f'Parsed title: \'{Config.title}\'', level=LOG_LEVEL_DEBUG)
         Config.title_increment = positive_int(self._json['title_increment'])
-        trace(f'Parsed title increment: \'{Config.title_increment}\'')
+        trace(f'Parsed title increment: \'{Config.title_increment}\'', level=LOG_LEVEL_DEBUG)
         Config.dest_base = valid_dir_path(self._json['dest_path'])
-        trace(f'Parsed download dest base: \'{Config.dest_base.as_posix()}\'')
+        trace(f'Parsed download dest base: \'{Config.dest_base.as_posix()}\'', level=LOG_LEVEL_DEBUG)
         Config.dest_bak_base = valid_dir_path(self._json['bak_path'])
-        trace(f'Parsed backup dest base: \'{Config.dest_bak_base.as_posix()}\'')
+        trace(f'Parsed backup dest base: \'{Config.dest_bak_base.as_posix()}\'', level=LOG_LEVEL_DEBUG)
         Config.dest_run_base = valid_dir_path(self._json['run_path'])
-        trace(f'Parsed run dest base: \'{Config.dest_run_base.as_posix()}\'')
+        trace(f'Parsed run dest base: \'{Config.dest_run_base.as_posix()}\'', level=LOG_LEVEL_DEBUG)
         Config.dest_logs_base = valid_dir_path(self._json['log_path'])
-        trace(f'Parsed logs dest base: \'{Config.dest_logs_base.as_posix()}\'')
+        trace(f'Parsed logs dest base: \'{Config.dest_logs_base.as_posix()}\'', level=LOG_LEVEL_DEBUG)
         Config.datesub = BOOL_STRS[self._json['date_sub']]
-        trace(f'Parsed date subfolder flag value: \'{self._json["date_sub"]}\' ({BOOL_STRS[self._json["date_sub"]]!s})')
+        trace(f'Parsed date subfolder flag value: \'{self._json["date_sub"]}\' ({BOOL_STRS[self._json["date_sub"]]!s})',
+              level=LOG_LEVEL_DEBUG)
         Config.update = BOOL_STRS[self._json['update']]
-        trace(f'Parsed update flag value: \'{self._json["update"]}\' ({BOOL_STRS[self._json["update"]]!s})')
+        trace(f'Parsed update flag value: \'{self._json["update"]}\' ({BOOL_STRS[self._json["update"]]!s})', level=LOG_LEVEL_DEBUG)
         Config.update_prefetch = BOOL_STRS[self._json['update_prefetch']]
-        trace(f'Parsed update prefetch flag value: \'{self._json["update_prefetch"]}\' ({BOOL_STRS[self._json["update_prefetch"]]!s})')
+        trace(f'Parsed update prefetch flag value: \'{self._json["update_prefetch"]}\' ({BOOL_STRS[self._json["update_prefetch"]]!s})',
+              level=LOG_LEVEL_DEBUG)
         Config.update_offsets.update({k.lower(): v for k, v in self._json['update_offsets'].items()})
-        trace(f'Parsed update offsets value: \'{Config.update_offsets!s}\'')
+        trace(f'Parsed update offsets value: \'{Config.update_offsets!s}\'', level=LOG_LEVEL_DEBUG)
         Config.noproxy_fetches.update(self._json['noproxy_fetches'])
-        trace(f'Parsed noproxy fetches value: \'{Config.noproxy_fetches!s}\'')
+        trace(f'Parsed noproxy fetches value: \'{Config.noproxy_fetches!s}\'', level=LOG_LEVEL_DEBUG)
         Config.python = self._json['python']
-        trace(f'Parsed python executable: \'{Config.python}\'')
+        trace(f'Parsed python executable: \'{Config.python}\'', level=LOG_LEVEL_DEBUG)
+        Config.concurrency.update({k.lower(): v for k, v in self._json.get('concurrency', {}).items()})
+        trace(f'Parsed concurrency value: \'{Config.concurrency!s}\'', level=LOG_LEVEL_DEBUG)
+        if 'max_processes' in self._json:
+            trace(f'Parsed max processes value: \'{self._json["max_processes"]}\'', level=LOG_LEVEL_DEBUG)
+            if Config.max_processes:
+                trace(f'MAX PROCESSES VALUE IS IGNORED DUE TO max_processes CMD ARGUMENT ({Config.max_processes:d})')
+            else:
+                Config.max_processes = positive_int(self._json['max_processes'])
+        Config.process_weights.update({k.lower(): v for k, v in self._json.get('process_weights', {}).items()})
+        trace(f'Parsed process weights value: \'{Config.process_weights!s}\'', level=LOG_LEVEL_DEBUG)
+        Config.query_timeouts.update({k.lower(): v for k, v in self._json.get('query_timeouts', {}).items()})
+        trace(f'Parsed query timeouts value: \'{Config.query_timeouts!s}\'', level=LOG_LEVEL_DEBUG)
+        Config.stall_timeouts.update({k.lower(): v for k, v in self._json.get('stall_timeouts', {}).items()})
+        trace(f'Parsed stall timeouts value: \'{Config.stall_timeouts!s}\'', level=LOG_LEVEL_DEBUG)
+        if 'query_retries' in self._json:
+            Config.query_retries = positive_int(self._json['query_retries'])
+            trace(f'Parsed query retries value: \'{Config.query_retries:d}\'', level=LOG_LEVEL_DEBUG)
 
         ensure_logfile()
 
@@ -107,6 +129,10 @@ class ParserJson:
                     invalid_dts.append(npdt)
                     trace(f'Error: inavlid downloader type: \'{npdt}\'')
             assert not invalid_dts, f'Invalid update offsets value: {self._json["noproxy_fetches"]!s}'
+        valid_downloaders_dict(Config.concurrency, 'concurrency', lb=1)
+        valid_downloaders_dict(Config.process_weights, 'process weight', lb=1)
+        valid_downloaders_dict(Config.query_timeouts, 'query timeout', lb=1)
+        valid_downloaders_dict(Config.stall_timeouts, 'stall timeout', lb=1)
 
         compose: dict[str, dict[str, dict[str, str | list[str] | list[dict[str, list[str]]] | None]]] = self._json['compose']
 
@@ -227,46 +253,20 @@ class ParserJson:
                         if all_tags_negative(stage.split(' ')):  # line[0] === '-'
                             if stage[1] in '-+':
                                 # remove --tag(s) or -+tag(s) from list, convert: --a --b -> [-a, -b] OR -+a -+b -> [a, b]
-                                tags_to_remove = [tag[2 if tag[1] == '+' else 1:] for tag in stage.split(' ')]
-                                for k in reversed(range(len(tags_to_remove))):
-                                    for j in reversed(range(len(cur_tags_list))):
-                                        if cur_tags_list[j] == tags_to_remove[k]:
-                                            del cur_tags_list[j]
-                                            del tags_to_remove[k]
-                                            break
+                                tags_to_remove = cur_tags_list.remove_tags([tag[2 if tag[1] == '+' else 1:] for tag in stage.split(' ')])
                                 assert len(tags_to_remove) == 0, (f'Tags not consumed: "{" ".join(tags_to_remove)}" '
                                                                   f'in {cat}:{cdt} sub \'{sub_name}\' at offset {i:d}')
                                 continue
                             else:
                                 tags_split = [tag[1:] for tag in stage.split(' ')]
-                                split_len = len(tags_split)
                                 assert all(bool(_) for _ in tags_split), (f'Invalid tag string \'{stage}\' '
                                                                           f'in {cat}:{cdt} sub \'{sub_name}\' at offset {i:d}')
-                                need_find_previous_or_group = True
-                                tags_rem = '~'.join(tags_split)
-                                tags_search = ','.join(tags_split)
-                                start_idx = 1 if split_len > 1 else 0
-                                end_idx = -1 if split_len > 1 else None
-                                j: int
-                                for j in reversed(range(len(cur_tags_list))):
-                                    cur_tag = cur_tags_list[j]
-                                    prev_tag = cur_tags_list[j - 1] if j > 0 else ''
-                                    try_match_search = j > 0 and prev_tag.startswith('-search')
-                                    if try_match_search and cur_tag == tags_search:
-                                        del cur_tags_list[j]
-                                        del cur_tags_list[j - 1]
-                                        need_find_previous_or_group = False
-                                        if prev_tag == '-search' or prev_tag.startswith('-search_rule'):
-                                            need_append = False
-                                        break
-                                    try_match_rem = split_len == 1 or cur_tag[::max(len(cur_tag) - 1, 1)] == '()'
-                                    if try_match_rem and cur_tag[start_idx:end_idx] == tags_rem:
-                                        del cur_tags_list[j]
-                                        need_find_previous_or_group = False
-                                        break
-                                if need_find_previous_or_group is True:
+                                excluded_search_arg = cur_tags_list.exclude(tags_split)
+                                if excluded_search_arg is None:
                                     trace(f'Info: exclusion(s): no previous matching tag or \'or\' group found '
                                           f'in {cat}:{cdt} sub \'{sub_name}\' at offset {i:d}: {stage}')
+                                elif excluded_search_arg == '-search' or excluded_search_arg.startswith('-search_rule'):
+                                    need_append = False
                         elif not all_tags_positive(stage.split(' ')):
                             param_like = stage[0] == '-' and len(stage.split(' ')) == 2
                             if not (param_like and (stage.startswith(('-search', '-quality')))):
@@ -274,7 +274,7 @@ class ParserJson:
                                       f'{"param" if param_like else "error"}? Line: \'{stage}\'')
                         if need_append:
                             cur_tags_list.extend(stage.split(' '))
-                    self.queries.sequences_tags.at_cur_cat[cdt].append(cur_tags_list.copy())
+                    self.queries.sequences_tags.at_cur_cat[cdt].append(cur_tags_list.to_list())
                 for extra_args in Config.extra_args:
                     if extra_args.is_for(cat, cdt):
                         trace(f'Using \'{cat}:{cdt}\' extra args: {extra_args.args!s} -> {" ".join(extra_args.args)}')
@@ -6,16 +6,20 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 #
 #
 
+from __future__ import annotations
+
 import json
 import pathlib
 import re
+from collections.abc import Callable, Iterator
 
-from r34wrapper.config import Config
-from r34wrapper.containers import Queries
+from r34wrapper.config import Config, IgnoredArg
+from r34wrapper.containers import DownloadCollection, Queries
 from r34wrapper.defs import (
     BOOL_STRS,
     COLOR_LOG_DOWNLOADERS,
     DOWNLOADERS,
+    LOG_LEVEL_DEBUG,
     MAX_CATEGORY_NAME_LENGTH,
     MIN_IDS_SEQ_LENGTH,
     PAGE_DOWNLOADERS,
@@ -30,7 +34,17 @@ from r34wrapper.defs import (
 from r34wrapper.logger import ensure_logfile, trace
 from r34wrapper.strings import all_tags_negative, all_tags_positive, remove_trailing_comments
 from r34wrapper.util import assert_notnull
-from r34wrapper.validators import positive_int, valid_dir_path
+from r34wrapper.validators import positive_int, valid_dir_path, valid_downloaders_dict
+
+from .parse_cache import (
+    PARSED_CONFIG_DIR_FIELDS,
+    ParseCacheEntry,
+    load_parse_cache,
+    parse_cache_key,
+    parse_cache_path,
+    save_parse_cache,
+)
+from .tag_list import TagList
 
 re_title = re.compile(r'^### TITLE:[A-zÀ-ʯА-я\d_+\-!]{,20}$')
 re_title_incr = re.compile(r'^### TITLEINCREMENT:\d$')
@@ -43,6 +57,12 @@ re_update = re.compile(r'^### UPDATE:.+?$')
 re_update_prefetch = re.compile(r'^### UPDATE_PREFETCH:.+?$')
 re_update_offsets = re.compile(r'^### UPDATE_OFFSETS:.+?$')
 re_noproxy_fetches = re.compile(r'^### NOPROXY_FETCHES:.+?$')
+re_concurrency = re.compile(r'^### CONCURRENCY:.+?$')
+re_max_processes = re.compile(r'^### MAX_PROCESSES:\d+$')
+re_process_weights = re.compile(r'^### PROCESS_WEIGHTS:.+?$')
+re_query_timeouts = re.compile(r'^### QUERY_TIMEOUTS:.+?$')
+re_stall_timeouts = re.compile(r'^### STALL_TIMEOUTS:.+?$')
+re_query_retries = re.compile(r'^### QUERY_RETRIES:\d+$')
 re_category = re.compile(r'^### \(([A-zÀ-ʯА-я\d_+\-! ]+)\) ###$')
 re_comment = re.compile(r'^##[^#].*?$')
 re_python_exec = re.compile(r'^### PYTHON:.+?$')
@@ -55,9 +75,43 @@ re_sub_begin = re.compile(r'^# sub:[^ ].*?$')
 re_sub_end = re.compile(r'^# send$')
 re_downloader_finalize = re.compile(r'^# end$')
 
+# '# <keyword>...' -> the only pattern line can match
+ARG_LINE_PATTERNS: dict[str, re.Pattern[str]] = {
+    **dict.fromkeys(DOWNLOADERS, re_downloader_type),
+    **{dt.upper(): re_downloader_type for dt in DOWNLOADERS},
+    'downloader:': re_downloader_basepath,
+    'common:': re_common_arg,
+    'sub:': re_sub_begin,
+    'send': re_sub_end,
+    'end': re_downloader_finalize,
+}
+
 __all__ = ('ParserText',)
 
 
+def arg_line_pattern(line: str) -> re.Pattern[str] | None:
+    """Select pattern for '# ...' **line** by its first token instead of trying all of them in turn"""
+    if line[1:2] != ' ':
+        return None
+    space_idx = line.find(' ', 2)
+    token = line[2:space_idx] if space_idx > 0 else line[2:]
+    if not token:
+        return None
+    keyword, colon, _ = token.partition(':')
+    line_pattern = ARG_LINE_PATTERNS.get(f'{keyword}{colon}')
+    if line_pattern:
+        return line_pattern
+    if token[0].isdigit() or token[0] == '-':
+        return re_ids_list
+    if token[0] == 'p':
+        return re_pages_list
+    return None
+
+
+def ignored_args_pattern(ignored_args: list[IgnoredArg]) -> re.Pattern[str] | None:
+    return re.compile('|'.join(re.escape(ignored_arg.name) for ignored_arg in ignored_args)) if ignored_args else None
+
+
 class ParserText:
     def __init__(self) -> None:
         self.queries: Queries = Queries()
@@ -72,7 +126,225 @@ class ParserText:
             assert len(pargs) > proxy_idx + 1, f'No {ct}:{dl} proxy argument found after \'-proxy\' argument'
             self.queries.proxies_update[dl] = StrPair(pargs[proxy_idx], pargs[proxy_idx + 1])
 
+    def _parse_title(self, title_base: str) -> None:
+        trace(f'Parsed title: \'{title_base}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.title, 'Title can only be declared once!'
+        Config.title = title_base
+
+    def _parse_title_increment(self, title_incr_base: str) -> None:
+        trace(f'Parsed title increment: \'{title_incr_base}\'', level=LOG_LEVEL_DEBUG)
+        assert Config.title_increment == 0, 'Title increment can only be declared once!'
+        Config.title_increment = positive_int(title_incr_base)
+
+    def _parse_dest_base(self, dest_base: str) -> None:
+        trace(f'Parsed download dest base: \'{dest_base}\'', level=LOG_LEVEL_DEBUG)
+        assert Config.dest_base == Config.DEFAULT_PATH, f'Destination re-declaration! Was \'{Config.dest_base.as_posix()}\''
+        Config.dest_base = valid_dir_path(dest_base)
+
+    def _parse_dest_bak(self, dest_bak: str) -> None:
+        trace(f'Parsed backup dest base: \'{dest_bak}\'', level=LOG_LEVEL_DEBUG)
+        assert Config.dest_bak_base == Config.DEFAULT_PATH, f'Backup path re-declaration! Was \'{Config.dest_bak_base.as_posix()}\''
+        Config.dest_bak_base = valid_dir_path(dest_bak)
+
+    def _parse_dest_run(self, dest_run: str) -> None:
+        trace(f'Parsed run dest base: \'{dest_run}\'', level=LOG_LEVEL_DEBUG)
+        assert Config.dest_run_base == Config.DEFAULT_PATH, f'Run path re-declaration! Was \'{Config.dest_run_base.as_posix()}\''
+        Config.dest_run_base = valid_dir_path(dest_run)
+
+    def _parse_dest_log(self, dest_log: str) -> None:
+        trace(f'Parsed logs dest base: \'{dest_log}\'', level=LOG_LEVEL_DEBUG)
+        assert Config.dest_logs_base == Config.DEFAULT_PATH, f'Logs path re-declaration! Was \'{Config.dest_logs_base.as_posix()}\''
+        Config.dest_logs_base = valid_dir_path(dest_log)
+
+    def _parse_datesub(self, datesub_str: str) -> None:
+        trace(f'Parsed date subfolder flag value: \'{datesub_str}\' ({BOOL_STRS[datesub_str]!s})', level=LOG_LEVEL_DEBUG)
+        Config.datesub = BOOL_STRS[datesub_str]
+
+    def _parse_update(self, update_str: str) -> None:
+        trace(f'Parsed update flag value: \'{update_str}\' ({BOOL_STRS[update_str]!s})', level=LOG_LEVEL_DEBUG)
+        if Config.no_update:
+            trace('UPDATE FLAG IS IGNORED DUE TO no_update FLAG')
+            assert Config.update is False
+        else:
+            Config.update = BOOL_STRS[update_str]
+
+    def _parse_update_prefetch(self, update_prefetch_str: str) -> None:
+        trace(f'Parsed update prefetch flag value: \'{update_prefetch_str}\' ({BOOL_STRS[update_prefetch_str]!s})', level=LOG_LEVEL_DEBUG)
+        Config.update_prefetch = BOOL_STRS[update_prefetch_str]
+
+    def _parse_python(self, python_str: str) -> None:
+        trace(f'Parsed python executable: \'{python_str}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.python, 'Python executable must be declared exactly once!'
+        Config.python = python_str
+
+    def _parse_update_offsets(self, offsets_str: str) -> None:
+        trace(f'Parsed update offsets value: \'{offsets_str}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.update_offsets, f'Update offsets re-declaration! Was \'{Config.update_offsets!s}\''
+        Config.update_offsets = json.loads(offsets_str.lower())
+        invalid_dts: list[str] = []
+        for pdt in Config.update_offsets:
+            if pdt not in DOWNLOADERS:
+                invalid_dts.append(pdt)
+                trace(f'Error: inavlid downloader type: \'{pdt}\'')
+            try:
+                int(Config.update_offsets[pdt])
+            except ValueError:
+                invalid_dts.append(pdt)
+                trace(f'Error: invalid {pdt} offset int value: \'{Config.update_offsets[pdt]!s}\'')
+        assert not invalid_dts, f'Invalid update offsets value: {offsets_str}'
+
+    def _parse_noproxy_fetches(self, modules_str: str) -> None:
+        trace(f'Parsed noproxy fetches value: \'{modules_str}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.noproxy_fetches, f'Noproxy fetches re-declaration! Was \'{Config.noproxy_fetches!s}\''
+        Config.noproxy_fetches = set(json.loads(modules_str.lower()))
+        invalid_dts: list[str] = []
+        for npdt in Config.noproxy_fetches:
+            if npdt not in DOWNLOADERS:
+                invalid_dts.append(npdt)
+                trace(f'Error: inavlid downloader type: \'{npdt}\'')
+        assert not invalid_dts, f'Invalid update offsets value: {modules_str}'
+
+    def _parse_concurrency(self, concurrency_str: str) -> None:
+        trace(f'Parsed concurrency value: \'{concurrency_str}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.concurrency, f'Concurrency re-declaration! Was \'{Config.concurrency!s}\''
+        Config.concurrency = valid_downloaders_dict(json.loads(concurrency_str.lower()), 'concurrency', lb=1)
+
+    def _parse_max_processes(self, max_processes_str: str) -> None:
+        trace(f'Parsed max processes value: \'{max_processes_str}\'', level=LOG_LEVEL_DEBUG)
+        if Config.max_processes:
+            trace(f'MAX PROCESSES VALUE IS IGNORED DUE TO max_processes CMD ARGUMENT ({Config.max_processes:d})')
+        else:
+            Config.max_processes = positive_int(max_processes_str)
+
+    def _parse_process_weights(self, weights_str: str) -> None:
+        trace(f'Parsed process weights value: \'{weights_str}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.process_weights, f'Process weights re-declaration! Was \'{Config.process_weights!s}\''
+        Config.process_weights = valid_downloaders_dict(json.loads(weights_str.lower()), 'process weight', lb=1)
+
+    def _parse_query_timeouts(self, timeouts_str: str) -> None:
+        trace(f'Parsed query timeouts value: \'{timeouts_str}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.query_timeouts, f'Query timeouts re-declaration! Was \'{Config.query_timeouts!s}\''
+        Config.query_timeouts = valid_downloaders_dict(json.loads(timeouts_str.lower()), 'query timeout', lb=1)
+
+    def _parse_stall_timeouts(self, timeouts_str: str) -> None:
+        trace(f'Parsed stall timeouts value: \'{timeouts_str}\'', level=LOG_LEVEL_DEBUG)
+        assert not Config.stall_timeouts, f'Stall timeouts re-declaration! Was \'{Config.stall_timeouts!s}\''
+        Config.stall_timeouts = valid_downloaders_dict(json.loads(timeouts_str.lower()), 'stall timeout', lb=1)
+
+    def _parse_query_retries(self, retries_str: str) -> None:
+        trace(f'Parsed query retries value: \'{retries_str}\'', level=LOG_LEVEL_DEBUG)
+        Config.query_retries = positive_int(retries_str)
+
+    # '### <KEYWORD>:<value>' -> (line validator, value parser)
+    _header_parsers: dict[str, tuple[re.Pattern[str], Callable[[ParserText, str], None]]] = {
+        'TITLE': (re_title, _parse_title),
+        'TITLEINCREMENT': (re_title_incr, _parse_title_increment),
+        'DESTPATH': (re_dest_base, _parse_dest_base),
+        'BAKPATH': (re_dest_bak, _parse_dest_bak),
+        'RUNPATH': (re_dest_run, _parse_dest_run),
+        'LOGPATH': (re_dest_log, _parse_dest_log),
+        'DATESUB': (re_datesub, _parse_datesub),
+        'UPDATE': (re_update, _parse_update),
+        'UPDATE_PREFETCH': (re_update_prefetch, _parse_update_prefetch),
+        'PYTHON': (re_python_exec, _parse_python),
+        'UPDATE_OFFSETS': (re_update_offsets, _parse_update_offsets),
+        'NOPROXY_FETCHES': (re_noproxy_fetches, _parse_noproxy_fetches),
+        'CONCURRENCY': (re_concurrency, _parse_concurrency),
+        'MAX_PROCESSES': (re_max_processes, _parse_max_processes),
+        'PROCESS_WEIGHTS': (re_process_weights, _parse_process_weights),
+        'QUERY_TIMEOUTS': (re_query_timeouts, _parse_query_timeouts),
+        'STALL_TIMEOUTS': (re_stall_timeouts, _parse_stall_timeouts),
+        'QUERY_RETRIES': (re_query_retries, _parse_query_retries),
+    }
+
+    @staticmethod
+    def parse_ids_line(queries: Queries, line: str, i: int, offset: int, cat: str, cdt: str) -> None:
+        idseq_i = IntSequence([int(num) for num in line.split(' ')[1:]], i + 1, offset)
+        for ids_override in Config.override_ids:
+            if ids_override.name == f'{cat}:{cdt}':
+                idseq_temp = IntSequence(ids_override.ids, i + 1)
+                trace(f'Using \'{cat}:{cdt}\' ids override: {idseq_i!s} -> {idseq_temp!s}')
+                idseq_i.ints[:] = idseq_temp.ints[:]
+        if queries.sequences_pages[cat][cdt]:
+            assert len(idseq_i) <= 2, (f'{cdt} has pages but defines ids range of '
+                                       f'{len(idseq_i):d} > 2!\n\tat line {i + 1:d}: {line}')
+        queries.sequences_ids[cat][cdt] = idseq_i
+        if len(idseq_i) < MIN_IDS_SEQ_LENGTH:
+            if cdt in Config.downloaders:
+                negative_str = ' NEGATIVE' if idseq_i[0] < 0 else ''
+                trace(f'{cdt} at line {i + 1:d} provides a single{negative_str} id hence requires maxid autoupdate')
+                if cat not in queries.autoupdate_seqs:
+                    queries.autoupdate_seqs.add_category(cat)
+                queries.autoupdate_seqs[cat][cdt] = idseq_i
+            else:
+                idseq_i.ints.append(2**31 - 1)
+
     def parse_queries_file(self) -> None:
+        if Config.test:
+            self.parse_lines()
+        else:
+            self.parse_queries_file_cached(parse_cache_path(Config.script_path))
+
+    def parse_queries_file_cached(self, cache_path: pathlib.Path) -> None:
+        """
+        Parse using cache of previously parsed script. Cache is valid as long as script (apart from id lines) and
+        parsing-related cmdline arguments are unchanged, id lines are always parsed. Falls back to full parse on any mismatch
+        """
+        ids_line_texts: dict[int, tuple[int, str]] = {}
+
+        def masked_lines() -> Iterator[str | None]:
+            for i, (offset, line) in enumerate(self.queries.queries_file):
+                ids_line = remove_trailing_comments(line.strip(' \n\ufeff'))
+                if re_ids_list.fullmatch(ids_line):
+                    ids_line_texts[i] = (offset, ids_line)
+                    yield None
+                else:
+                    yield line
+
+        cache_key = parse_cache_key(masked_lines())
+        if self.apply_parse_cache(load_parse_cache(cache_path, cache_key), ids_line_texts):
+            return
+        ids_lines = self.parse_lines()
+        if {ids_line[0] for ids_line in ids_lines} == ids_line_texts.keys():
+            save_parse_cache(cache_path, ParseCacheEntry(cache_key, self.queries, ids_lines))
+
+    def apply_parse_cache(self, entry: ParseCacheEntry | None, ids_line_texts: dict[int, tuple[int, str]]) -> bool:
+        if not entry:
+            return False
+        queries = entry.queries
+        queries.autoupdate_seqs = DownloadCollection()
+        try:
+            for i, cat, cdt in entry.ids_lines:
+                self.parse_ids_line(queries, ids_line_texts[i][1], i, ids_line_texts[i][0], cat, cdt)
+            for field in PARSED_CONFIG_DIR_FIELDS:
+                try:
+                    entry.config[field] = valid_dir_path(entry.config[field].as_posix())
+                except Exception:
+                    raise OSError(f'{field} \'{entry.config[field].as_posix()}\' is not a directory')
+            # same checks as full parse does for downloader lines
+            if Config.test is False:
+                for cat in queries.sequences_paths:
+                    for cdt, path_downloader in queries.sequences_paths[cat].items():
+                        if path_downloader and not pathlib.Path(path_downloader).is_dir():
+                            raise OSError(f'{cat}:{cdt} downloader path \'{path_downloader}\' doesn\'t exist')
+                if Config.install:
+                    for cdt, path_reqs in queries.sequences_paths_reqs.items():
+                        if path_reqs and not pathlib.Path(path_reqs).is_file():
+                            raise OSError(f'{cdt} reqs file \'{path_reqs}\' doesn\'t exist')
+        except Exception as e:
+            trace(f'Warning: cached script state is invalid ({e!s}), parsing from scratch...')
+            return False
+        for slot in Queries.__slots__.difference(Queries.compare_exclude_slots):
+            setattr(self.queries, slot, getattr(queries, slot))
+        for field, value in entry.config.items():
+            setattr(Config, field, value)
+        trace(f'Parsed script state loaded from cache, {len(entry.ids_lines):d} id line(s) parsed')
+        if self.queries.sequences_paths:
+            ensure_logfile()
+        return True
+
+    def parse_lines(self) -> list[tuple[int, str, str]]:
+        """Full parse of queries file lines. Returns locations of parsed id lines: (line index, category, downloader)"""
         def cur_ct() -> str:
             try:
                 return assert_notnull(cur_cat)
@@ -88,108 +360,21 @@ class ParserText:
                 raise
 
         args_to_ignore = Config.ignored_args.copy()
+        re_ignored = ignored_args_pattern(args_to_ignore)
         cur_cat = cur_dwn = ''
-        cur_tags_list: list[str] = []
+        cur_tags_list = TagList()
+        ids_lines: list[tuple[int, str, str]] = []
 
-        for i, line in enumerate(self.queries.queries_file_lines):
+        for i, (offset, line) in enumerate(self.queries.queries_file):
             try:
                 line = line.strip(' \n\ufeff')  # remove BOM too
                 if not line:
                     continue
                 if line.startswith('###'):
-                    if re_title.fullmatch(line):
-                        title_base = line[line.find(':') + 1:]
-                        trace(f'Parsed title: \'{title_base}\'')
-                        assert not Config.title, 'Title can only be declared once!'
-                        Config.title = title_base
-                        continue
-                    if re_title_incr.fullmatch(line):
-                        title_incr_base = line[line.find(':') + 1:]
-                        trace(f'Parsed title increment: \'{title_incr_base}\'')
-                        assert Config.title_increment == 0, 'Title increment can only be declared once!'
-                        Config.title_increment = positive_int(title_incr_base)
-                        continue
-                    if re_dest_base.fullmatch(line):
-                        dest_base = line[line.find(':') + 1:]
-                        trace(f'Parsed download dest base: \'{dest_base}\'')
-                        assert Config.dest_base == Config.DEFAULT_PATH, (
-                            f'Destination re-declaration! Was \'{Config.dest_base.as_posix()}\'')
-                        Config.dest_base = valid_dir_path(dest_base)
-                        continue
-                    if re_dest_bak.fullmatch(line):
-                        dest_bak = line[line.find(':') + 1:]
-                        trace(f'Parsed backup dest base: \'{dest_bak}\'')
-                        assert Config.dest_bak_base == Config.DEFAULT_PATH, (
-                            f'Backup path re-declaration! Was \'{Config.dest_bak_base.as_posix()}\'')
-                        Config.dest_bak_base = valid_dir_path(dest_bak)
-                        continue
-                    if re_dest_run.fullmatch(line):
-                        dest_run = line[line.find(':') + 1:]
-                        trace(f'Parsed run dest base: \'{dest_run}\'')
-                        assert Config.dest_run_base == Config.DEFAULT_PATH, (
-                            f'Run path re-declaration! Was \'{Config.dest_run_base.as_posix()}\'')
-                        Config.dest_run_base = valid_dir_path(dest_run)
-                        continue
-                    if re_dest_log.fullmatch(line):
-                        dest_log = line[line.find(':') + 1:]
-                        trace(f'Parsed logs dest base: \'{dest_log}\'')
-                        assert Config.dest_logs_base == Config.DEFAULT_PATH, (
-                            f'Logs path re-declaration! Was \'{Config.dest_logs_base.as_posix()}\'')
-                        Config.dest_logs_base = valid_dir_path(dest_log)
-                        continue
-                    if re_datesub.fullmatch(line):
-                        datesub_str = line[line.find(':') + 1:]
-                        trace(f'Parsed date subfolder flag value: \'{datesub_str}\' ({BOOL_STRS[datesub_str]!s})')
-                        Config.datesub = BOOL_STRS[datesub_str]
-                        continue
-                    if re_update.fullmatch(line):
-                        update_str = line[line.find(':') + 1:]
-                        trace(f'Parsed update flag value: \'{update_str}\' ({BOOL_STRS[update_str]!s})')
-                        if Config.no_update:
-                            trace('UPDATE FLAG IS IGNORED DUE TO no_update FLAG')
-                            assert Config.update is False
-                        else:
-                            Config.update = BOOL_STRS[update_str]
-                        continue
-                    if re_update_prefetch.fullmatch(line):
-                        update_prefetch_str = line[line.find(':') + 1:]
-                        trace(f'Parsed update prefetch flag value: \'{update_prefetch_str}\' ({BOOL_STRS[update_prefetch_str]!s})')
-                        Config.update_prefetch = BOOL_STRS[update_prefetch_str]
-                        continue
-                    if re_python_exec.fullmatch(line):
-                        python_str = line[line.find(':') + 1:]
-                        trace(f'Parsed python executable: \'{python_str}\'')
-                        assert not Config.python, 'Python executable must be declared exactly once!'
-                        Config.python = python_str
-                        continue
-                    if re_update_offsets.fullmatch(line):
-                        offsets_str = line[line.find(':') + 1:]
-                        trace(f'Parsed update offsets value: \'{offsets_str}\'')
-                        assert not Config.update_offsets, f'Update offsets re-declaration! Was \'{Config.update_offsets!s}\''
-                        Config.update_offsets = json.loads(offsets_str.lower())
-                        invalid_dts: list[str] = []
-                        for pdt in Config.update_offsets:
-                            if pdt not in DOWNLOADERS:
-                                invalid_dts.append(pdt)
-                                trace(f'Error: inavlid downloader type: \'{pdt}\'')
-                            try:
-                                int(Config.update_offsets[pdt])
-                            except ValueError:
-                                invalid_dts.append(pdt)
-                                trace(f'Error: invalid {pdt} offset int value: \'{Config.update_offsets[pdt]!s}\'')
-                        assert not invalid_dts, f'Invalid update offsets value: {offsets_str}'
-                        continue
-                    if re_noproxy_fetches.fullmatch(line):
-                        modules_str = line[line.find(':') + 1:]
-                        trace(f'Parsed noproxy fetches value: \'{modules_str}\'')
-                        assert not Config.noproxy_fetches, f'Noproxy fetches re-declaration! Was \'{Config.noproxy_fetches!s}\''
-                        Config.noproxy_fetches = set(json.loads(modules_str.lower()))
-                        invalid_dts: list[str] = []
-                        for npdt in Config.noproxy_fetches:
-                            if npdt not in DOWNLOADERS:
-                                invalid_dts.append(npdt)
-                                trace(f'Error: inavlid downloader type: \'{npdt}\'')
-                        assert not invalid_dts, f'Invalid update offsets value: {modules_str}'
+                    colon_idx = line.find(':')
+                    header_parser = self._header_parsers.get(line[4:colon_idx]) if colon_idx > 4 else None
+                    if header_parser and header_parser[0].fullmatch(line):
+                        header_parser[1](self, line[colon_idx + 1:])
                         continue
                     ensure_logfile()
                     cat_match = re_category.fullmatch(line)
@@ -218,63 +403,50 @@ class ParserText:
                 if line.startswith('#'):
                     if re_comment.fullmatch(line):
                         continue
-                    ignored_idx: int
-                    for ignored_idx in reversed(range(len(args_to_ignore))):
-                        ignored_arg = args_to_ignore[ignored_idx]
-                        start_idx = line.find(ignored_arg.name, line.find(':') + 1)
-                        if start_idx > 0 and line[start_idx - 1] == '-':
-                            start_idx -= 1
-                            while start_idx and line[start_idx - 1] == '-':
+                    if re_ignored and re_ignored.search(line, line.find(':') + 1):
+                        ignored_idx: int
+                        for ignored_idx in reversed(range(len(args_to_ignore))):
+                            ignored_arg = args_to_ignore[ignored_idx]
+                            start_idx = line.find(ignored_arg.name, line.find(':') + 1)
+                            if start_idx > 0 and line[start_idx - 1] == '-':
                                 start_idx -= 1
-                            end_idx = start_idx + len(ignored_arg.name)
-                            num_to_skip: int
-                            for num_to_skip in reversed(range(ignored_arg.len)):
-                                end_idx = line.find(' ', end_idx) + 1
-                                if end_idx == 0:
+                                while start_idx and line[start_idx - 1] == '-':
+                                    start_idx -= 1
+                                end_idx = start_idx + len(ignored_arg.name)
+                                num_to_skip: int
+                                for num_to_skip in reversed(range(ignored_arg.len)):
+                                    end_idx = line.find(' ', end_idx) + 1
+                                    if end_idx == 0:
+                                        if num_to_skip == 0:
+                                            end_idx = len(line)
+                                        else:
+                                            break
                                     if num_to_skip == 0:
-                                        end_idx = len(line)
-                                    else:
-                                        break
-                                if num_to_skip == 0:
-                                    # remove ignored arg(s) and consume ignored arg from config
-                                    new_line = f'{line[:start_idx]}{line[min(end_idx, len(line)):]}'
-                                    trace(f'Info: ignoring argument \'{ignored_arg!s}\' found at line {i + 1:d}:\n  \'{line}\' -->'
-                                          f'\n  {" " * start_idx}^{" " * (end_idx - start_idx)}^\n  {new_line}')
-                                    line = new_line
-                                    del args_to_ignore[ignored_idx]
+                                        # remove ignored arg(s) and consume ignored arg from config
+                                        new_line = f'{line[:start_idx]}{line[min(end_idx, len(line)):]}'
+                                        trace(f'Info: ignoring argument \'{ignored_arg!s}\' found at line {i + 1:d}:\n  \'{line}\' -->'
+                                              f'\n  {" " * start_idx}^{" " * (end_idx - start_idx)}^\n  {new_line}')
+                                        line = new_line
+                                        del args_to_ignore[ignored_idx]
+                        re_ignored = ignored_args_pattern(args_to_ignore)
                     if not line or line.endswith(':'):
                         trace(f'Ignoring remnants of now consumed line {i + 1:d}: \'{line}\'')
                         continue
-                    if re_downloader_type.fullmatch(line):
+                    line_pattern = arg_line_pattern(line)
+                    if line_pattern is None or not line_pattern.fullmatch(line):
+                        trace(f'Error: unknown param at line {i + 1:d}!')
+                        raise OSError
+                    if line_pattern is re_downloader_type:
                         assert not cur_tags_list, f'at line {i + 1:d}: unclosed previous downloader section \'{cur_dl()}\'!'
                         cur_dwn = line.split(' ')[1].lower()
                         assert cur_dl() in DOWNLOADERS, f'at line {i + 1:d}: unknown downloader \'{cur_dl()}\'!'
                         trace(f'Processing \'{cur_dl().upper()}\' arguments...')
                         if cur_dl() in COLOR_LOG_DOWNLOADERS:
                             self.queries.sequences_common.at_cur_cat[cur_dl()].append('--disable-log-colors')
-                    elif re_ids_list.fullmatch(line):
-                        cdt = cur_dl()
-                        cat = cur_ct()
-                        idseq_i = IntSequence([int(num) for num in line.split(' ')[1:]], i + 1)
-                        for ids_override in Config.override_ids:
-                            if ids_override.name == f'{cat}:{cdt}':
-                                idseq_temp = IntSequence(ids_override.ids, i + 1)
-                                trace(f'Using \'{cat}:{cdt}\' ids override: {idseq_i!s} -> {idseq_temp!s}')
-                                idseq_i.ints[:] = idseq_temp.ints[:]
-                        if self.queries.sequences_pages.at_cur_cat[cdt]:
-                            assert len(idseq_i) <= 2, (f'{cdt} has pages but defines ids range of '
-                                                       f'{len(idseq_i):d} > 2!\n\tat line {i + 1:d}: {line}')
-                        self.queries.sequences_ids.at_cur_cat[cdt] = idseq_i
-                        if len(idseq_i) < MIN_IDS_SEQ_LENGTH:
-                            if cdt in Config.downloaders:
-                                negative_str = ' NEGATIVE' if idseq_i[0] < 0 else ''
-                                trace(f'{cdt} at line {i + 1:d} provides a single{negative_str} id hence requires maxid autoupdate')
-                                if cat not in self.queries.autoupdate_seqs:
-                                    self.queries.autoupdate_seqs.add_category(cat)
-                                self.queries.autoupdate_seqs[cat][cdt] = idseq_i
-                            else:
-                                idseq_i.ints.append(2**31 - 1)
-                    elif re_pages_list.fullmatch(line):
+                    elif line_pattern is re_ids_list:
+                        self.parse_ids_line(self.queries, line, i, offset, cur_ct(), cur_dl())
+                        ids_lines.append((i, cur_ct(), cur_dl()))
+                    elif line_pattern is re_pages_list:
                         cdt = cur_dl()
                         assert cdt in PAGE_DOWNLOADERS, f'{cur_cat}:{cdt} doesn\'t support pages search!\n\tat line {i + 1:d}: {line}'
                         idseq_p = self.queries.sequences_ids.at_cur_cat[cdt]
@@ -285,7 +457,7 @@ class ParserText:
                         self.queries.sequences_pages.at_cur_cat[cdt] = pageseq
                         if len(pageseq) < MIN_IDS_SEQ_LENGTH:
                             pageseq.ints.append(1)
-                    elif re_downloader_basepath.fullmatch(line):
+                    elif line_pattern is re_downloader_basepath:
                         cat = cur_ct()
                         cdt = cur_dl()
                         basepath = pathlib.Path(line[line.find(':') + 1:]).resolve()
@@ -298,18 +470,18 @@ class ParserText:
                         self.queries.sequences_paths.at_cur_cat[cur_dl()] = path_downloader.as_posix()
                         self.queries.sequences_paths_reqs[cur_dl()] = path_reqs.as_posix()
                         self.queries.sequences_paths_update[cur_dl()] = path_downloader.as_posix()
-                    elif re_common_arg.fullmatch(line):
+                    elif line_pattern is re_common_arg:
                         common_args = line[line.find(':') + 1:].split(' ')
                         self.try_parse_proxy(common_args, cur_ct(), cur_dl())
                         self.queries.sequences_common.at_cur_cat[cur_dl()].extend(common_args)
-                    elif re_sub_begin.fullmatch(line):
+                    elif line_pattern is re_sub_begin:
                         cdt = cur_dl()
                         seq_subs, seq_tags = self.queries.sequences_subfolders, self.queries.sequences_tags
                         assert len(seq_subs.at_cur_cat[cdt]) == len(seq_tags.at_cur_cat[cdt]), f'Error: unclosed {cdt} sub!'
                         self.queries.sequences_subfolders.at_cur_cat[cur_dl()].append(line[line.find(':') + 1:])
-                    elif re_sub_end.fullmatch(line):
-                        self.queries.sequences_tags.at_cur_cat[cur_dl()].append(cur_tags_list.copy())
-                    elif re_downloader_finalize.fullmatch(line):
+                    elif line_pattern is re_sub_end:
+                        self.queries.sequences_tags.at_cur_cat[cur_dl()].append(cur_tags_list.to_list())
+                    elif line_pattern is re_downloader_finalize:
                         cat, cdt = cur_ct(), cur_dl()
                         for extra_args in Config.extra_args:
                             if extra_args.is_for(cat, cdt):
@@ -318,9 +490,6 @@ class ParserText:
                                 self.queries.sequences_common.at_cur_cat[cur_dl()].extend(f'"{arg}"' for arg in extra_args.args)
                         cur_tags_list.clear()
                         cur_dwn = ''
-                    else:
-                        trace(f'Error: unknown param at line {i + 1:d}!')
-                        raise OSError
                 else:  # elif line[0] in '(-*' or line[0].isalpha():
                     assert self.queries.sequences_ids.at_cur_cat[cur_dl()] or self.queries.sequences_pages.at_cur_cat[cur_dl()], (
                         f'Unbound tags found at line {i + 1:d}: {line}')
@@ -331,56 +500,32 @@ class ParserText:
                         trace(f'Error: unsupported ungrouped OR symbol at line {i + 1:d}!')
                         raise OSError
                     need_append = True
-                    if all_tags_negative(line.split(' ')):  # line[0] === '-'
+                    line_tags = line.split(' ')
+                    if all_tags_negative(line_tags):  # line[0] === '-'
                         if line[1] in '-+':
                             # remove --tag(s) or -+tag(s) from list, convert: --a --b -> [-a, -b] OR -+a -+b -> [a, b]
-                            tags_to_remove = [tag[2 if tag[1] == '+' else 1:] for tag in line.split(' ')]
-                            for k in reversed(range(len(tags_to_remove))):
-                                for j in reversed(range(len(cur_tags_list))):
-                                    if cur_tags_list[j] == tags_to_remove[k]:
-                                        del cur_tags_list[j]
-                                        del tags_to_remove[k]
-                                        break
+                            tags_to_remove = cur_tags_list.remove_tags([tag[2 if tag[1] == '+' else 1:] for tag in line_tags])
                             assert len(tags_to_remove) == 0, f'Tags not consumed: "{" ".join(tags_to_remove)}" at line {i + 1:d}: {line}'
                             continue
                         else:
-                            tags_split = [tag[1:] for tag in line.split(' ')]
-                            split_len = len(tags_split)
+                            tags_split = [tag[1:] for tag in line_tags]
                             assert all(bool(_) for _ in tags_split), f'Invalid tag string at line {i + 1:d}: {line}'
-                            need_find_previous_or_group = True
-                            tags_rem = '~'.join(tags_split)
-                            tags_search = ','.join(tags_split)
-                            start_idx = 1 if split_len > 1 else 0
-                            end_idx = -1 if split_len > 1 else None
-                            j: int
-                            for j in reversed(range(len(cur_tags_list))):
-                                cur_tag = cur_tags_list[j]
-                                prev_tag = cur_tags_list[j - 1] if j > 0 else ''
-                                try_match_search = j > 0 and prev_tag.startswith('-search')
-                                if try_match_search and cur_tag == tags_search:
-                                    del cur_tags_list[j]
-                                    del cur_tags_list[j - 1]
-                                    need_find_previous_or_group = False
-                                    if prev_tag == '-search' or prev_tag.startswith('-search_rule'):
-                                        need_append = False
-                                    break
-                                try_match_rem = split_len == 1 or cur_tag[::len(cur_tag) - 1] == '()'
-                                if try_match_rem and cur_tag[start_idx:end_idx] == tags_rem:
-                                    del cur_tags_list[j]
-                                    need_find_previous_or_group = False
-                                    break
-                            if need_find_previous_or_group is True:
+                            excluded_search_arg = cur_tags_list.exclude(tags_split)
+                            if excluded_search_arg is None:
                                 trace(f'Info: exclusion(s) at {i + 1:d}, no previous matching tag or \'or\' group found. Line: \'{line}\'')
-                    elif not all_tags_positive(line.split(' ')):
-                        param_like = line[0] == '-' and len(line.split(' ')) == 2
+                            elif excluded_search_arg == '-search' or excluded_search_arg.startswith('-search_rule'):
+                                need_append = False
+                    elif not all_tags_positive(line_tags):
+                        param_like = line[0] == '-' and len(line_tags) == 2
                         if not (param_like and (line.startswith(('-search', '-quality')))):
                             trace(f'Warning (W2): mixed positive / negative tags at line {i + 1:d}, '
                                   f'{"param" if param_like else "error"}? Line: \'{line}\'')
                     if need_append:
-                        cur_tags_list.extend(line.split(' '))
+                        cur_tags_list.extend(line_tags)
             except Exception as e:
                 trace(f'Error: issue encountered while parsing queries file at line {i + 1:d}!\n - {e!s}')
                 raise
+        return ids_lines
 
 #
 #
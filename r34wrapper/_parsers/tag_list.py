@@ -0,0 +1,148 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+from collections.abc import Iterable, Iterator
+
+__all__ = ('TagList',)
+
+TAGLIST_COMPACT_THRESHOLD = 64
+
+
+class TagList:
+    """
+    Current tags (downloader arguments) list of a sub. Keeps positions of every tag and links between remaining tags,
+    so removing the last occurrence of a tag (or a search argument pair) doesn't require scanning and shifting the list.
+    Removed tags are left as tombstones until they outnumber remaining ones
+    """
+    __slots__ = ('_last', '_next', '_positions', '_prev', '_size', '_tags')
+
+    def __init__(self) -> None:
+        self._tags: list[str | None] = []
+        self._prev: list[int] = []
+        self._next: list[int] = []
+        self._positions: dict[str, list[int]] = {}
+        self._last = -1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        return (tag for tag in self._tags if tag is not None)
+
+    def to_list(self) -> list[str]:
+        return self._tags.copy() if len(self._tags) == self._size else [tag for tag in self._tags if tag is not None]
+
+    def clear(self) -> None:
+        self._tags.clear()
+        self._prev.clear()
+        self._next.clear()
+        self._positions.clear()
+        self._last = -1
+        self._size = 0
+
+    def append(self, tag: str) -> None:
+        idx = len(self._tags)
+        self._tags.append(tag)
+        self._prev.append(self._last)
+        self._next.append(-1)
+        if self._last >= 0:
+            self._next[self._last] = idx
+        self._last = idx
+        self._positions.setdefault(tag, []).append(idx)
+        self._size += 1
+
+    def extend(self, tags: Iterable[str]) -> None:
+        new_tags = list(tags)
+        if not new_tags:
+            return
+        start_idx, end_idx = len(self._tags), len(self._tags) + len(new_tags)
+        self._tags.extend(new_tags)
+        self._prev.append(self._last)
+        self._prev.extend(range(start_idx, end_idx - 1))
+        self._next.extend(range(start_idx + 1, end_idx))
+        self._next.append(-1)
+        if self._last >= 0:
+            self._next[self._last] = start_idx
+        self._last = end_idx - 1
+        self._size += len(new_tags)
+        positions = self._positions
+        for idx, tag in enumerate(new_tags, start_idx):
+            if tag in positions:
+                positions[tag].append(idx)
+            else:
+                positions[tag] = [idx]
+
+    def _delete(self, idx: int) -> None:
+        tag = self._tags[idx]
+        positions = self._positions[tag]
+        if positions[-1] == idx:
+            positions.pop()
+        else:
+            positions.remove(idx)
+        if not positions:
+            del self._positions[tag]
+        prev_idx, next_idx = self._prev[idx], self._next[idx]
+        if prev_idx >= 0:
+            self._next[prev_idx] = next_idx
+        if next_idx >= 0:
+            self._prev[next_idx] = prev_idx
+        else:
+            self._last = prev_idx
+        self._tags[idx] = None
+        self._size -= 1
+
+    def _compact(self) -> None:
+        if len(self._tags) - self._size > max(self._size, TAGLIST_COMPACT_THRESHOLD):
+            tags = self.to_list()
+            self.clear()
+            self.extend(tags)
+
+    def remove_tags(self, tags: list[str]) -> list[str]:
+        """
+        Remove last occurrence of each of **tags**, starting from the last one ('--a --b', '-+a -+b').
+        Returns tags which weren't found
+        """
+        not_found: list[str] = []
+        for tag in reversed(tags):
+            positions = self._positions.get(tag)
+            if positions:
+                self._delete(positions[-1])
+            else:
+                not_found.append(tag)
+        self._compact()
+        return not_found[::-1]
+
+    def exclude(self, tags: list[str]) -> str | None:
+        """
+        Undo the latest inclusion of **tags** ('-a', '-a -b'): either a tag / 'or' group ('a', '(a~b)') or a search argument
+        value ('a,b') with its preceding search argument, whichever comes last (search wins if both are the same tag).
+        Returns removed search argument name, empty string if tag / 'or' group was removed or None if nothing matched
+        """
+        rem_key = tags[0] if len(tags) == 1 else f'({"~".join(tags)})'
+        rem_positions = self._positions.get(rem_key)
+        rem_idx = rem_positions[-1] if rem_positions else -1
+        for idx in reversed(self._positions.get(','.join(tags), ())):
+            if idx < rem_idx:
+                break
+            prev_idx = self._prev[idx]
+            if prev_idx >= 0 and self._tags[prev_idx].startswith('-search'):
+                search_arg = self._tags[prev_idx]
+                self._delete(idx)
+                self._delete(prev_idx)
+                self._compact()
+                return search_arg
+        if rem_idx >= 0:
+            self._delete(rem_idx)
+            self._compact()
+            return ''
+        return None
+
+#
+#
+#########################################
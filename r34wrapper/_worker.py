@@ -0,0 +1,80 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+# Standalone script (executed by script's python executable, not by the wrapper's one), must not import wrapper modules.
+# Usage: python _worker.py <downloader path>
+# Reads queries (json list of arguments) from stdin one per line, runs downloader entry point in-process for every query.
+# Query output (stdout + stderr) is followed by a sentinel line containing its exit code.
+# Downloader's own modules imported by a query are unloaded after it, so module level state doesn't leak into the next query
+# (modules imported from elsewhere, i.e. downloader dependencies, stay loaded - that's what makes a worker faster)
+
+import json
+import os
+import runpy
+import sys
+import traceback
+
+SENTINEL = '\x1e#r34wrapper-query-done#'
+
+
+def is_module_within(module: object, base_dir: str) -> bool:
+    module_paths = [getattr(module, '__file__', None) or '', *(getattr(module, '__path__', None) or ())]
+    return any(module_path and os.path.abspath(module_path).startswith(base_dir) for module_path in module_paths)
+
+
+def unload_modules(base_dir: str, keep_names: set[str]) -> None:
+    for name, module in list(sys.modules.items()):
+        if name not in keep_names and is_module_within(module, base_dir):
+            del sys.modules[name]
+
+
+def run_query(entry_path: str, args: list[str]) -> int:
+    cwd = os.getcwd()
+    sys.argv = [entry_path, *args]
+    try:
+        runpy.run_path(entry_path, run_name='__main__')
+        return 0
+    except SystemExit as exit_exc:
+        if exit_exc.code is None or isinstance(exit_exc.code, int):
+            return exit_exc.code or 0
+        print(exit_exc.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        os.chdir(cwd)
+
+
+def main() -> None:
+    entry_path = sys.argv[1]
+    # mimic 'python <path>': entry dir must be the first import location (instead of this script's dir)
+    sys.path[0] = entry_path if os.path.isdir(entry_path) else os.path.dirname(entry_path)
+    cmd_stream = os.fdopen(os.dup(0), 'rt', encoding='utf-8')
+    devnull_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull_fd, 0)
+    os.dup2(1, 2)
+    base_dir = os.path.join(os.path.abspath(sys.path[0]), '')
+    startup_modules = set(sys.modules)
+    for line in cmd_stream:
+        rc = run_query(entry_path, json.loads(line))
+        unload_modules(base_dir, startup_modules)
+        for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os.write(1, f'\n{SENTINEL} {rc:d}\n'.encode())
+
+
+if __name__ == '__main__':
+    main()
+
+#
+#
+#########################################
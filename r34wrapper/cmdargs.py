@@ -9,7 +9,7 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 from argparse import ArgumentParser
 from collections.abc import Sequence
 
-from .config import CatDwnIds, Config, ExtraArgs, IgnoredArg
+from .config import CatDwnIds, Config, DwnNum, ExtraArgs, IgnoredArg
 from .defs import (
     ACTION_APPEND,
     ACTION_STORE_TRUE,
@@ -17,20 +17,36 @@ from .defs import (
     DOWNLOADERS,
     HELP_APPEND,
     HELP_CATEGORIES,
+    HELP_COALESCE_QUERIES,
+    HELP_CONCURRENCY,
+    HELP_CONSOLE_LEVEL,
     HELP_DEBUG,
     HELP_DOWNLOADERS,
+    HELP_EXIT_CODES,
     HELP_IDLIST,
     HELP_IGNORE_ARGUMENT,
     HELP_INSTALL,
+    HELP_KEEP_FAILED_IDS,
+    HELP_LOG_COMPRESSION,
+    HELP_LOG_JSON,
+    HELP_LOG_LEVEL,
+    HELP_MAX_PROCESSES,
     HELP_NO_DOWNLOAD,
     HELP_NO_UPDATE,
     HELP_PARSER,
+    HELP_PIPELINE_FETCH,
+    HELP_RESUME,
+    HELP_REVALIDATE,
     HELP_SCRIPT_PATH,
+    HELP_STATUS_INTERVAL,
+    HELP_WORKERS,
     IDLIST_SEPARATOR,
+    LOG_LEVELS,
     PARSER_DEFAULT,
     SUPPORTED_PARSER_TYPES,
 )
-from .validators import valid_categories_list, valid_downloaders_list, valid_file_path
+from .log_codecs import LOG_CODECS
+from .validators import positive_int, valid_categories_list, valid_downloaders_list, valid_file_path
 
 __all__ = ('parse_arglist',)
 
@@ -40,18 +56,31 @@ CDA_LIST_A = APPEND_SEPARATOR.join(CDA_LIST)
 
 
 def parse_arglist(args: Sequence[str]) -> None:
-    parser = ArgumentParser(add_help=False)
+    parser = ArgumentParser(add_help=False, epilog=HELP_EXIT_CODES)
     parser.usage = 'main.py -script PATH_TO_FILE [options...]'
     parser.add_argument('--help', action='help', help='Print this message')
     parser.add_argument('--debug', action=ACTION_STORE_TRUE, help=HELP_DEBUG)
     parser.add_argument('--no-download', action=ACTION_STORE_TRUE, help=HELP_NO_DOWNLOAD)
     parser.add_argument('--no-update', action=ACTION_STORE_TRUE, help=HELP_NO_UPDATE)
     parser.add_argument('--install', action=ACTION_STORE_TRUE, help=HELP_INSTALL)
+    parser.add_argument('--resume', action=ACTION_STORE_TRUE, help=HELP_RESUME)
+    parser.add_argument('--keep-failed-ids', action=ACTION_STORE_TRUE, help=HELP_KEEP_FAILED_IDS)
+    parser.add_argument('--revalidate', action=ACTION_STORE_TRUE, help=HELP_REVALIDATE)
+    parser.add_argument('--pipeline-fetch', action=ACTION_STORE_TRUE, help=HELP_PIPELINE_FETCH)
+    parser.add_argument('--coalesce-queries', action=ACTION_STORE_TRUE, help=HELP_COALESCE_QUERIES)
+    parser.add_argument('--log-json', action=ACTION_STORE_TRUE, help=HELP_LOG_JSON)
     parser.add_argument('-ignore', metavar='ARG,LEN', default=[], action=ACTION_APPEND, help=HELP_IGNORE_ARGUMENT, type=IgnoredArg)
     parser.add_argument('-idlist', metavar=CDA_LIST_I, default=[], action=ACTION_APPEND, help=HELP_IDLIST, type=CatDwnIds)
     parser.add_argument('-append', metavar=CDA_LIST_A, default=[], action=ACTION_APPEND, help=HELP_APPEND, type=ExtraArgs)
+    parser.add_argument('-concurrency', metavar='DWN,NUM', default=[], action=ACTION_APPEND, help=HELP_CONCURRENCY, type=DwnNum)
+    parser.add_argument('-max_processes', metavar='NUM', default=0, help=HELP_MAX_PROCESSES, type=positive_int)
+    parser.add_argument('-status_interval', metavar='SECONDS', default=0, help=HELP_STATUS_INTERVAL, type=positive_int)
+    parser.add_argument('-console_level', metavar='LEVEL', default='', help=HELP_CONSOLE_LEVEL, choices=LOG_LEVELS)
+    parser.add_argument('-log_level', metavar='LEVEL', default='', help=HELP_LOG_LEVEL, choices=LOG_LEVELS)
+    parser.add_argument('-log_compression', metavar='CODEC', default='', help=HELP_LOG_COMPRESSION, choices=LOG_CODECS)
     parser.add_argument('-categories', metavar='L,I,S,T', default=[], help=HELP_CATEGORIES, type=valid_categories_list)
     parser.add_argument('-downloaders', metavar='L,I,S,T', default=DOWNLOADERS, help=HELP_DOWNLOADERS, type=valid_downloaders_list)
+    parser.add_argument('-workers', metavar='L,I,S,T', default=(), help=HELP_WORKERS, type=valid_downloaders_list)
     parser.add_argument('-script', metavar='PATH_TO_FILE', required=True, help=HELP_SCRIPT_PATH, type=valid_file_path)
     parser.add_argument('-parser', metavar='PARSER_TYPE', default=PARSER_DEFAULT, help=HELP_PARSER, choices=SUPPORTED_PARSER_TYPES)
 
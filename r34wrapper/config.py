@@ -9,12 +9,12 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 import pathlib
 from argparse import Namespace
 
-from .defs import APPEND_SEPARATOR, IDLIST_SEPARATOR, MAX_CMD_LEN, OS_WINDOWS
+from .defs import APPEND_SEPARATOR, DOWNLOADERS, IDLIST_SEPARATOR, LOG_LEVEL_DEFAULT, LOG_LEVELS, MAX_CMD_LEN, OS_WINDOWS
 
 if True is False:
     from .parsers import ParserMeta
 
-__all__ = ('CatDwnIds', 'Config', 'ExtraArgs', 'IgnoredArg')
+__all__ = ('CatDwnIds', 'Config', 'DwnNum', 'ExtraArgs', 'IgnoredArg')
 
 
 class IgnoredArg:
@@ -71,6 +71,31 @@ class CatDwnIds:
     __repr__ = __str__
 
 
+class DwnNum:
+    def __init__(self, dwn_num_fmt: str) -> None:
+        try:
+            dt, num = tuple(dwn_num_fmt.split(',', 1))
+            dt = dt.lower()
+            assert dt in DOWNLOADERS and int(num) > 0
+            self._name = dt
+            self._num = int(num)
+        except Exception:
+            raise ValueError(f'Invalid downloader number format: \'{dwn_num_fmt}\'')
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def num(self) -> int:
+        return self._num
+
+    def __str__(self) -> str:
+        return f'{self._name}({self._num:d})'
+
+    __repr__ = __str__
+
+
 class ExtraArgs:
     def __init__(self, cat_dwn_args_fmt: str) -> None:
         try:
@@ -114,10 +139,23 @@ class BaseConfig:
         self.no_download: bool = False
         self.no_update: bool = False
         self.install: bool = False
+        self.resume: bool = False
+        self.keep_failed_ids: bool = False
+        self.revalidate: bool = False
+        self.pipeline_fetch: bool = False
+        self.coalesce_queries: bool = False
+        self.log_json: bool = False
+        self.log_compression: str = ''
         self.ignored_args: list[IgnoredArg] = []
         self.override_ids: list[CatDwnIds] = []
         self.extra_args: list[ExtraArgs] = []
+        self.concurrency_overrides: list[DwnNum] = []
+        self.max_processes: int = 0
+        self.status_interval: int = 0
+        self.console_level: int = LOG_LEVELS[LOG_LEVEL_DEFAULT]
+        self.log_level: int = LOG_LEVELS[LOG_LEVEL_DEFAULT]
         self.downloaders: tuple[str, ...] = ()
+        self.worker_downloaders: tuple[str, ...] = ()
         self.categories: list[str] = []
         self.script_path: pathlib.Path = BaseConfig.DEFAULT_PATH.with_name('script.list')
         self.parser_type: str = ''
@@ -135,10 +173,16 @@ class BaseConfig:
         self.update_prefetch: bool = False
         self.update_offsets: dict[str, int] = {}
         self.noproxy_fetches: set[str] = set()
+        self.concurrency: dict[str, int] = {}
+        self.process_weights: dict[str, int] = {}
+        self.query_timeouts: dict[str, int] = {}
+        self.stall_timeouts: dict[str, int] = {}
+        self.query_retries: int = 0
         # calculated
         self.title_increment_value: str = ''
         self.max_cmd_len: int = MAX_CMD_LEN[OS_WINDOWS] // 2  # MAX_CMD_LEN.get(running_system())
         self.disabled_downloaders: dict[str, set[str]] = {}
+        self.failed_downloaders: dict[str, set[str]] = {}
         self.fetched_maxids: dict[str, str] = {}
         # internal
         self.test: bool = test
@@ -152,14 +196,33 @@ class BaseConfig:
         self.no_download = params.no_download or self.no_download
         self.no_update = params.no_update or self.no_update
         self.install = params.install or self.install
+        self.resume = params.resume or self.resume
+        self.keep_failed_ids = params.keep_failed_ids or self.keep_failed_ids
+        self.revalidate = params.revalidate or self.revalidate
+        self.pipeline_fetch = params.pipeline_fetch or self.pipeline_fetch
+        self.coalesce_queries = params.coalesce_queries or self.coalesce_queries
+        self.log_json = params.log_json or self.log_json
+        self.log_compression = params.log_compression or self.log_compression
         self.ignored_args = params.ignore or self.ignored_args
         self.override_ids = params.idlist or self.override_ids
         self.extra_args = params.append or self.extra_args
+        self.concurrency_overrides = params.concurrency or self.concurrency_overrides
+        self.max_processes = params.max_processes or self.max_processes
+        self.status_interval = params.status_interval or self.status_interval
+        self.console_level = LOG_LEVELS[params.console_level] if params.console_level else self.console_level
+        self.log_level = LOG_LEVELS[params.log_level] if params.log_level else self.log_level
         self.downloaders = params.downloaders or self.downloaders
+        self.worker_downloaders = params.workers or self.worker_downloaders
         self.categories = params.categories or self.categories
         self.script_path = params.script or self.script_path
         self.parser_type = params.parser or self.parser_type
 
+    def max_concurrent_queries(self, dt: str) -> int:
+        for dt_override in reversed(self.concurrency_overrides):
+            if dt_override.name == dt:
+                return dt_override.num
+        return self.concurrency.get(dt, 1)
+
     @property
     def full_title(self) -> str:
         return f'{self.title}{self.title_increment_value}'
@@ -8,13 +8,13 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 
 from __future__ import annotations
 
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from typing import Generic, NamedTuple, Type
 
-from .defs import AT, DOWNLOADERS, DT, IntSequence, StrPair
+from .defs import AT, DOWNLOADERS, DT, QUERY_OUTCOME_OK, IntSequence, StrPair
 from .util import assert_notnull
 
-__all__ = ('CmdRunParams', 'DownloadCollection', 'Queries', 'Wrapper')
+__all__ = ('CmdRunParams', 'CmdRunResult', 'DownloadCollection', 'Queries', 'Query', 'Wrapper')
 
 
 class DownloadCollection(Generic[DT]):
@@ -72,14 +72,31 @@ class DownloadCollection(Generic[DT]):
     __repr__ = __str__
 
 
+class Query(str):
+    """
+    Formed query. String value is the query cmdline as it is displayed (logs, reports) and identified (journal, history),
+    **args** is the argv it was formed from, which is passed to the downloader process as is
+    """
+    args: list[str]
+
+    def __new__(cls, args: list[str], display: str) -> Query:
+        query = super().__new__(cls, display)
+        query.args = args
+        return query
+
+    def __reduce__(self) -> tuple:
+        return Query, (self.args, str(self))
+
+
 class CmdRunParams(NamedTuple):
-    query: str
+    query: Query
     downloader: str
     downloader_query_num: int
     downloader_query_max: int
     category: str
     category_query_num: int
     category_query_max: int
+    subfolder: str = ''
 
     @property
     def dwn(self) -> str:
@@ -105,6 +122,50 @@ class CmdRunParams(NamedTuple):
     def cqm(self) -> int:
         return self.category_query_max
 
+    @property
+    def sub(self) -> str:
+        return self.subfolder
+
+
+class CmdRunResult:
+    """Outcome of a query execution (including retries)"""
+    def __init__(self, params: CmdRunParams) -> None:
+        self.params = params
+        self.outcome = ''
+        self.returncode: int | None = None
+        self.attempts = 0
+        self.start_time = ''
+        self.end_time = ''
+        self.duration = 0.0
+        self.log_size = 0
+
+    @property
+    def failed(self) -> bool:
+        return self.outcome != QUERY_OUTCOME_OK or self.returncode != 0
+
+    def to_json(self) -> dict:
+        p = self.params
+        return {
+            'category': p.cat.strip(),
+            'downloader': p.dwn,
+            'subfolder': p.sub,
+            'query': p.query,
+            'outcome': self.outcome or 'not finished',
+            'rc': self.returncode,
+            'attempts': self.attempts,
+            'started': self.start_time,
+            'ended': self.end_time,
+            'duration': round(self.duration, 1),
+            'log_bytes': self.log_size,
+        }
+
+    def __str__(self) -> str:
+        p = self.params
+        return (f'\'{p.cat}:{p.dwn}\' query {p.cqn:d} / {p.cqm:d} ({p.dwn} query {p.dqn:d} / {p.dqm:d}, sub: \'{p.sub}\'): '
+                f'{self.outcome or "not finished"}, exit code {self.returncode!s} after {self.attempts:d} attempt(s)')
+
+    __repr__ = __str__
+
 
 class Wrapper(Generic[AT]):
     _value: AT | None
@@ -132,7 +193,7 @@ class Queries:
     __slots__ = frozenset[str]((
         'autoupdate_seqs',
         'proxies_update',
-        'queries_file_lines',
+        'queries_file',
         'sequences_common',
         'sequences_ids',
         'sequences_pages',
@@ -143,10 +204,10 @@ class Queries:
         'sequences_tags',
     ))
 
-    compare_exclude_slots = frozenset[str](('queries_file_lines',))
+    compare_exclude_slots = frozenset[str](('queries_file',))
 
     def __init__(self) -> None:
-        self.queries_file_lines: list[str] | dict = []
+        self.queries_file: Iterable[tuple[int, str]] = ()  # (byte offset, line), read lazily
 
         self.autoupdate_seqs: DownloadCollection[IntSequence] = DownloadCollection()
 
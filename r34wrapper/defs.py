@@ -26,9 +26,10 @@ MIN_PYTHON_VERSION_STR = f'{MIN_PYTHON_VERSION[0]:d}.{MIN_PYTHON_VERSION[1]:d}'
 # Types
 class IntSequence:
     """list[int] wrapper with extra info"""
-    def __init__(self, ints: Iterable[int], line_num: int) -> None:
+    def __init__(self, ints: Iterable[int], line_num: int, offset: int = -1) -> None:
         self.ints = list(ints or [])
         self.line_num = line_num or -1
+        self.offset = offset  # byte offset of the line in queries file, -1 if unknown
 
     def __str__(self) -> str:
         return f'{self.ints!s} (found at line {self.line_num:d})'
@@ -203,6 +204,32 @@ PATH_APPEND_DOWNLOADER: dict[str, str] = {
     DOWNLOADER_BB: PATH_APPEND_DOWNLOADER_RUXX,
 }
 
+QUERY_OUTCOME_OK = 'ok'
+QUERY_OUTCOME_TIMEOUT = 'timeout'
+QUERY_OUTCOME_STALLED = 'stalled'
+
+LOG_LEVEL_ERROR = 0
+LOG_LEVEL_WARN = 1
+LOG_LEVEL_INFO = 2
+LOG_LEVEL_DEBUG = 3
+LOG_LEVEL_TRACE = 4
+'''downloaders output'''
+
+LOG_LEVELS: dict[str, int] = {
+    'error': LOG_LEVEL_ERROR,
+    'warn': LOG_LEVEL_WARN,
+    'info': LOG_LEVEL_INFO,
+    'debug': LOG_LEVEL_DEBUG,
+    'trace': LOG_LEVEL_TRACE,
+}
+LOG_LEVEL_NAMES = tuple(LOG_LEVELS)
+LOG_LEVEL_DEFAULT = 'trace'
+
+RUN_PHASE_STARTUP = 'startup'
+RUN_PHASE_PREPARE = 'prepare'
+RUN_PHASE_EXECUTE = 'execute'
+RUN_PHASE_UPDATE = 'update'
+
 RANGE_ID_TEMPLATE_NRVCG = StrPair('-start %d', ' -end %d')
 RANGE_ID_TEMPLATE_RN_RP = StrPair('id>=%d', ' id<=%d')
 RANGE_ID_TEMPLATE_RX_RS_XB_BB = StrPair('id:>=%d', ' id:<=%d')
@@ -242,6 +269,28 @@ HELP_CATEGORIES = 'Enabled categories. Default is all'
 HELP_NO_DOWNLOAD = 'Skip launching any downloaders'
 HELP_NO_UPDATE = 'Skip script ids update regardless of script update flag being set or not'
 HELP_INSTALL = 'Force install dependencies from enabled downloaders to a Python environment set within the script'
+HELP_RESUME = (
+    'Resume interrupted run: skip queries which were successfully completed according to run journal'
+    ' (\'journal_<script name>.jsonl\' in logs folder). Journal only matches queries while script ids remain unchanged.'
+    ' Queries of autoupdate id sequences include fetched max id, so they are only matched while it stays the same'
+    ' (cached max id expires in 15 minutes, new posts change it)'
+)
+HELP_REVALIDATE = (
+    'Force check of python executable and all downloaders (and requirements install if --install is set) even if they are unchanged'
+    ' since they last passed the check (\'runners_cache.json\' in logs folder)'
+)
+HELP_PIPELINE_FETCH = (
+    'Fetch max ids in background: every downloader fetches its max id when it starts instead of all downloaders waiting'
+    ' for all max ids to be fetched first. Only downloaders with autoupdate id sequences wait for their fetch to complete'
+)
+HELP_COALESCE_QUERIES = (
+    'Merge subs which don\'t use search into a single \'-script\' query when other subs of the same downloader use search'
+    ' (RV family only). Without it any search used disables merging of all subs of that downloader'
+)
+HELP_KEEP_FAILED_IDS = (
+    'Do not advance script ids of category:downloader pairs which had failed queries (see run report in logs folder),'
+    ' so the same id range is downloaded again next run'
+)
 HELP_SCRIPT_PATH = 'Full path to the script (queries) file'
 HELP_PARSER = 'Parser type override (if doesn\'t match script file extension)'
 HELP_IGNORE_ARGUMENT = (
@@ -264,6 +313,42 @@ HELP_APPEND = (
     f' will make rx downloader download to folder \'sub1\' when processing category \'vid\'.'
     f' Can be used multiple times'
 )
+HELP_CONCURRENCY = (
+    'Maximum number of queries a given downloader is allowed to run at once, format: \'<DWN>,<NUM>\'.'
+    ' Example: \'-concurrency rx,3\' allows RX downloader to process up to 3 queries in parallel.'
+    ' Overrides script value. Can be used multiple times'
+)
+HELP_MAX_PROCESSES = (
+    'Maximum total number of downloader processes running at once (across all downloaders).'
+    ' Downloaders with process weight set within the script consume that many slots per query.'
+    ' Default is 0 (no limit). Overrides script value'
+)
+HELP_WORKERS = (
+    'Downloaders which queries are executed by persistent worker processes (one per downloader path per concurrent query)'
+    ' instead of a new python process per query. Worker imports downloader dependencies once and runs queries in-process.'
+    ' Downloaders keeping global state between runs may misbehave. Default is none'
+)
+HELP_CONSOLE_LEVEL = (
+    f'Console log verbosity, one of: {", ".join(LOG_LEVELS)}. \'debug\' adds parsed script values and formed queries,'
+    f' \'trace\' adds downloaders output. Default is \'{LOG_LEVEL_DEFAULT}\''
+)
+HELP_LOG_LEVEL = f'Log file (and JSON lines log) verbosity, same as for console. Default is \'{LOG_LEVEL_DEFAULT}\''
+HELP_LOG_JSON = (
+    'Also write log as JSON lines (\'.jsonl\' next to log file), one record per message with time, level, run phase and'
+    ' (for query messages) category, downloader, query number and sub'
+)
+HELP_LOG_COMPRESSION = (
+    'Compress per-query log files while they are written, using given codec (\'gzip\': \'.log.gz\' files).'
+    ' Use \'python -m r34wrapper.logtail\' to read (and follow) compressed logs. Default is no compression'
+)
+HELP_STATUS_INTERVAL = (
+    'Write live status of running queries (elapsed time, output size, last output line)'
+    ' to \'status_<script name>.json\' in logs folder every SECONDS seconds. Default is 0 (disabled)'
+)
+HELP_EXIT_CODES = (
+    'Exit codes: 0 - success, -2 - some queries failed (exited with non-zero code, timed out or stalled),'
+    ' -3 - unhandled error, -4 - interrupted'
+)
 
 #
 #
@@ -8,82 +8,431 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 
 import math
 import os
-from asyncio import AbstractEventLoop, Future, SubprocessProtocol, as_completed, new_event_loop, sleep
+import pathlib
+import signal
+import subprocess
+import time
+from asyncio import AbstractEventLoop, Future, SubprocessProtocol, Task, as_completed, gather, new_event_loop, sleep, wait
+from codecs import getincrementaldecoder
+from collections import deque
+from collections.abc import Awaitable, Callable
+from platform import system as running_system
+from typing import TextIO
 
 from .config import Config
-from .containers import CmdRunParams, DownloadCollection, Wrapper
-from .defs import DOWNLOADERS, RUN_FILE_DOWNLOADERS, UTF8
+from .containers import CmdRunParams, CmdRunResult, DownloadCollection, Query, Wrapper
+from .defs import (
+    DOWNLOADERS,
+    LOG_LEVEL_TRACE,
+    LOG_LEVEL_WARN,
+    OS_WINDOWS,
+    QUERY_OUTCOME_OK,
+    QUERY_OUTCOME_STALLED,
+    QUERY_OUTCOME_TIMEOUT,
+    RUN_FILE_DOWNLOADERS,
+    UTF8,
+)
+from .history import QueryHistory, order_longest_first
+from .journal import RunJournal
+from .log_codecs import LOG_CODECS, open_log_file
 from .logger import log_to, trace
-from .strings import datetime_str_nfull, split_into_args
+from .scheduler import ProcessBudget, RetryQueue
+from .status import QueryStatus, RunStatus
+from .storage import save_json
+from .strings import NEWLINE, datetime_str_full, datetime_str_nfull
 from .util import sum_lists
+from .workers import WorkerPool
 
-__all__ = ('execute', 'register_queries')
+__all__ = ('execute', 'register_preparer', 'register_queries', 'update_downloader_queries')
 
 
-class DummyResultProtocol(SubprocessProtocol):
-    def __init__(self, fut: Future) -> None:
+MAX_PARTIAL_LINE_LEN = 64 * 1024
+# query log is flushed at most this often (compressed log is readable up to the last flush)
+QUERY_LOG_FLUSH_INTERVAL = 5.0
+WATCHDOG_INTERVAL = 1.0
+TERMINATE_GRACE_PERIOD = 10
+RETRY_BACKOFF_BASE = 15
+RETRY_BACKOFF_MAX = 300
+
+
+class QueryOutputProtocol(SubprocessProtocol):
+    """
+    Tees child stdout/stderr line by line into per-query log and main log (lines are prefixed with query tag).
+
+    Only an incomplete trailing line is kept in memory. Future is resolved once process exited and its pipes are closed
+    """
+    def __init__(self, fut: Future, log_file: TextIO, prefix: str, status: QueryStatus | None = None,
+                 params: CmdRunParams | None = None) -> None:
         self.future = fut
+        self.prefix = prefix
+        self.params = params
+        self._log_file = log_file
+        self._status = status
+        self._decoders = {fd: getincrementaldecoder(UTF8)(errors='replace') for fd in (1, 2)}
+        self._partials: dict[int, str] = dict.fromkeys(self._decoders, '')
+        self._pipes_open = set(self._decoders)
+        self._exited = False
+        self._last_flush_time = time.monotonic()
+
+    def pipe_data_received(self, fd: int, data: bytes) -> None:
+        if self._status:
+            self._status.on_output(len(data))
+        text = f'{self._partials[fd]}{self._decoders[fd].decode(data)}'
+        lines = text.split('\n')
+        partial = lines.pop()
+        if len(partial) > MAX_PARTIAL_LINE_LEN:
+            lines.append(partial)
+            partial = ''
+        self._partials[fd] = partial
+        for line in lines:
+            self._on_line(line.rstrip('\r'))
+        if lines and (now := time.monotonic()) - self._last_flush_time >= QUERY_LOG_FLUSH_INTERVAL:
+            self._log_file.flush()
+            self._last_flush_time = now
+
+    def pipe_connection_lost(self, fd: int, exc: Exception | None) -> None:
+        if fd in self._pipes_open:
+            self._pipes_open.remove(fd)
+            partial = f'{self._partials[fd]}{self._decoders[fd].decode(b"", True)}'
+            self._partials[fd] = ''
+            if partial:
+                self._on_line(partial.rstrip('\r'))
+        self._try_finish()
 
     def process_exited(self) -> None:
-        self.future.set_result(True)
+        self._exited = True
+        self._try_finish()
+
+    def _on_line(self, line: str) -> None:
+        if self._status:
+            self._status.on_line(line)
+        self._log_file.write(f'{line}\n')
+        trace(f'[{self.prefix}] {line}', level=LOG_LEVEL_TRACE, params=self.params)
+
+    def _try_finish(self) -> None:
+        if self._exited and not self._pipes_open and not self.future.done():
+            self.future.set_result(True)
 
 
 executor_event_loop: Wrapper[AbstractEventLoop] = Wrapper()
+process_budget: Wrapper[ProcessBudget] = Wrapper()
+query_history: Wrapper[QueryHistory] = Wrapper()
+run_status: Wrapper[RunStatus] = Wrapper()
+run_journal: Wrapper[RunJournal] = Wrapper()
+worker_pool: Wrapper[WorkerPool] = Wrapper()
+run_results: list[CmdRunResult] = []
+detached_pids = set[int]()
 
-queries_all: DownloadCollection[list[str]] = DownloadCollection()
+queries_all: DownloadCollection[list[Query]] = DownloadCollection()
+query_subs_all: DownloadCollection[list[str]] = DownloadCollection()
+downloader_preparers: dict[str, tuple[Callable[[], Awaitable[None]], bool]] = {}
 dwqn_fmt = Wrapper('02d')
 
 
-def register_queries(queries: DownloadCollection[list[str]]) -> None:
+def register_queries(queries: DownloadCollection[list[Query]], query_subs: DownloadCollection[list[str]]) -> None:
     queries_all.update(queries)
+    query_subs_all.update(query_subs)
     max_queries_per_downloader = max(sum(len(queries[cat][dt]) for cat in queries) for dt in DOWNLOADERS)
     dwqn_fmt.reset(f'0{math.ceil(math.log10(max_queries_per_downloader + 1)):d}d')
 
 
-async def run_cmd(params: CmdRunParams) -> None:
+def register_preparer(dt: str, preparer: Callable[[], Awaitable[None]], *, blocking: bool) -> None:
+    """
+    Register **preparer** to be started when **dt** downloader starts. Blocking preparer is awaited before any of **dt** queries
+    is executed (queries may be updated by it), non-blocking one runs alongside them
+    """
+    downloader_preparers[dt] = (preparer, blocking)
+
+
+def update_downloader_queries(dt: str, queries: DownloadCollection[list[Query]], query_subs: DownloadCollection[list[str]]) -> None:
+    for cat in queries:
+        queries_all[cat][dt] = queries[cat][dt]
+        query_subs_all[cat][dt] = query_subs[cat][dt]
+
+
+class QueryRun:
+    """Query execution state kept between attempts: result, final cmdline and per-query log (stays open until query is finished)"""
+    def __init__(self, params: CmdRunParams, cmd_args: list[str], log_file_path: pathlib.Path, log_file: TextIO) -> None:
+        self.params = params
+        self.cmd_args = cmd_args
+        self.log_file_path = log_file_path
+        self.log_file = log_file
+        self.result = CmdRunResult(params)
+
+
+def start_query_run(params: CmdRunParams) -> QueryRun:
     query, dwn, dqn, dqm, cat, cqn, cqm = params.query, params.dwn, params.dqn, params.dqm, params.cat, params.cqn, params.cqm
     suffix = f'{Config.full_title}_' if Config.title else ''
     begin_msg = f'\n[{Config.full_title}] Executing \'{cat}:{dwn}\' query {cqn:d} / {cqm:d} ({dwn} query {dqn:d} / {dqm:d}):\n{query}'
     proc_file_name_body = f'{suffix}{dwn}{dqn:{dwqn_fmt.val}}_{cat.strip()}{cqn:{dwqn_fmt.val}}_{datetime_str_nfull()}'
-    log_file_path = Config.dest_logs_base / f'log_{proc_file_name_body}.log'
-    with open(log_file_path, 'wt+', encoding=UTF8, errors='replace', buffering=1) as log_file:
-        trace(begin_msg)
-        log_to(begin_msg, log_file)
-        cmd_args = split_into_args(query)
+    log_codec = LOG_CODECS.get(Config.log_compression)
+    log_file_path = Config.dest_logs_base / f'log_{proc_file_name_body}.log{log_codec.suffix if log_codec else ""}'
+    qrun = QueryRun(params, query.args.copy(), log_file_path, open_log_file(log_file_path, log_codec))
+    qrun.result.start_time = datetime_str_full()
+    run_results.append(qrun.result)
+    try:
+        trace(begin_msg, params=params)
+        log_to(begin_msg, qrun.log_file)
+        cmd_args = qrun.cmd_args
         # DEBUG - do not remove
         # if DOWNLOADERS.index(dt) not in {0} or qn not in range(1, 2):
         #     return
         if dwn in RUN_FILE_DOWNLOADERS and len(query) > Config.max_cmd_len:
             run_file_path = Config.dest_run_base / f'run_{proc_file_name_body}.conf'
-            trace(f'Cmdline is too long ({len(query):d}/{Config.max_cmd_len:d})! Converting to run file: {run_file_path}')
+            trace(f'Cmdline is too long ({len(query):d}/{Config.max_cmd_len:d})! Converting to run file: {run_file_path}', params=params)
             run_file_abspath = run_file_path
             cmd_args_new = cmd_args[2:]
-            cmd_args[2:] = ['file', '-path', run_file_abspath]
+            cmd_args[2:] = ['file', '-path', str(run_file_abspath)]
             with open(run_file_abspath, 'wt', encoding=UTF8, buffering=1) as run_file:
                 run_file.write('\n'.join(cmd_args_new))
-        ef = Future(loop=executor_event_loop.val)
-        tr, _ = await executor_event_loop.val.subprocess_exec(lambda: DummyResultProtocol(ef), *cmd_args, stderr=log_file, stdout=log_file,
-                                                              env={**os.environ, 'PYTHONIOENCODING': UTF8, 'PYTHONUNBUFFERED': '1'})
-        await ef
-        tr.close()
-        log_file.seek(0)
-        trace(f'\n{log_file.read()}')
+    except BaseException:
+        finish_query_run(qrun)
+        raise
+    return qrun
 
 
-async def run_cmds(dwn: str, cats: list[str], queries: list[str]) -> str | None:
-    if not queries:
-        return None
+async def run_query_attempt(qrun: QueryRun) -> int | None:
+    """Run next attempt of **qrun** query. Returns backoff (seconds) if query has to be retried, None if query is finished"""
+    params, result = qrun.params, qrun.result
+    attempt, max_attempts = result.attempts + 1, Config.query_retries + 1
+    start_time = time.monotonic()
+    run_journal.val.query_started(params, attempt)
+    try:
+        result.outcome, result.returncode = await run_process(params, qrun.cmd_args, qrun.log_file)
+    except BaseException:
+        # query failed to run, its result and log are still finalized (log is closed before it's measured)
+        result.attempts = attempt
+        result.duration += time.monotonic() - start_time
+        finish_query_run(qrun)
+        raise
+    result.attempts = attempt
+    duration = time.monotonic() - start_time
+    run_journal.val.query_finished(params, result.outcome, result.returncode, duration)
+    result.duration += duration
+    if result.outcome == QUERY_OUTCOME_OK:
+        query_history.val.record(params, duration)
+    elif attempt < max_attempts:
+        backoff = min(RETRY_BACKOFF_BASE * 2 ** (attempt - 1), RETRY_BACKOFF_MAX)
+        retry_msg = (f'\n[{Config.full_title}] Retrying \'{params.cat}:{params.dwn}\' query {params.cqn:d} / {params.cqm:d}'
+                     f' in {backoff:d} seconds ({attempt + 1:d} / {max_attempts:d})...')
+        trace(retry_msg, level=LOG_LEVEL_WARN, params=params)
+        log_to(retry_msg, qrun.log_file)
+        return backoff
+    finish_query_run(qrun)
+    return None
+
+
+def finish_query_run(qrun: QueryRun) -> None:
+    """Close query log (compressed log is complete only after that) and finalize query result"""
+    qrun.log_file.close()
+    run_status.val.query_completed()
+    result = qrun.result
+    result.end_time = datetime_str_full()
+    result.log_size = qrun.log_file_path.stat().st_size
+    if result.failed:
+        trace(f'Warning: {result!s}', params=qrun.params)
+
+
+async def run_process(params: CmdRunParams, cmd_args: list[str], log_file: TextIO) -> tuple[str, int | None]:
+    dwn, dqn = params.dwn, params.dqn
+    query_timeout, stall_timeout = Config.query_timeouts.get(dwn, 0), Config.stall_timeouts.get(dwn, 0)
+    popen_kwargs = new_process_group_kwargs() if query_timeout or stall_timeout else {}
+    output_prefix = f'{dwn}{dqn:{dwqn_fmt.val}}'
+    ef = Future(loop=executor_event_loop.val)
+    qstatus = run_status.val.attempt_started(params)
+    protocol = QueryOutputProtocol(ef, log_file, output_prefix, qstatus, params)
+    try:
+        if worker_pool and dwn in Config.worker_downloaders:
+            return await run_in_worker(params, cmd_args, protocol, qstatus)
+        tr, _ = await executor_event_loop.val.subprocess_exec(lambda: protocol, *cmd_args, env=child_env(), **popen_kwargs)
+        if popen_kwargs:
+            detached_pids.add(tr.get_pid())
+        try:
+            outcome = await watch_process(params, tr.get_pid(), ef, qstatus)
+        finally:
+            detached_pids.discard(tr.get_pid())
+            returncode = tr.get_returncode()
+            tr.close()
+    finally:
+        run_status.val.attempt_finished(params)
+    return outcome, returncode
+
+
+async def run_in_worker(params: CmdRunParams, cmd_args: list[str], protocol: QueryOutputProtocol,
+                        qstatus: QueryStatus) -> tuple[str, int | None]:
+    worker = await worker_pool.val.acquire(cmd_args[0], cmd_args[1])
+    query_task = executor_event_loop.val.create_task(worker.run_query(cmd_args[2:], lambda data: protocol.pipe_data_received(1, data)))
+    query_error: BaseException | None = None
+    returncode: int | None = None
+    try:
+        outcome = await watch_process(params, worker.pid, query_task, qstatus)
+    finally:
+        if not query_task.done():
+            query_task.cancel()
+            await gather(query_task, return_exceptions=True)
+        if not query_task.cancelled():
+            query_error = query_task.exception()
+            returncode = query_task.result() if not query_error else None
+        for fd in (1, 2):
+            protocol.pipe_connection_lost(fd, None)
+        protocol.process_exited()
+        # worker which didn't report query exit code is in unknown state (still running a query or dead), never reuse it
+        if returncode is None:
+            await worker_pool.val.discard(worker)
+        else:
+            worker_pool.val.release(worker)
+    if query_error:
+        raise query_error
+    if returncode is None and outcome == QUERY_OUTCOME_OK:
+        trace(f'[{protocol.prefix}] Worker process exited unexpectedly (exit code {worker.returncode!s})!', level=LOG_LEVEL_WARN,
+              params=params)
+        returncode = worker.returncode
+    return outcome, returncode
+
 
-    assert len(cats) == len(queries)
+async def watch_process(params: CmdRunParams, pid: int, done: Future, qstatus: QueryStatus) -> str:
+    """Wait for **done** while enforcing query / stall timeouts, process group **pid** is terminated if one is exceeded"""
+    query_timeout, stall_timeout = Config.query_timeouts.get(params.dwn, 0), Config.stall_timeouts.get(params.dwn, 0)
+    watchdog_interval = WATCHDOG_INTERVAL if query_timeout or stall_timeout else None
+    output_prefix = f'{params.dwn}{params.dqn:{dwqn_fmt.val}}'
+    while not done.done():
+        await wait((done,), timeout=watchdog_interval)
+        if done.done():
+            break
+        now = time.monotonic()
+        if query_timeout and now - qstatus.start_time > query_timeout:
+            outcome = QUERY_OUTCOME_TIMEOUT
+            trace(f'[{output_prefix}] Query timeout ({query_timeout:d} seconds) exceeded! Terminating...', level=LOG_LEVEL_WARN,
+                  params=params)
+        elif stall_timeout and now - qstatus.last_output_time > stall_timeout:
+            outcome = QUERY_OUTCOME_STALLED
+            trace(f'[{output_prefix}] No output for {stall_timeout:d} seconds, query is stalled! Terminating...', level=LOG_LEVEL_WARN,
+                  params=params)
+        else:
+            continue
+        await terminate_process_group(pid, done)
+        return outcome
+    return QUERY_OUTCOME_OK
+
+
+def child_env() -> dict[str, str]:
+    return {**os.environ, 'PYTHONIOENCODING': UTF8, 'PYTHONUNBUFFERED': '1'}
+
+
+def new_process_group_kwargs() -> dict[str, int | bool]:
+    if running_system() == OS_WINDOWS:
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def signal_process_group(pid: int, *, kill: bool) -> None:
+    try:
+        if running_system() == OS_WINDOWS:
+            if kill:
+                subprocess.run(['taskkill', '/PID', str(pid), '/T', '/F'], capture_output=True)
+            else:
+                # console processes ignore taskkill without /F, process group created with CREATE_NEW_PROCESS_GROUP receives Ctrl+Break
+                os.kill(pid, signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(pid, signal.SIGKILL if kill else signal.SIGTERM)
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+
+async def terminate_process_group(pid: int, exit_future: Future) -> None:
+    signal_process_group(pid, kill=False)
+    await wait((exit_future,), timeout=TERMINATE_GRACE_PERIOD)
+    if not exit_future.done():
+        trace(f'Process {pid:d} did not terminate in {TERMINATE_GRACE_PERIOD:d} seconds, killing...', level=LOG_LEVEL_WARN)
+        signal_process_group(pid, kill=True)
+        await wait((exit_future,), timeout=TERMINATE_GRACE_PERIOD)
+
+
+def kill_detached_processes() -> None:
+    if worker_pool:
+        detached_pids.update(worker_pool.val.pids)
+    while detached_pids:
+        signal_process_group(detached_pids.pop(), kill=True)
+
+
+def report_run_results(start_time: str) -> None:
+    failed_results = [result for result in run_results if result.failed]
+    for result in failed_results:
+        Config.failed_downloaders.setdefault(result.params.cat, set()).add(result.params.dwn)
+    report_lines = ['RUN SUMMARY:']
+    for dt in DOWNLOADERS:
+        dt_results = [result for result in run_results if result.params.dwn == dt]
+        if dt_results:
+            dt_failed_count = len([result for result in dt_results if result.failed])
+            dt_duration = sum(result.duration for result in dt_results)
+            dt_log_size = sum(result.log_size for result in dt_results)
+            report_lines.append(f' {dt.upper()}: {len(dt_results):d} queries, {dt_failed_count:d} failed, '
+                                f'{dt_duration:.1f} seconds, {dt_log_size / 1024:.1f} KiB logged')
+    if failed_results:
+        report_lines.append(f'{len(failed_results):d} / {len(run_results):d} QUERIES FAILED:')
+        report_lines.extend(f' {result!s}' for result in failed_results)
+    trace(NEWLINE.join(report_lines))
+    report_file_path = Config.dest_logs_base / f'report_{Config.script_path.stem}.json'
+    save_json(report_file_path, {
+        'title': Config.full_title,
+        'started': start_time,
+        'ended': datetime_str_full(),
+        'total': len(run_results),
+        'failed': len(failed_results),
+        'results': [result.to_json() for result in run_results],
+    })
+    trace(f'Run report saved to \'{report_file_path.as_posix()}\'')
+
+
+async def run_cmd_queue(cmd_queue: RetryQueue[CmdRunParams | QueryRun]) -> None:
+    """
+    Query runner, takes queries from **cmd_queue** until it's exhausted. Query to be retried is put back to the queue,
+    so neither this runner nor process budget slot are held during retry backoff
+    """
+    while (item := await cmd_queue.get()) is not None:
+        params = item.params if isinstance(item, QueryRun) else item
+        # new query is started (logged, timed) only once it gets a process budget slot
+        try:
+            await process_budget.val.acquire(params)
+        except BaseException:
+            if isinstance(item, QueryRun):
+                finish_query_run(item)
+            raise
+        try:
+            qrun = item if isinstance(item, QueryRun) else start_query_run(item)
+            backoff = await run_query_attempt(qrun)
+        finally:
+            process_budget.val.release(params)
+        if backoff is not None:
+            cmd_queue.put_later(qrun, backoff)
+
+
+async def run_cmds(dwn: str) -> str | None:
+    if not any(queries_all[cat][dwn] for cat in queries_all):
+        return None
 
     if dwn not in Config.downloaders:
         await sleep(1.0)  # delay this message so it isn't printed somewhere inbetween initial cmds
         trace(f'\n{dwn.upper()} SKIPPED\n')
         return None
 
+    preparer_task: Task | None = None
+    if dwn in downloader_preparers:
+        preparer, preparer_blocking = downloader_preparers[dwn]
+        preparer_task = executor_event_loop.val.create_task(preparer())
+        if preparer_blocking:
+            await preparer_task
+
+    cats = sum_lists([str(cat)] * len(queries_all[cat][dwn]) for cat in queries_all)
+    queries = sum_lists(queries_all[cat][dwn] for cat in queries_all)
+    subs = sum_lists(query_subs_all[cat][dwn] for cat in query_subs_all)
+    assert len(cats) == len(queries) == len(subs)
+
     cats_count = len(list(filter(None, [bool(queries_all[cat][dwn]) for cat in queries_all])))
 
     cats_skipped = set[str]()
+    completed_count = 0
+    cmd_params_queue: deque[CmdRunParams] = deque()
     cat_query_nums: dict[str, int] = dict.fromkeys(cats, 0)
     cat_query_maxs: dict[str, int] = {}
     [cat_query_maxs.update({_: len(list(filter(None, [qt_ for qt_ in cats if qt_ == _])))}) for _ in cats if _ not in cat_query_maxs]
@@ -99,7 +448,21 @@ async def run_cmds(dwn: str, cats: list[str], queries: list[str]) -> str | None:
                 await sleep(1.0)
                 trace(f'{dwn.upper()} category \'{cat}\' was disabled! Skipped!\n')
             continue
-        await run_cmd(CmdRunParams(query, dwn, query_idx + 1, len(queries), cat, cat_query_nums[cat], cat_query_maxs[cat]))
+        params = CmdRunParams(query, dwn, query_idx + 1, len(queries), cat, cat_query_nums[cat], cat_query_maxs[cat], subs[query_idx])
+        if run_journal.val.is_completed(params):
+            completed_count += 1
+            run_status.val.query_completed()
+            continue
+        cmd_params_queue.append(params)
+    if completed_count:
+        trace(f'{dwn.upper()}: {completed_count:d} / {len(queries):d} queries were completed by previous run, skipped')
+    cmd_queue: RetryQueue[CmdRunParams | QueryRun] = RetryQueue(order_longest_first(cmd_params_queue, query_history.val))
+    max_concurrent = min(Config.max_concurrent_queries(dwn), len(cmd_queue))
+    if max_concurrent > 1:
+        trace(f'{dwn.upper()} will process up to {max_concurrent:d} queries at once')
+    await gather(*(run_cmd_queue(cmd_queue) for _ in range(max_concurrent)))
+    if preparer_task:
+        await preparer_task
     trace(f'{dwn.upper()} COMPLETED ({cats_count - len(cats_skipped):d} / {cats_count:d} categories processed)\n')
     return dwn
 
@@ -112,15 +475,35 @@ async def run_all_cmds() -> None:
         return
     enabled_dts = [dt for dt in Config.downloaders if any(bool(queries_all[cat][dt]) for cat in queries_all)]
     finished_dts: list[str] = []
+    run_results.clear()
+    start_time = datetime_str_full()
     trace(f'\nRunning {len(enabled_dts):d} downloader(s): {", ".join(dt.upper() for dt in enabled_dts)}')
+    if Config.max_processes:
+        weights_str = ', '.join(f'{dt.upper()}: {Config.process_weights[dt]:d}' for dt in enabled_dts if dt in Config.process_weights)
+        trace(f'Total processes limit: {Config.max_processes:d}{f" (weights: {weights_str})" if weights_str else ""}')
+    query_history.reset(QueryHistory(Config.dest_logs_base / f'history_{Config.script_path.stem}.json'))
+    if query_history.val:
+        trace(f'Loaded durations history of {len(query_history.val):d} queries, longest expected queries will be executed first')
+    process_budget.reset(ProcessBudget(Config.max_processes, Config.process_weights, query_history.val.expected_duration))
+    journal_file_path = Config.dest_logs_base / f'journal_{Config.script_path.stem}.jsonl'
+    run_journal.reset(RunJournal(journal_file_path, resume=Config.resume))
+    if Config.resume:
+        trace(f'Resuming run: {len(run_journal.val):d} previously completed queries found in \'{journal_file_path.as_posix()}\'')
+    queries_total = sum(len(queries_all[cat][dt]) for cat in queries_all for dt in enabled_dts
+                        if dt not in Config.disabled_downloaders.get(cat, []))
+    status_file_path = Config.dest_logs_base / f'status_{Config.script_path.stem}.json' if Config.status_interval else None
+    run_status.reset(RunStatus(status_file_path, queries_total))
+    if status_file_path:
+        trace(f'Live status will be written to \'{status_file_path.as_posix()}\' every {Config.status_interval:d} seconds')
+        status_writer = executor_event_loop.val.create_task(run_status.val.keep_writing(Config.status_interval))
+    else:
+        status_writer = None
+    if worker_dts := [dt for dt in enabled_dts if dt in Config.worker_downloaders]:
+        trace(f'Queries of {", ".join(dt.upper() for dt in worker_dts)} will be executed by persistent worker processes')
+        worker_pool.reset(WorkerPool(env=child_env(), **new_process_group_kwargs()))
     trace('Working...')
     cv: Future[str | None]
-    for cv in as_completed(map(
-        run_cmds,
-        DOWNLOADERS,
-        [sum_lists([str(cat)] * len(queries_all[cat][dt]) for cat in queries_all) for dt in DOWNLOADERS],
-        [sum_lists(queries_all[cat][dt] for cat in queries_all) for dt in DOWNLOADERS],
-    )):
+    for cv in as_completed(map(run_cmds, DOWNLOADERS)):
         finished_dt = await cv
         if finished_dt is None:
             continue
@@ -129,14 +512,31 @@ async def run_all_cmds() -> None:
         if remaining_dts := [dt for dt in enabled_dts if dt not in finished_dts]:
             trace(f'WAITING FOR {len(remaining_dts):d} MORE: {", ".join(dt.upper() for dt in remaining_dts)}')
 
+    if status_writer:
+        status_writer.cancel()
+        await gather(status_writer, return_exceptions=True)
+    if worker_pool:
+        await worker_pool.val.close()
+    run_status.val.finish()
     trace('ALL DOWNLOADERS FINISHED WORK\n')
+    report_run_results(start_time)
 
 
 def execute() -> None:
     executor_event_loop.reset(new_event_loop())
-    executor_event_loop.val.run_until_complete(run_all_cmds())
-    executor_event_loop.val.close()
-    executor_event_loop.reset()
+    try:
+        executor_event_loop.val.run_until_complete(run_all_cmds())
+    finally:
+        kill_detached_processes()
+        worker_pool.reset()
+        if run_journal:
+            run_journal.val.close()
+            run_journal.reset()
+        if query_history:
+            query_history.val.save()
+            query_history.reset()
+        executor_event_loop.val.close()
+        executor_event_loop.reset()
 
 #
 #
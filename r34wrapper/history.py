@@ -0,0 +1,71 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import pathlib
+from collections.abc import Iterable
+
+from .containers import CmdRunParams
+from .storage import load_json, save_json
+
+__all__ = ('QueryHistory', 'order_longest_first')
+
+HISTORY_DEPTH = 5
+
+
+class QueryHistory:
+    """
+    Wall time of recently executed queries, stored per 'category:downloader:subfolder'.\n
+    Keys don't include ids or dates so they stay valid after next ids update
+    """
+    def __init__(self, path: pathlib.Path | None = None) -> None:
+        self._path = path
+        self._durations: dict[str, list[float]] = {}
+        self._changed = False
+        if path:
+            self._durations.update(
+                (k, [float(d) for d in v][-HISTORY_DEPTH:]) for k, v in load_json(path).items() if isinstance(v, list)
+            )
+
+    @staticmethod
+    def key_of(params: CmdRunParams) -> str:
+        return f'{params.cat.strip()}:{params.dwn}:{params.sub}'
+
+    def expected_duration(self, params: CmdRunParams) -> float | None:
+        durations = self._durations.get(self.key_of(params))
+        return sum(durations) / len(durations) if durations else None
+
+    def record(self, params: CmdRunParams, duration: float) -> None:
+        durations = self._durations.setdefault(self.key_of(params), [])
+        durations.append(round(duration, 1))
+        del durations[:-HISTORY_DEPTH]
+        self._changed = True
+
+    def save(self) -> None:
+        if self._path and self._changed:
+            save_json(self._path, self._durations)
+            self._changed = False
+
+    def __len__(self) -> int:
+        return len(self._durations)
+
+
+def order_longest_first(params_list: Iterable[CmdRunParams], history: QueryHistory) -> list[CmdRunParams]:
+    """
+    Sort queries by expected duration, longest first. Queries without history are considered the longest.
+    Original order is preserved if none of the queries has history
+    """
+    params_list = list(params_list)
+    expected = [history.expected_duration(params) for params in params_list]
+    if all(e is None for e in expected):
+        return params_list
+    order = sorted(range(len(params_list)), key=lambda i: -(expected[i] if expected[i] is not None else float('inf')))
+    return [params_list[i] for i in order]
+
+#
+#
+#########################################
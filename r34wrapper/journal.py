@@ -0,0 +1,101 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import hashlib
+import json
+import os
+import pathlib
+from typing import TextIO
+
+from .containers import CmdRunParams
+from .defs import QUERY_OUTCOME_OK, UTF8
+from .strings import datetime_str_full
+
+__all__ = ('RunJournal',)
+
+JOURNAL_EVENT_START = 'start'
+JOURNAL_EVENT_FINISH = 'finish'
+
+
+class RunJournal:
+    """
+    Append-only journal of query executions, one json object per line.\n
+    Every record is flushed to disk before query proceeds so an interrupted run (even a crash) leaves a valid journal
+    behind, except possibly for a partial last line which is ignored on load.
+    Queries are identified by hash of the final query string, so the same query from the same script is recognized
+    as long as script ids haven't been updated since
+    """
+    def __init__(self, path: pathlib.Path | None, *, resume: bool) -> None:
+        self._path = path
+        self._completed = set[str]()
+        self._file: TextIO | None = None
+        if path:
+            terminated = self._load() if resume else True
+            self._file = open(path, 'at' if resume else 'wt', encoding=UTF8, buffering=1)
+            if not terminated:
+                self._file.write('\n')
+
+    @staticmethod
+    def key_of(params: CmdRunParams) -> str:
+        return hashlib.sha1(params.query.encode(UTF8)).hexdigest()[:16]
+
+    def _load(self) -> bool:
+        """Returns False if journal was cut off in the middle of a line"""
+        line = ''
+        try:
+            with open(self._path, 'rt', encoding=UTF8) as infile:
+                for line in infile:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(record, dict) or record.get('event') != JOURNAL_EVENT_FINISH:
+                        continue
+                    if record.get('outcome') == QUERY_OUTCOME_OK and record.get('rc') == 0:
+                        self._completed.add(record.get('key'))
+                    else:
+                        self._completed.discard(record.get('key'))
+        except OSError:
+            pass
+        return not line or line.endswith('\n')
+
+    def _write(self, record: dict) -> None:
+        if self._file:
+            self._file.write(f'{json.dumps(record, ensure_ascii=False, separators=(",", ":"))}\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def is_completed(self, params: CmdRunParams) -> bool:
+        return self.key_of(params) in self._completed
+
+    def query_started(self, params: CmdRunParams, attempt: int) -> None:
+        self._write({
+            'event': JOURNAL_EVENT_START, 'key': self.key_of(params), 'time': datetime_str_full(),
+            'category': params.cat.strip(), 'downloader': params.dwn, 'subfolder': params.sub, 'attempt': attempt,
+        })
+
+    def query_finished(self, params: CmdRunParams, outcome: str, returncode: int | None, duration: float) -> None:
+        key = self.key_of(params)
+        if outcome == QUERY_OUTCOME_OK and returncode == 0:
+            self._completed.add(key)
+        self._write({
+            'event': JOURNAL_EVENT_FINISH, 'key': key, 'time': datetime_str_full(),
+            'outcome': outcome, 'rc': returncode, 'duration': round(duration, 1),
+        })
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self._completed)
+
+#
+#
+#########################################
@@ -0,0 +1,95 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import gzip
+import io
+import pathlib
+import zlib
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Protocol, TextIO
+
+from .defs import UTF8
+
+__all__ = ('LOG_CODECS', 'GzipLogCodec', 'LogCodec', 'codec_for_path', 'open_log_file', 'register_log_codec')
+
+GZIP_LOG_COMPRESS_LEVEL = 6
+
+
+class Decompressor(Protocol):
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+class LogCodec(ABC):
+    """
+    Streaming compression codec for per-query log files. **name** is the cmdline option value, **suffix** is appended to log file name.
+    Compressed stream must be readable while it's being written, up to the last flush (see **decompressor()**)
+    """
+    name = ''
+    suffix = ''
+
+    @abstractmethod
+    def open_write(self, path: pathlib.Path) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def decompressor(self) -> Decompressor:
+        """Incremental decompressor, fed with file contents chunk by chunk, possibly ending mid stream"""
+        ...
+
+
+class GzipLogCodec(LogCodec):
+    name = 'gzip'
+    suffix = '.gz'
+
+    def open_write(self, path: pathlib.Path) -> BinaryIO:
+        return gzip.GzipFile(path, 'wb', compresslevel=GZIP_LOG_COMPRESS_LEVEL)
+
+    def decompressor(self) -> Decompressor:
+        return _GzipMembersDecompressor()
+
+
+class _GzipMembersDecompressor:
+    """Gzip stream decompressor supporting concatenated members (file reopened for append)"""
+    def __init__(self) -> None:
+        self._dobj = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    def decompress(self, data: bytes) -> bytes:
+        chunks: list[bytes] = []
+        while data:
+            chunks.append(self._dobj.decompress(data))
+            if not self._dobj.eof:
+                break
+            data = self._dobj.unused_data
+            self._dobj = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        return b''.join(chunks)
+
+
+LOG_CODECS: dict[str, LogCodec] = {}
+
+
+def register_log_codec(codec: LogCodec) -> None:
+    LOG_CODECS[codec.name] = codec
+
+
+register_log_codec(GzipLogCodec())
+
+
+def codec_for_path(path: pathlib.Path) -> LogCodec | None:
+    """Codec matching **path** suffix, None for plain text files"""
+    return next((codec for codec in LOG_CODECS.values() if path.name.endswith(codec.suffix)), None)
+
+
+def open_log_file(path: pathlib.Path, codec: LogCodec | None) -> TextIO:
+    """Open per-query log file **path** for writing, compressed by **codec** if provided (**path** should end with codec suffix)"""
+    if not codec:
+        return open(path, 'wt', encoding=UTF8, errors='replace')
+    return io.TextIOWrapper(codec.open_write(path), encoding=UTF8, errors='replace')
+
+#
+#
+#########################################
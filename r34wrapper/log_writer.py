@@ -0,0 +1,157 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import json
+import sys
+import threading
+from locale import getpreferredencoding
+from typing import TextIO
+
+from .defs import UTF8
+
+__all__ = ('LogWriter',)
+
+# writer thread wakes up once this many characters are queued...
+LOG_BATCH_SIZE = 64 * 1024
+# ...or this many seconds passed since last write
+LOG_FLUSH_INTERVAL = 0.5
+# producers are blocked while this many characters are waiting to be written
+LOG_QUEUE_MAX_SIZE = 4 * 1024 * 1024
+
+PREF_ENCODING = getpreferredencoding()
+IO_ERR_POLICY = 'backslashreplace'
+
+
+class LogWriter:
+    """
+    Background log writer. Messages are queued in memory (up to LOG_QUEUE_MAX_SIZE characters, producers wait above that)
+    and written by a writer thread in batches, once LOG_BATCH_SIZE characters are queued or LOG_FLUSH_INTERVAL seconds passed.
+    Sinks are console, log file and JSON lines file (records are serialized by writer thread).
+    Messages written to files before they are set are kept (see **set_files()**). Once closed, messages are written synchronously
+    """
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._console_queue: list[str] = []
+        self._file_queue: list[str] = []
+        self._json_queue: list[dict] = []
+        self._queued_size = 0
+        self._writing = False
+        self._flush_requested = False
+        self._closed = False
+        self._file: TextIO | None = None
+        self._json_file: TextIO | None = None
+        self._unfiled: list[str] = []
+        self._unfiled_json: list[dict] = []
+        self._thread = threading.Thread(target=self._run, name='LogWriter', daemon=True)
+        self._thread.start()
+
+    def write(self, text: str, *, console: bool, file: bool, record: dict | None = None) -> None:
+        with self._cond:
+            if self._closed or not self._thread.is_alive():
+                self._write_batch([text] if console else [], [text] if file else [], [record] if record else [])
+                return
+            while self._queued_size >= LOG_QUEUE_MAX_SIZE and self._thread.is_alive():
+                self._cond.wait(LOG_FLUSH_INTERVAL)
+            if console:
+                self._console_queue.append(text)
+            if file:
+                self._file_queue.append(text)
+            if record:
+                self._json_queue.append(record)
+            self._queued_size += len(text)
+            if self._queued_size >= LOG_BATCH_SIZE:
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Wait until all queued messages are written"""
+        with self._cond:
+            self._flush_locked()
+
+    def set_files(self, file: TextIO | None, json_file: TextIO | None = None) -> list[str]:
+        """
+        Flush queued messages and redirect file messages to **file** and records to **json_file** (None to detach current ones).
+        Returns messages which were written while no file was set (they are written to the new files first)
+        """
+        with self._cond:
+            self._flush_locked()
+            self._file, self._json_file = file, json_file
+            unfiled, self._unfiled = self._unfiled, []
+            unfiled_json, self._unfiled_json = self._unfiled_json, []
+            self._write_batch([], unfiled if file else [], unfiled_json if json_file else [])
+            return unfiled
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+
+    def _take_queued(self) -> tuple[list[str], list[str], list[dict]]:
+        batches = self._console_queue, self._file_queue, self._json_queue
+        self._console_queue, self._file_queue, self._json_queue, self._queued_size = [], [], [], 0
+        return batches
+
+    def _has_queued(self) -> bool:
+        return bool(self._console_queue or self._file_queue or self._json_queue)
+
+    def _flush_locked(self) -> None:
+        """Wait (lock held) until writer thread is idle with nothing queued, writes queued messages itself if thread is gone"""
+        while (self._has_queued() or self._writing) and self._thread.is_alive():
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait(LOG_FLUSH_INTERVAL)
+        if self._has_queued():
+            self._write_batch(*self._take_queued())
+
+    def _run(self) -> None:
+        with self._cond:
+            while True:
+                if not (self._closed or self._flush_requested or self._queued_size >= LOG_BATCH_SIZE):
+                    self._cond.wait(LOG_FLUSH_INTERVAL)
+                self._flush_requested = False
+                if not self._has_queued():
+                    if self._closed:
+                        break
+                    continue
+                batches = self._take_queued()
+                self._writing = True
+                self._cond.notify_all()
+                self._cond.release()
+                try:
+                    self._write_batch(*batches)
+                finally:
+                    self._cond.acquire()
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write_batch(self, console_batch: list[str], file_batch: list[str], json_batch: list[dict]) -> None:
+        if console_batch:
+            console_text = ''.join(console_batch)
+            try:
+                sys.stdout.write(console_text)
+            except UnicodeError:
+                try:
+                    sys.stdout.write(console_text.encode(UTF8, errors=IO_ERR_POLICY).decode(PREF_ENCODING, errors=IO_ERR_POLICY))
+                except Exception:
+                    sys.stdout.write('<Messages were not logged due to UnicodeError>\n')
+            sys.stdout.flush()
+        if file_batch and self._file:
+            self._file.write(''.join(file_batch))
+            self._file.flush()
+        elif file_batch:
+            self._unfiled.extend(file_batch)
+        if json_batch and self._json_file:
+            self._json_file.write(''.join(f'{json.dumps(record, ensure_ascii=False)}\n' for record in json_batch))
+            self._json_file.flush()
+        elif json_batch:
+            self._unfiled_json.extend(json_batch)
+
+#
+#
+#########################################
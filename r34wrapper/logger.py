@@ -6,43 +6,77 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 #
 #
 
+import atexit
 import os
-from locale import getpreferredencoding
+import pathlib
+import time
 from typing import TextIO
 
 from .config import Config
-from .containers import Wrapper
-from .defs import UTF8
-from .strings import NEWLINE, datetime_str_nfull, timestamped_string
+from .containers import CmdRunParams, Wrapper
+from .defs import LOG_LEVEL_ERROR, LOG_LEVEL_INFO, LOG_LEVEL_NAMES, LOG_LEVEL_WARN, RUN_PHASE_STARTUP, UTF8
+from .log_writer import IO_ERR_POLICY, LogWriter
+from .storage import file_lock, load_json, save_json
+from .strings import datetime_str_nfull, timestamped_string
 
-__all__ = ('close_logfile', 'ensure_logfile', 'log_to', 'trace')
+__all__ = ('close_logfile', 'ensure_logfile', 'flush_log', 'log_to', 'set_run_phase', 'trace')
 
 logfile: Wrapper[TextIO] = Wrapper()
-buffered_strings: list[str] = []
+json_logfile: Wrapper[TextIO] = Wrapper()
+log_writer: Wrapper[LogWriter] = Wrapper()
+run_phase = Wrapper(RUN_PHASE_STARTUP)
+title_index: Wrapper[pathlib.Path] = Wrapper()
 
-PREF_ENCODING = getpreferredencoding()
-IO_ERR_POLICY = 'backslashreplace'
+TITLE_INDEX_LOCK_TIMEOUT = 60.0
+
+
+def _get_log_writer() -> LogWriter:
+    if not log_writer:
+        log_writer.reset(LogWriter())
+        atexit.register(_close_log_writer)
+    return log_writer.val
+
+
+def _close_log_writer() -> None:
+    """Write out everything still queued, called on exit (including exit by unhandled exception)"""
+    if log_writer:
+        log_writer.val.close()
 
 
 def _open_logfile() -> None:
     title_part = f'{Config.full_title}_' if Config.title else ''
     log_basename = f'log_{title_part}{datetime_str_nfull()}.log' if not Config.debug else 'log.log'
-    logfile.reset(open(Config.dest_logs_base / log_basename, 'at', encoding=UTF8, errors=IO_ERR_POLICY, buffering=1))
-    if buffered_strings:
+    logfile.reset(open(Config.dest_logs_base / log_basename, 'at', encoding=UTF8, errors=IO_ERR_POLICY))
+    if Config.log_json:
+        json_log_path = (Config.dest_logs_base / log_basename).with_suffix('.jsonl')
+        json_logfile.reset(open(json_log_path, 'at', encoding=UTF8, errors=IO_ERR_POLICY))
+    if _get_log_writer().set_files(logfile.val, json_logfile.val if json_logfile else None):
         trace('\n#^^Buffered strings dumped^^#\n', False)
 
 
 def close_logfile() -> None:
     if logfile:
         trace('\nClosing logfile...\n\n', False)
-        logfile.val.close()
-        if Config.test:
-            import os
-            os.remove(logfile.val.name)
-        logfile.reset()
-    elif buffered_strings:
-        trace(f'\nWarning: logfile isn\'t opened, buffered log messages were never dumped! Contents:\n{NEWLINE.join(buffered_strings)}')
-        buffered_strings.clear()
+        _get_log_writer().set_files(None)
+        for opened_logfile in (logfile, json_logfile):
+            if opened_logfile:
+                opened_logfile.val.close()
+                if Config.test:
+                    os.remove(opened_logfile.val.name)
+                opened_logfile.reset()
+        if Config.test and title_index:
+            for index_file_path in (title_index.val, _title_index_lock_path(title_index.val)):
+                index_file_path.unlink(missing_ok=True)
+            title_index.reset()
+    elif log_writer and (buffered_strings := log_writer.val.set_files(None)):
+        trace(f'\nWarning: logfile isn\'t opened, buffered log messages were never dumped! Contents:\n{"".join(buffered_strings)}')
+        log_writer.val.set_files(None)
+
+
+def flush_log() -> None:
+    """Wait until all traced messages are written"""
+    if log_writer:
+        log_writer.val.flush()
 
 
 def log_to(msg: str, log_file: TextIO, add_timestamp=True) -> None:
@@ -51,23 +85,33 @@ def log_to(msg: str, log_file: TextIO, add_timestamp=True) -> None:
         log_file.write(t_msg)
 
 
-def trace(msg: str, add_timestamp=True) -> None:
-    t_msg = f'{timestamped_string(msg) if add_timestamp else msg}\n'
-    try:
-        if Config.console_log:
-            print(t_msg, end='')
-    except UnicodeError:
-        try:
-            print(t_msg.encode(UTF8, errors=IO_ERR_POLICY).decode(PREF_ENCODING, errors=IO_ERR_POLICY), end='')
-        except Exception:
-            print('<Message was not logged due to UnicodeError>')
-    if logfile:
-        if buffered_strings:
-            logfile.val.writelines(buffered_strings)
-            buffered_strings.clear()
-        logfile.val.write(t_msg)
-    else:
-        buffered_strings.append(t_msg)
+def set_run_phase(phase: str) -> None:
+    run_phase.reset(phase)
+
+
+def _level_of(msg: str) -> int:
+    msg_body = msg.lstrip()
+    return LOG_LEVEL_ERROR if msg_body.startswith('Error') else LOG_LEVEL_WARN if msg_body.startswith('Warning') else LOG_LEVEL_INFO
+
+
+def trace(msg: str, add_timestamp=True, *, level: int | None = None, params: CmdRunParams | None = None) -> None:
+    """
+    Log **msg** to console (if enabled) and to log file(s) if **level** passes their verbosity threshold.
+    If **level** isn't provided, it's 'error' / 'warn' for messages starting with 'Error' / 'Warning' and 'info' otherwise.
+    **params** is the query this message is related to. Messages are written in background (see LogWriter)
+    """
+    if level is None:
+        level = _level_of(msg)
+    console = Config.console_log and level <= Config.console_level
+    file = level <= Config.log_level
+    if not (console or file):
+        return
+    record: dict[str, str | int | float] | None = None
+    if file and Config.log_json:
+        record = {'time': round(time.time(), 3), 'level': LOG_LEVEL_NAMES[level], 'phase': run_phase.val, 'msg': msg.strip('\n')}
+        if params:
+            record.update(category=params.cat.strip(), downloader=params.dwn, query=params.dqn, sub=params.sub)
+    _get_log_writer().write(f'{timestamped_string(msg) if add_timestamp else msg}\n', console=console, file=file, record=record)
 
 
 def ensure_logfile() -> None:
@@ -77,16 +121,55 @@ def ensure_logfile() -> None:
         else:
             if Config.dest_logs_base == Config.DEFAULT_PATH:
                 trace('Warning: logs path is unset, title suffix increment will use base path to look for log files')
-            calculate_title_suffix()
+            # debug log name has no title suffix so it can't reserve one, logs directory is always scanned
+            if not logfile and Config.dest_logs_base.is_dir() and not Config.debug:
+                # suffix is reserved by opening a log file with it, index is updated after that while still locked
+                index_path = _title_index_path()
+                with file_lock(_title_index_lock_path(index_path), TITLE_INDEX_LOCK_TIMEOUT):
+                    calculate_title_suffix(load_json(index_path))
+                    _open_logfile()
+                    save_json(index_path, {'title': Config.title, 'suffix': Config.title_increment_value,
+                                           'log': pathlib.Path(logfile.val.name).name})
+                    title_index.reset(index_path)
+            else:
+                calculate_title_suffix()
     if not logfile:
         _open_logfile()
 
 
-def calculate_title_suffix() -> None:
+def _title_index_path() -> pathlib.Path:
+    return Config.dest_logs_base / f'.title_{Config.title}.index'
+
+
+def _title_index_lock_path(index_path: pathlib.Path) -> pathlib.Path:
+    return index_path.with_name(f'{index_path.name}.lock')
+
+
+def _indexed_title_suffix(index: dict) -> str:
+    """Last suffix stored in title **index**, empty string if index belongs to another title or its log file is gone"""
+    suffix, log_name = index.get('suffix'), index.get('log')
+    if (index.get('title') == Config.title and isinstance(suffix, str) and suffix.isdecimal()
+            and isinstance(log_name, str) and log_name.startswith(f'log_{Config.title}{suffix}_')):
+        if (Config.dest_logs_base / log_name).is_file():
+            return suffix
+    return ''
+
+
+def calculate_title_suffix(index: dict | None = None) -> None:
+    """
+    Find next title suffix. Last used suffix is taken from title **index** (see **ensure_logfile()**),
+    logs directory is scanned for max suffix only if index is missing or inconsistent
+    """
     trace('Calculating title suffix...')
     max_suffix_len = Config.title_increment
     max_suffix_val = 0
-    if Config.dest_logs_base.is_dir():
+    indexed_suffix = _indexed_title_suffix(index) if index else ''
+    if indexed_suffix:
+        max_suffix_len = max(max_suffix_len, len(indexed_suffix))
+        max_suffix_val = int(indexed_suffix)
+    elif Config.dest_logs_base.is_dir():
+        if index:
+            trace('Warning: title index is inconsistent, scanning logs directory...')
         log_prefixes = tuple(f'{_}_{Config.title}' for _ in ('log', 'run'))
         base_idx = len(log_prefixes[0])
         with os.scandir(Config.dest_logs_base.as_posix()) as listing:
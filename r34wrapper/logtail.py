@@ -0,0 +1,96 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import pathlib
+import sys
+import time
+from argparse import ArgumentParser
+from codecs import getincrementaldecoder
+from collections import deque
+from collections.abc import Sequence
+
+from .defs import ACTION_STORE_TRUE, UTF8
+from .log_codecs import codec_for_path
+
+__all__ = ('LogReader', 'main', 'tail_log')
+
+LOG_READ_CHUNK_SIZE = 1 * 1024 * 1024
+LOG_FOLLOW_INTERVAL = 1.0
+LOG_TAIL_LINES_DEFAULT = 20
+
+
+class LogReader:
+    """
+    Incremental reader of a (possibly compressed, see **codec_for_path()**) log file, which may still be written to.
+    Each **read()** returns text appended since previous one (for compressed file - up to its last flush)
+    """
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        codec = codec_for_path(path)
+        self._decompressor = codec.decompressor() if codec else None
+        self._decoder = getincrementaldecoder(UTF8)(errors='replace')
+        self._offset = 0
+
+    def read(self, max_size=LOG_READ_CHUNK_SIZE) -> str:
+        with open(self.path, 'rb') as infile:
+            infile.seek(self._offset)
+            data = infile.read(max_size)
+        self._offset += len(data)
+        if self._decompressor:
+            data = self._decompressor.decompress(data)
+        return self._decoder.decode(data)
+
+
+def tail_log(reader: LogReader, num_lines: int) -> list[str]:
+    """
+    Read **reader** to its current end, returns last **num_lines** lines (including line ends).
+    Trailing partial line (if any) counts as the last one
+    """
+    lines: deque[str] = deque(maxlen=num_lines)
+    partial = ''
+    while text := reader.read():
+        chunk_lines = f'{partial}{text}'.split('\n')
+        partial = chunk_lines.pop()
+        lines.extend(f'{line}\n' for line in chunk_lines)
+    if partial and num_lines:
+        lines.append(partial)
+    return list(lines)
+
+
+def main(args: Sequence[str]) -> int:
+    parser = ArgumentParser(add_help=False, prog='python -m r34wrapper.logtail')
+    parser.usage = 'logtail.py [options...] PATH_TO_LOG'
+    parser.add_argument('--help', action='help', help='Print this message')
+    parser.add_argument('--follow', action=ACTION_STORE_TRUE, help='Keep printing lines appended to log, until interrupted')
+    parser.add_argument('-lines', metavar='NUM', default=LOG_TAIL_LINES_DEFAULT, type=int,
+                        help=f'Number of last lines to print. Default is {LOG_TAIL_LINES_DEFAULT:d}')
+    parser.add_argument('path', metavar='PATH_TO_LOG', type=pathlib.Path, help='Log file, plain text or compressed (\'.log.gz\')')
+    parsed = parser.parse_args(args)
+    reader = LogReader(parsed.path)
+    try:
+        lines = tail_log(reader, max(parsed.lines, 0))
+        sys.stdout.write(''.join(lines))
+        while parsed.follow:
+            time.sleep(LOG_FOLLOW_INTERVAL)
+            while text := reader.read():
+                sys.stdout.write(text)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f'Error: {e!s}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
+
+#
+#
+#########################################
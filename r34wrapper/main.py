@@ -12,9 +12,17 @@ from platform import system as running_system
 
 from .cmdargs import parse_arglist
 from .config import Config
-from .defs import MIN_PYTHON_VERSION, MIN_PYTHON_VERSION_STR, OS_WINDOWS, SUPPORTED_SYSTEMS
+from .defs import (
+    MIN_PYTHON_VERSION,
+    MIN_PYTHON_VERSION_STR,
+    OS_WINDOWS,
+    RUN_PHASE_EXECUTE,
+    RUN_PHASE_PREPARE,
+    RUN_PHASE_UPDATE,
+    SUPPORTED_SYSTEMS,
+)
 from .executor import execute
-from .logger import close_logfile, trace
+from .logger import close_logfile, flush_log, set_run_phase, trace
 from .queries import make_parser, prepare_queries, read_queries_file, update_next_ids
 from .strings import datetime_str_full
 
@@ -43,15 +51,21 @@ def run_main(args: Sequence[str]) -> int:
         at_startup()
         make_parser()
         read_queries_file()
+        set_run_phase(RUN_PHASE_PREPARE)
         prepare_queries()
+        set_run_phase(RUN_PHASE_EXECUTE)
         execute()
+        set_run_phase(RUN_PHASE_UPDATE)
         update_next_ids()
         trace(f'\n# Finished at {datetime_str_full()} #')
+        if Config.failed_downloaders:
+            result = -2
     except KeyboardInterrupt:
         trace('Warning: catched KeyboardInterrupt...')
         result = -4
     except Exception:
         import traceback
+        flush_log()
         traceback.print_exc()
         result = -3
     finally:
@@ -0,0 +1,119 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import asyncio
+import pathlib
+import random
+import time
+from asyncio import CancelledError, Semaphore, create_subprocess_exec, gather, new_event_loop, sleep, wait_for
+from asyncio.subprocess import PIPE, Process
+
+from .logger import trace
+from .storage import load_json, save_json
+
+__all__ = ('MAXID_FETCH_CONCURRENCY', 'MaxIdCache', 'fetch_maxid', 'fetch_maxids_async')
+
+MAXID_FETCH_TIMEOUT = 60
+MAXID_FETCH_RETRIES = 2
+MAXID_FETCH_CONCURRENCY = 6
+MAXID_RETRY_DELAY_BASE = 3.0
+MAXID_CACHE_TTL = 15 * 60
+MAXID_ERROR = 'ERROR'
+
+
+class MaxIdCache:
+    """Recently fetched max ids, stored per 'downloader|proxy' for **ttl** seconds"""
+    def __init__(self, path: pathlib.Path | None, ttl: int = MAXID_CACHE_TTL) -> None:
+        self._path = path
+        self._ttl = ttl
+        self._entries: dict[str, list] = {k: v for k, v in load_json(path).items() if isinstance(v, list) and len(v) == 2} if path else {}
+        self._changed = False
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry and isinstance(entry[1], (int, float)) and time.time() - entry[1] < self._ttl:
+            return str(entry[0])
+        return None
+
+    def put(self, key: str, maxid: str) -> None:
+        self._entries[key] = [maxid, int(time.time())]
+        self._changed = True
+
+    def save(self) -> None:
+        if self._path and self._changed:
+            now = time.time()
+            save_json(self._path, {k: v for k, v in self._entries.items() if now - v[1] < self._ttl})
+            self._changed = False
+
+
+def _parse_maxid(output: bytes) -> str:
+    res = output.decode(errors='replace').strip()
+    return res[res.rfind('\n') + 1:][4:]  # "RV: 1234567"
+
+
+async def _kill(proc: Process) -> None:
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+
+
+async def fetch_maxid(dt: str, arguments: list[str], semaphore: Semaphore) -> str:
+    for attempt in range(MAXID_FETCH_RETRIES + 1):
+        if attempt:
+            delay = MAXID_RETRY_DELAY_BASE * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            trace(f'{dt.upper()}: max id fetch failed, retrying in {delay:.1f} seconds...')
+            await sleep(delay)
+        async with semaphore:
+            trace(f'Executing "{" ".join(arguments)}"...')
+            proc = await create_subprocess_exec(*arguments, stdout=PIPE)
+            try:
+                output, _ = await wait_for(proc.communicate(), MAXID_FETCH_TIMEOUT)
+            except asyncio.TimeoutError:
+                trace(f'{dt.upper()}: max id fetch timed out ({MAXID_FETCH_TIMEOUT:d} seconds)!')
+                await _kill(proc)
+                continue
+            except CancelledError:
+                await _kill(proc)
+                raise
+        maxid = _parse_maxid(output)
+        if proc.returncode == 0 and maxid.isnumeric():
+            return maxid
+    return MAXID_ERROR
+
+
+async def _fetch_all(requests: dict[str, list[str]]) -> dict[str, str]:
+    semaphore = Semaphore(MAXID_FETCH_CONCURRENCY)
+    dts = list(requests)
+    results = await gather(*(fetch_maxid(dt, requests[dt], semaphore) for dt in dts))
+    return dict(zip(dts, results, strict=True))
+
+
+def fetch_maxids_async(requests: dict[str, list[str]]) -> dict[str, str]:
+    """
+    Run max id fetch commands (**requests**: downloader -> cmdline) concurrently, each with wrapper-side deadline and
+    jittered retries. Returns downloader -> max id ('ERROR' if failed). Interruption kills all running fetchers
+    """
+    if not requests:
+        return {}
+    loop = new_event_loop()
+    main_task = loop.create_task(_fetch_all(requests))
+    try:
+        return loop.run_until_complete(main_task)
+    except KeyboardInterrupt:
+        main_task.cancel()
+        loop.run_until_complete(gather(main_task, return_exceptions=True))
+        raise
+    finally:
+        loop.close()
+
+#
+#
+#########################################
@@ -6,46 +6,70 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 #
 #
 
-from collections.abc import Iterable
-from subprocess import CalledProcessError, check_output
-from threading import Lock, Thread
+import functools
+import glob
+from asyncio import Semaphore
+from collections.abc import Callable, Iterable
 
 from .config import Config
+from .containers import DownloadCollection, Query
 from .defs import (
     COLOR_LOG_DOWNLOADERS,
     DOWNLOADERS,
+    LOG_LEVEL_DEBUG,
     MIN_IDS_SEQ_LENGTH,
     PAGE_DOWNLOADERS,
     RUXX_DOWNLOADERS,
-    UTF8,
     IntSequence,
 )
-from .executor import register_queries
+from .executor import register_preparer, register_queries, update_downloader_queries
 from .logger import trace
+from .maxids import MAXID_FETCH_CONCURRENCY, MaxIdCache, fetch_maxid, fetch_maxids_async
 from .parsers import create_parser
-from .sequences import form_queries, report_queries, report_unoptimized, validate_runners, validate_sequences
+from .sequences import (
+    form_queries,
+    form_query_subs,
+    report_queries,
+    report_unoptimized,
+    validate_ids_sequences,
+    validate_runners,
+    validate_sequences,
+)
+from .storage import TextFileLines, file_lock, patch_text_lines, prune_files, save_gzip_copy
 from .strings import NEWLINE, datetime_str_nfull
 
 __all__ = ('make_parser', 'prepare_queries', 'read_queries_file', 'update_next_ids')
 
 
+MAXID_CACHE_FILE_NAME = 'maxids_cache.json'
+# compressed script backups kept per script, older ones are removed on next ids update
+MAX_SCRIPT_BACKUPS = 20
+SCRIPT_LOCK_TIMEOUT = 60.0
+
+
 class MaxIdFetchContext:
     CONTEXT_PREFETCH = 1
     CONTEXT_AUTOUPDATE = 2
     CONTEXT_UPDATE_NEXT = 3
 
 
-def fetch_maxids_if_needed(*, context: int) -> None:
-    is_context_prefetch = context == MaxIdFetchContext.CONTEXT_PREFETCH
-    if is_context_prefetch and not Config.update_prefetch:
-        return
-
+def _needed_maxid_fetches() -> tuple[list[str], list[str]]:
     queries = Config.parser.queries
     autoupdate_seqs = queries.autoupdate_seqs
     needed_autoupdates = [dt for dt in DOWNLOADERS if any(dt in autoupdate_seqs[c] for c in autoupdate_seqs if autoupdate_seqs[c][dt])
                           and dt not in Config.fetched_maxids] if autoupdate_seqs else [''] * 0
     ids_downloaders = [dt for dt in Config.downloaders if any(queries.sequences_ids[cat][dt] for cat in queries.sequences_ids)
                        and dt not in Config.fetched_maxids] if Config.update else [''] * 0
+    return needed_autoupdates, ids_downloaders
+
+
+def fetch_maxids_if_needed(*, context: int) -> None:
+    is_context_prefetch = context == MaxIdFetchContext.CONTEXT_PREFETCH
+    if is_context_prefetch and not Config.update_prefetch:
+        return
+
+    queries = Config.parser.queries
+    needed_autoupdates, ids_downloaders = _needed_maxid_fetches()
 
     if bool(needed_autoupdates or ids_downloaders):
         if is_context_prefetch:
@@ -54,54 +78,55 @@ def fetch_maxids_if_needed(*, context: int) -> None:
         fetch_maxids(set(needed_autoupdates).union(ids_downloaders))
 
 
+def _maxid_fetch_request(dt: str) -> tuple[list[str], str]:
+    """Max id fetch cmdline for **dt** downloader and its max id cache key"""
+    queries = Config.parser.queries
+    update_file_path: str = queries.sequences_paths_update[dt]
+    module_arguments: list[str] = ['-module', dt] if dt in RUXX_DOWNLOADERS else []
+    proxy = ''
+    if dt in PAGE_DOWNLOADERS:
+        module_arguments.append('pages')
+    if dt in COLOR_LOG_DOWNLOADERS:
+        module_arguments.append('--disable-log-colors')
+    if dt in queries.proxies_update and queries.proxies_update[dt] and dt not in Config.noproxy_fetches:
+        if queries.proxies_update[dt].second:
+            module_arguments.extend((queries.proxies_update[dt].first, queries.proxies_update[dt].second))
+            proxy = queries.proxies_update[dt].second
+    for extra_args in Config.extra_args:
+        if extra_args.is_for(queries.sequences_common.cur_cat, dt):
+            module_arguments.extend(extra_args.args)
+    arguments = [Config.python, update_file_path, *module_arguments, '-get_maxid', '-timeout', '20', '-retries', '1']
+    return arguments, f'{dt}|{proxy}'
+
+
 def fetch_maxids(dts: Iterable[str]) -> None:
     try:
         if not dts:
             return
         trace('Fetching max ids...')
         queries = Config.parser.queries
-        grab_threads: list[Thread] = []
         results: dict[str, str] = {dt: '' for dt in dts if queries.sequences_paths_update[dt] is not None}
-        rlock = Lock()
 
         if Config.test:
             Config.fetched_maxids.update(dict.fromkeys(results, f'{10 ** 18:d}'))
             return
 
-        def get_max_id(dtype: str) -> None:
-            update_file_path: str = queries.sequences_paths_update[dtype]
-            module_arguments: list[str] = ['-module', dtype] if dtype in RUXX_DOWNLOADERS else []
-            if dtype in PAGE_DOWNLOADERS:
-                module_arguments.append('pages')
-            if dtype in COLOR_LOG_DOWNLOADERS:
-                module_arguments.append('--disable-log-colors')
-            if dtype in queries.proxies_update and queries.proxies_update[dtype] and dtype not in Config.noproxy_fetches:
-                if queries.proxies_update[dtype].second:
-                    module_arguments.extend((queries.proxies_update[dtype].first, queries.proxies_update[dtype].second))
-            for extra_args in Config.extra_args:
-                if extra_args.is_for(queries.sequences_common.cur_cat, dtype):
-                    module_arguments.extend(extra_args.args)
-            arguments = [Config.python, update_file_path, *module_arguments, '-get_maxid', '-timeout', '20', '-retries', '1']
-            try:
-                trace(f'Executing "{" ".join(arguments)}"...')
-                res = check_output(arguments).decode(errors='replace').strip()
-                # DEBUG: do not remove
-                # trace(f'Output of {dtype.upper()}: {res}')
-            except (KeyboardInterrupt, CalledProcessError):
-                res = 'ERROR'
-            with rlock:
-                results[dtype] = res[res.rfind('\n') + 1:][4:]  # "RV: 1234567"
-
+        maxid_cache = MaxIdCache(Config.dest_logs_base / MAXID_CACHE_FILE_NAME)
+        cache_keys: dict[str, str] = {}
+        requests: dict[str, list[str]] = {}
         for dt in results:
-            grab_threads.append(Thread(target=get_max_id, args=(dt,)))
-            grab_threads[-1].start()
-        while grab_threads:
-            thread = grab_threads.pop(-1)
-            if thread.is_alive():
-                try:
-                    thread.join()
-                except KeyboardInterrupt:
-                    pass
+            requests[dt], cache_keys[dt] = _maxid_fetch_request(dt)
+            cached_maxid = maxid_cache.get(cache_keys[dt])
+            if cached_maxid:
+                trace(f'{dt.upper()}: using recently fetched max id {cached_maxid}')
+                results[dt] = cached_maxid
+                del requests[dt]
+
+        results.update(fetch_maxids_async(requests))
+        for dt in requests:
+            if results[dt].isnumeric():
+                maxid_cache.put(cache_keys[dt], results[dt])
+        maxid_cache.save()
         res_errors: list[str] = []
         for dt, result in results.items():
             try:
@@ -125,61 +150,144 @@ def make_parser() -> None:
 
 def read_queries_file() -> None:
     trace(f'\nReading queries file: \'{Config.script_path.as_posix()}\'')
-    with open(Config.script_path, 'rt', encoding=UTF8) as qfile:
-        Config.parser.queries.queries_file_lines[:] = qfile.readlines()
-
-
-def run_autoupdates() -> None:
-    trace('Running max ID autoupdates...\n')
+    Config.parser.queries.queries_file = TextFileLines(Config.script_path)
+
+
+def apply_autoupdate(dt: str, maxid: int) -> None:
+    autoupdate_seqs = Config.parser.queries.autoupdate_seqs
+    for cat in autoupdate_seqs:
+        uidseq: IntSequence | None = autoupdate_seqs[cat][dt]
+        if uidseq:
+            update_str_base = f'{cat}:{dt} id sequence extended from {uidseq.ints!s} to '
+            if len(uidseq) == 1 and uidseq[0] < 0:
+                if maxid + uidseq.ints[0] <= 0:
+                    trace(f'{cat}:{dt} id sequence extension <= 0 detected! Clamping to \'1\'!')
+                    uidseq.ints[0] = -1 * (maxid - 1)
+                delta = uidseq.ints[0]
+                uidseq.ints.clear()
+                uidseq.ints.extend((maxid + delta, maxid))
+            else:
+                uidseq.ints.append(maxid)
+            trace(f'{update_str_base}{uidseq.ints!s}')
+
+
+def find_unsolved_idseqs(dts: Iterable[str] = DOWNLOADERS) -> list[str]:
     queries = Config.parser.queries
     unsolved_idseqs: list[str] = []
-    autoupdate_seqs = queries.autoupdate_seqs
-    fetch_maxids_if_needed(context=MaxIdFetchContext.CONTEXT_AUTOUPDATE)
-    for dt, maxid_str in Config.fetched_maxids.items():
-        maxid = int(maxid_str)
-        for cat in autoupdate_seqs:
-            uidseq: IntSequence | None = autoupdate_seqs[cat][dt]
-            if uidseq:
-                update_str_base = f'{cat}:{dt} id sequence extended from {uidseq.ints!s} to '
-                if len(uidseq) == 1 and uidseq[0] < 0:
-                    if maxid + uidseq.ints[0] <= 0:
-                        trace(f'{cat}:{dt} id sequence extension <= 0 detected! Clamping to \'1\'!')
-                        uidseq.ints[0] = -1 * (maxid - 1)
-                    delta = uidseq.ints[0]
-                    uidseq.ints.clear()
-                    uidseq.ints.extend((maxid + delta, maxid))
-                else:
-                    uidseq.ints.append(maxid)
-                trace(f'{update_str_base}{uidseq.ints!s}')
     for cat in queries.sequences_ids:
-        for dt in queries.sequences_ids[cat]:
+        for dt in dts:
             if queries.sequences_ids[cat][dt] is not None and len(queries.sequences_ids[cat][dt]) < MIN_IDS_SEQ_LENGTH:
                 unsolved_idseqs.append(f'{cat}:{dt}')
                 trace(f'{cat}:{dt} sequence is not fixed! \'{queries.sequences_ids[cat][dt]!s}\'')
+    return unsolved_idseqs
+
+
+def run_autoupdates() -> None:
+    trace('Running max ID autoupdates...\n')
+    fetch_maxids_if_needed(context=MaxIdFetchContext.CONTEXT_AUTOUPDATE)
+    for dt, maxid_str in Config.fetched_maxids.items():
+        apply_autoupdate(dt, int(maxid_str))
+    unsolved_idseqs = find_unsolved_idseqs()
     assert len(unsolved_idseqs) == 0
 
 
+def pipelined_fetch_enabled() -> bool:
+    return Config.pipeline_fetch and not Config.no_download and not Config.test
+
+
+async def fetch_maxid_pipelined(dt: str, autoupdate: bool, semaphore: Semaphore, maxid_cache: MaxIdCache) -> None:
+    """
+    Fetch max id of **dt** downloader right before its queries are executed. If **dt** has autoupdate sequences
+    its queries are formed from the result, if fetch fails or sequences are still unresolved the downloader is skipped
+    """
+    queries = Config.parser.queries
+    arguments, cache_key = _maxid_fetch_request(dt)
+    maxid = maxid_cache.get(cache_key)
+    if maxid:
+        trace(f'{dt.upper()}: using recently fetched max id {maxid}')
+    else:
+        maxid = await fetch_maxid(dt, arguments, semaphore)
+        if maxid.isnumeric():
+            maxid_cache.put(cache_key, maxid)
+            maxid_cache.save()
+    try:
+        assert maxid.isnumeric(), f'Error in fetch \'{dt}\' max id result!'
+        trace(f'{dt.upper()}: {maxid}')
+        Config.fetched_maxids[dt] = maxid
+        if not autoupdate:
+            return
+        apply_autoupdate(dt, int(maxid))
+        assert len(find_unsolved_idseqs((dt,))) == 0, f'{dt.upper()} id sequences were not fixed!'
+        validate_ids_sequences(queries, dt)
+    except (AssertionError, OSError) as err:
+        skip_msg = 'its queries will be skipped' if autoupdate else 'its ids will be fetched later'
+        trace(f'{err!s}\n{dt.upper()} max id is unavailable, {skip_msg}!')
+        if autoupdate:
+            for cat in queries.sequences_paths:
+                Config.disabled_downloaders.setdefault(cat, set()).add(dt)
+                Config.failed_downloaders.setdefault(cat, set()).add(dt)
+        return
+    queries_dt = form_queries(queries, [pdt for pdt in DOWNLOADERS if pdt != dt])
+    queries_report: DownloadCollection[list[Query]] = DownloadCollection()
+    queries_report.update({cat: {dt: queries_dt[cat][dt]} for cat in queries_dt})
+    report_queries(queries_report)
+    update_downloader_queries(dt, queries_dt, form_query_subs(queries))
+
+
+def register_pipelined_fetches() -> list[str]:
+    """
+    Register max id fetches as downloader preparers, returns downloaders with unresolved autoupdate sequences (queries pending).
+    Autoupdate sequences of downloaders without updater can never be resolved, this fails the same way non-pipelined autoupdate does
+    """
+    queries = Config.parser.queries
+    needed_autoupdates, ids_downloaders = _needed_maxid_fetches()
+    unsolved_idseqs = find_unsolved_idseqs([dt for dt in needed_autoupdates if queries.sequences_paths_update[dt] is None])
+    assert len(unsolved_idseqs) == 0
+    semaphore = Semaphore(MAXID_FETCH_CONCURRENCY)
+    maxid_cache = MaxIdCache(Config.dest_logs_base / MAXID_CACHE_FILE_NAME)
+    fetch_dts = [dt for dt in DOWNLOADERS if dt in needed_autoupdates + ids_downloaders and queries.sequences_paths_update[dt] is not None]
+    for dt in fetch_dts:
+        register_preparer(dt, functools.partial(fetch_maxid_pipelined, dt, dt in needed_autoupdates, semaphore, maxid_cache),
+                          blocking=dt in needed_autoupdates)
+    if fetch_dts:
+        trace(f'Max ids will be fetched in background for: {", ".join(dt.upper() for dt in fetch_dts)}')
+    return [dt for dt in needed_autoupdates if dt in fetch_dts]
+
+
 def prepare_queries() -> None:
     queries = Config.parser.queries
     trace('Analyzing queries file strings...')
     Config.parser.parse_queries_file()
     trace('Sequences parsed successfully\n')
-    fetch_maxids_if_needed(context=MaxIdFetchContext.CONTEXT_PREFETCH)
-    if queries.autoupdate_seqs:
-        trace('[Autoupdate] validating runners...\n')
-        validate_runners(queries)
-        run_autoupdates()
+    pending_dts: list[str] = []
+    if pipelined_fetch_enabled():
+        pending_dts = register_pipelined_fetches()
+    else:
+        fetch_maxids_if_needed(context=MaxIdFetchContext.CONTEXT_PREFETCH)
+        if queries.autoupdate_seqs:
+            trace('[Autoupdate] validating runners...\n')
+            validate_runners(queries)
+            run_autoupdates()
     trace('Validating sequences...\n')
     validate_sequences(queries)
     validate_runners(queries)
     trace('Sequences validated. Finalizing...\n')
-    if Config.debug:
-        trace('[DEBUG] Unoptimized:')
+    if Config.debug and not pending_dts:
+        trace('[DEBUG] Unoptimized:', level=LOG_LEVEL_DEBUG)
         report_unoptimized(queries)
-        trace('\n\nFinals:')
-    queries_final = form_queries(queries)
+        trace('\n\nFinals:', level=LOG_LEVEL_DEBUG)
+    queries_final = form_queries(queries, pending_dts)
     report_queries(queries_final)
-    register_queries(queries_final)
+    register_queries(queries_final, form_query_subs(queries))
+
+
+def _next_ids_line(ids_line: str, *, maxid: int) -> str:
+    ids_at_line = ids_line.strip().split(' ')
+    return ' '.join((ids_at_line[0], *ids_at_line[2:], f'{maxid:d}'))
+
+
+def _script_backups_pattern(script_name: str) -> str:
+    return f'{glob.escape(script_name)}_bak_*.list.gz'
 
 
 def update_next_ids() -> None:
@@ -196,30 +304,11 @@ def update_next_ids() -> None:
     queries = Config.parser.queries
     queries_file_name = Config.script_path.name
 
-    filename_bak = f'{Config.script_path.name}_bak_{datetime_str_nfull()}.list'
-    trace(f'File: \'{Config.script_path.name}\', backup file: \'{filename_bak}\'')
+    filename_bak = f'{queries_file_name}_bak_{datetime_str_nfull()}.list.gz'
+    trace(f'File: \'{queries_file_name}\', backup file: \'{filename_bak}\'')
     try:
         fetch_maxids_if_needed(context=MaxIdFetchContext.CONTEXT_UPDATE_NEXT)
         if Config.fetched_maxids:
-            trace(f'\nSaving backup to \'{filename_bak}\'...')
-            bak_fullpath = Config.dest_bak_base / filename_bak
-            with open(bak_fullpath, 'wt', encoding=UTF8, buffering=1) as outfile_bak:
-                outfile_bak.writelines(queries.queries_file_lines)
-                trace('Saving done')
-
-            trace(f'\nSetting read-only permissions for \'{filename_bak}\'...')
-            perm = 0
-            try:
-                bak_fullpath.chmod(0o100444)  # S_IFREG | S_IRUSR | S_IRGRP | S_IROTH
-                perm = bak_fullpath.stat().st_mode
-                assert (perm & 0o777) == 0o444
-                trace('Permissions successfully updated')
-            except AssertionError:
-                trace(f'Warning: permissions mismatch \'{perm:o}\' != \'444\', manual fix required')
-            except Exception:
-                trace('Warning: permissions not updated, manual fix required')
-
-            trace(f'\nWriting updated queries to \'{queries_file_name}\'...')
             maxids: dict[str, int] = {dt: int(Config.fetched_maxids[dt]) for dt in Config.fetched_maxids}
             for dt in Config.update_offsets:
                 uoffset = Config.update_offsets[dt]
@@ -228,18 +317,48 @@ def update_next_ids() -> None:
                     trace(f'Applying {dt.upper()} update offset {uoffset:d}: {maxids[dt] - uoffset:d} -> {maxids[dt]:d}')
                 else:
                     trace(f'Warning: {dt.upper()} autoupdate offset ({uoffset:d}) was provided but its max id is not being updated')
+            ids_patches: dict[int, Callable[[str], str]] = {}
             for cat in queries.sequences_ids:
                 dtseq: tuple[str, IntSequence | None]
                 for i, dtseq in enumerate(queries.sequences_ids[cat].items()):
                     dt, seq = dtseq
-                    line_n = (seq.line_num - 1) if seq and dt in maxids else None
+                    if Config.keep_failed_ids and seq and dt in maxids and dt in Config.failed_downloaders.get(cat, []):
+                        trace(f'Warning: some of \'{cat}:{dt}\' queries failed, ids will not be advanced!')
+                        seq = None
+                    line_n = (seq.line_num - 1) if seq and dt in maxids and seq.offset >= 0 else None
                     trace(f'{"W" if line_n else "Not w"}riting \'{cat}:{dt}\' ids at idx {i:d}, line {line_n + 1 if line_n else -1:d}...')
                     if line_n:
-                        ids_at_line = queries.queries_file_lines[line_n].strip().split(' ')
-                        queries.queries_file_lines[line_n] = ' '.join((ids_at_line[0], *ids_at_line[2:], f'{maxids[dt]:d}\n'))
-                trace(f'Writing \'{cat}\' ids done')
-            with open(Config.script_path, 'wt', encoding=UTF8, buffering=1) as outfile:
-                outfile.writelines(queries.queries_file_lines)
+                        ids_patches[seq.offset] = functools.partial(_next_ids_line, maxid=maxids[dt])
+
+            # another run may be updating (or has already updated) the same script, ids are only patched in the lines we've read.
+            # lock file is kept in backups folder (same for all runs of the script), not in user's script folder
+            lock_path = Config.dest_bak_base / f'.{queries_file_name}.lock'
+            with file_lock(lock_path, SCRIPT_LOCK_TIMEOUT):
+                if isinstance(queries.queries_file, TextFileLines) and queries.queries_file.is_modified():
+                    raise OSError(f'\'{queries_file_name}\' was modified after it was read (by another run?), ids will not be updated')
+
+                trace(f'\nSaving backup to \'{filename_bak}\'...')
+                bak_fullpath = Config.dest_bak_base / filename_bak
+                save_gzip_copy(Config.script_path, bak_fullpath)
+                trace('Saving done')
+
+                trace(f'\nSetting read-only permissions for \'{filename_bak}\'...')
+                perm = 0
+                try:
+                    bak_fullpath.chmod(0o100444)  # S_IFREG | S_IRUSR | S_IRGRP | S_IROTH
+                    perm = bak_fullpath.stat().st_mode
+                    assert (perm & 0o777) == 0o444
+                    trace('Permissions successfully updated')
+                except AssertionError:
+                    trace(f'Warning: permissions mismatch \'{perm:o}\' != \'444\', manual fix required')
+                except Exception:
+                    trace('Warning: permissions not updated, manual fix required')
+
+                for old_bak_path in prune_files(Config.dest_bak_base, _script_backups_pattern(queries_file_name), MAX_SCRIPT_BACKUPS):
+                    trace(f'Removed old backup \'{old_bak_path.name}\'')
+
+                trace(f'\nWriting updated queries to \'{queries_file_name}\'...')
+                patch_text_lines(Config.script_path, ids_patches)
             trace('Writing done\n\nNext ids update successfully completed')
         else:
             trace('No id sequences were used, next ids update cancelled')
@@ -0,0 +1,100 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import hashlib
+import os
+import pathlib
+import shutil
+
+from .storage import load_json, save_json
+
+__all__ = ('RunnerCache', 'contents_fingerprint', 'path_fingerprint', 'python_fingerprint', 'python_prefix')
+
+VERSION_FILE_NAMES = ('version.py', 'VERSION', 'pyproject.toml', 'setup.py')
+VENV_CONFIG_FILE_NAME = 'pyvenv.cfg'
+
+
+def _stat_str(path: pathlib.Path) -> str:
+    try:
+        st = path.stat()
+        return f'{st.st_mtime_ns:d}:{st.st_size:d}'
+    except OSError:
+        return '-'
+
+
+def python_prefix(python: str) -> pathlib.Path:
+    """
+    sys.prefix of python executable without starting it: venv folder if there is a venv config
+    next to the executable (not resolved) or one level above, otherwise base installation folder
+    """
+    python_path = pathlib.Path(os.path.abspath(shutil.which(python) or python))
+    for venv_dir in (python_path.parent, python_path.parent.parent):
+        if (venv_dir / VENV_CONFIG_FILE_NAME).is_file():
+            return venv_dir
+    base_dir = python_path.resolve().parent
+    return base_dir.parent if base_dir.name in ('bin', 'Scripts') else base_dir
+
+
+def python_fingerprint(python: str) -> str:
+    """Python executable fingerprint: real path + mtime + size and its prefix (venvs of the same interpreter differ)"""
+    python_path = pathlib.Path(shutil.which(python) or python).resolve()
+    return f'{python_path.as_posix()}|{_stat_str(python_path)}|{python_prefix(python).as_posix()}'
+
+
+def path_fingerprint(path: str) -> str:
+    """
+    Downloader fingerprint: mtime + size of the path itself, of every entry within it
+    and of version files within its immediate subfolders (where 'version.py' is normally located)
+    """
+    root = pathlib.Path(path)
+    parts = [_stat_str(root)]
+    if root.is_dir():
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            entry_path = pathlib.Path(entry.path)
+            parts.append(f'{entry.name}={_stat_str(entry_path)}')
+            if entry.is_dir():
+                parts.extend(f'{entry.name}/{vname}={_stat_str(entry_path / vname)}'
+                             for vname in VERSION_FILE_NAMES if (entry_path / vname).is_file())
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def contents_fingerprint(path: str) -> str:
+    """Fingerprint of file contents (used for requirements)"""
+    try:
+        with open(path, 'rb') as infile:
+            return hashlib.sha1(infile.read()).hexdigest()
+    except OSError:
+        return '-'
+
+
+class RunnerCache:
+    """
+    Persistent cache of successful runner checks, 'runner_type:path' -> fingerprint.\n
+    A check is skipped if fingerprint of its runner hasn't changed since it last passed
+    """
+    def __init__(self, path: pathlib.Path | None, *, load: bool = True) -> None:
+        self._path = path
+        self._fingerprints: dict[str, str] = {k: v for k, v in load_json(path).items() if isinstance(v, str)} if path and load else {}
+        self._changed = False
+
+    def is_valid(self, key: str, fingerprint: str) -> bool:
+        return self._fingerprints.get(key) == fingerprint
+
+    def store(self, key: str, fingerprint: str) -> None:
+        if self._fingerprints.get(key) != fingerprint:
+            self._fingerprints[key] = fingerprint
+            self._changed = True
+
+    def save(self) -> None:
+        if self._path and self._changed:
+            save_json(self._path, self._fingerprints)
+            self._changed = False
+
+#
+#
+#########################################
@@ -0,0 +1,142 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+from asyncio import Future, get_running_loop
+from collections import deque
+from collections.abc import Callable, Iterable
+from typing import Generic, TypeVar
+
+from .containers import CmdRunParams
+
+__all__ = ('ProcessBudget', 'RetryQueue')
+
+QT = TypeVar('QT')
+
+
+class ProcessBudget:
+    """
+    Limits total weight of simultaneously running child processes across all downloaders.\n
+    Waiting downloaders take turns: a slot is granted to the next downloader in line, so a downloader with a long queue
+    can't monopolize the budget. If expected durations are known the downloader whose next query is expected to take
+    the longest goes first instead. Capacity of 0 means no limit
+    """
+    def __init__(self, capacity: int, weights: dict[str, int],
+                 expected_duration: Callable[[CmdRunParams], float | None] | None = None) -> None:
+        self._capacity = capacity
+        self._weights = weights
+        self._expected_duration = expected_duration
+        self._used = 0
+        self._waiters: dict[str, deque[tuple[CmdRunParams, Future[None]]]] = {}
+        self._turns: deque[str] = deque()
+
+    def weight_of(self, params: CmdRunParams) -> int:
+        weight = max(self._weights.get(params.dwn, 1), 1)
+        return min(weight, self._capacity) if self._capacity else weight
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    async def acquire(self, params: CmdRunParams) -> None:
+        weight = self.weight_of(params)
+        if not self._capacity or (not self._turns and self._used + weight <= self._capacity):
+            self._used += weight
+            return
+        fut: Future[None] = get_running_loop().create_future()
+        if params.dwn not in self._waiters:
+            self._waiters[params.dwn] = deque()
+        self._waiters[params.dwn].append((params, fut))
+        if params.dwn not in self._turns:
+            self._turns.append(params.dwn)
+        try:
+            await fut
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                self.release(params)
+            else:
+                self._discard(params.dwn, fut)
+            raise
+
+    def release(self, params: CmdRunParams) -> None:
+        self._used -= self.weight_of(params)
+        self._grant()
+
+    def _discard(self, dwn: str, fut: Future[None]) -> None:
+        waiters = self._waiters.get(dwn)
+        if waiters:
+            for waiter in list(waiters):
+                if waiter[1] is fut:
+                    waiters.remove(waiter)
+        if not waiters and dwn in self._turns:
+            self._turns.remove(dwn)
+        self._grant()
+
+    def _next_in_line(self) -> str:
+        if self._expected_duration:
+            expected = [self._expected_duration(self._waiters[dwn][0][0]) for dwn in self._turns]
+            if any(e is not None for e in expected):
+                longest = max(range(len(expected)), key=lambda i: expected[i] if expected[i] is not None else float('inf'))
+                return self._turns[longest]
+        return self._turns[0]
+
+    def _grant(self) -> None:
+        while self._turns:
+            dwn = self._next_in_line()
+            params, fut = self._waiters[dwn][0]
+            weight = self.weight_of(params)
+            if self._used + weight > self._capacity:
+                break
+            self._waiters[dwn].popleft()
+            self._turns.remove(dwn)
+            if self._waiters[dwn]:
+                self._turns.append(dwn)
+            if not fut.done():
+                self._used += weight
+                fut.set_result(None)
+
+
+class RetryQueue(Generic[QT]):
+    """
+    Queue of downloader's queries shared by its concurrent query runners. Failed query can be put back to become available
+    again after a delay, its runner is free to process other queries meanwhile.
+    **get()** waits while queue is empty but some queries are delayed, returns None once there is nothing left
+    """
+    def __init__(self, items: Iterable[QT]) -> None:
+        self._items: deque[QT] = deque(items)
+        self._delayed = 0
+        self._waiters: list[Future[None]] = []
+
+    def __len__(self) -> int:
+        return len(self._items) + self._delayed
+
+    async def get(self) -> QT | None:
+        while not self._items and self._delayed:
+            waiter: Future[None] = get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        return self._items.popleft() if self._items else None
+
+    def put_later(self, item: QT, delay: float) -> None:
+        self._delayed += 1
+        get_running_loop().call_later(delay, self._put_delayed, item)
+
+    def _put_delayed(self, item: QT) -> None:
+        self._delayed -= 1
+        self._items.append(item)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+#
+#
+#########################################
@@ -6,14 +6,18 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 #
 #
 
+import pathlib
 import re
+from collections.abc import Collection
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import check_output
 
 from .config import Config
-from .containers import DownloadCollection, Queries
+from .containers import DownloadCollection, Queries, Query
 from .defs import (
     APP_NAMES,
     DOWNLOADERS,
+    LOG_LEVEL_DEBUG,
     MIN_PYTHON_VERSION,
     MIN_PYTHON_VERSION_STR,
     PAGE_DOWNLOADERS,
@@ -25,53 +29,29 @@ from .defs import (
     IntSequence,
 )
 from .logger import trace
-from .strings import NEWLINE, path_args
+from .runners import RunnerCache, contents_fingerprint, path_fingerprint, python_fingerprint
+from .strings import NEWLINE, date_str_md, split_into_args
 
-__all__ = ('form_queries', 'report_queries', 'report_unoptimized', 'validate_runners', 'validate_sequences')
+__all__ = ('form_queries', 'form_query_subs', 'report_queries', 'report_unoptimized', 'validate_ids_sequences', 'validate_runners',
+           'validate_sequences')
+
+MAX_RUNNER_PROBES = 16
+QUERY_PENDING_PLACEHOLDER = '<pending max id fetch>'
+RUNNER_CACHE_FILE_NAME = 'runners_cache.json'
 
 _validated_runners = set[str]()
 
+_re_complex_sub = re.compile(r'[/\\:]')
 
-def validate_runners(queries: Queries) -> None:
-    if 'all' in _validated_runners:
-        return
 
-    checked_reqs = set[str]()
-    checked_paths = set[str]()
+def _probe_version(path: str) -> str:
+    out = check_output((Config.python, path, '--version')).decode().strip()
+    return out[out.rfind('\n') + 1:]
 
-    runner_type_python = 'python'
-    if runner_type_python not in _validated_runners:
-        trace('Looking for python executable...')
-        re_py_ver = re.compile(r'^[Pp]ython (\d)\.(\d{1,2})\.(\d+)$')
-        out_py = check_output((Config.python, '-V'))
-        out_py_str = out_py.decode().strip()
-        match_py_ver = re_py_ver.fullmatch(out_py_str)
-        if not match_py_ver:
-            raise OSError(f'Error: invalid python executable \'{Config.python}\'!')
-        fetched_py_ver = int(match_py_ver.group(1)), int(match_py_ver.group(2))
-        if fetched_py_ver < MIN_PYTHON_VERSION:
-            raise OSError(f'Minimum python version required is {MIN_PYTHON_VERSION_STR}!')
-        _validated_runners.add(runner_type_python)
-        trace(f'Found python {".".join(match_py_ver.groups())}')
-    if Config.test is True:
-        return
-    if Config.install:
-        for dtr, rpath in queries.sequences_paths_reqs.items():
-            runner_type_install = f'{dtr}_install'
-            if not rpath or runner_type_install in _validated_runners or dtr not in Config.downloaders:
-                continue
-            if rpath in checked_reqs:
-                trace(f'{dtr} requirements path is already checked!')
-                continue
-            checked_reqs.add(rpath)
-            try:
-                trace(f'Installing {dtr} requirements...')
-                trace(check_output((Config.python, '-m', 'pip', 'install', '-r', rpath), universal_newlines=True).strip())
-                _validated_runners.add(runner_type_install)
-                trace('Done')
-            except Exception:
-                trace(f'Error: invalid {dtr} requirements path found: \'{rpath}\'!')
-                raise OSError
+
+def _collect_version_probes(queries: Queries) -> list[tuple[str, str, str, str, str]]:
+    checked_paths = set[str]()
+    probes: list[tuple[str, str, str, str, str]] = []
     if not Config.no_download:
         for cat in queries.sequences_paths:
             for dtd in queries.sequences_paths[cat]:
@@ -85,17 +65,7 @@ def validate_runners(queries: Queries) -> None:
                     trace(f'{dtd} downloader path is already checked!')
                     continue
                 checked_paths.add(dpath)
-                try:
-                    trace(f'Looking for {dtd} downloader...')
-                    out_d = check_output((Config.python, dpath, '--version'))
-                    out_d_str = out_d.decode().strip()
-                    out_d_str = out_d_str[out_d_str.rfind('\n') + 1:]
-                    assert out_d_str.startswith(APP_NAMES[dtd]), f'Unexpected output for {dtd}: {out_d_str[:min(len(out_d_str), 20)]}!'
-                    _validated_runners.add(runner_type_download)
-                    trace(f'Found \'{dpath}\'')
-                except Exception:
-                    trace(f'Error: invalid {dtd} downloader found at: \'{dpath}\' ({cat})!')
-                    raise OSError
+                probes.append((runner_type_download, dtd, 'downloader', dpath, f' ({cat})'))
     if Config.update:
         for dtu, upath in queries.sequences_paths_update.items():
             if not upath or dtu not in Config.downloaders:
@@ -107,16 +77,98 @@ def validate_runners(queries: Queries) -> None:
                 trace(f'{dtu} updater path is already checked!')
                 continue
             checked_paths.add(upath)
+            probes.append((runner_type_update, dtu, 'updater', upath, ''))
+    return probes
+
+
+def validate_runners(queries: Queries) -> None:
+    """
+    Checks python executable, installs requirements (if requested) and checks every downloader / updater.\n
+    Checks which passed before are skipped if their runner fingerprint is unchanged (see runner cache).
+    Each check is a cold interpreter start so version checks are executed concurrently. Requirements are installed one by one
+    (concurrent pip runs within the same environment are unsafe) and before version checks (which may depend on them)
+    """
+    if 'all' in _validated_runners:
+        return
+
+    runner_cache = RunnerCache(Config.dest_logs_base / RUNNER_CACHE_FILE_NAME if not Config.test else None, load=not Config.revalidate)
+    try:
+        _validate_runners(queries, runner_cache)
+    finally:
+        runner_cache.save()
+
+
+def _validate_runners(queries: Queries, runner_cache: RunnerCache) -> None:
+    checked_reqs = set[str]()
+    runner_type_python = 'python'
+    py_fingerprint = python_fingerprint(Config.python)
+    py_key = f'{runner_type_python}:{Config.python}'
+    if runner_type_python not in _validated_runners and runner_cache.is_valid(py_key, py_fingerprint):
+        _validated_runners.add(runner_type_python)
+        trace(f'Python executable \'{Config.python}\' is unchanged since last check, skipped')
+    version_probes: list[tuple[str, str, str, str, str]] = []
+    for probe in _collect_version_probes(queries) if not Config.test else []:
+        runner_type, dt, runner_kind, path, _ = probe
+        if runner_cache.is_valid(f'{runner_type}:{path}', f'{py_fingerprint}|{path_fingerprint(path)}'):
+            _validated_runners.add(runner_type)
+            trace(f'{dt} {runner_kind} \'{path}\' is unchanged since last check, skipped')
+        else:
+            version_probes.append(probe)
+    with ThreadPoolExecutor(max_workers=MAX_RUNNER_PROBES) as pool:
+        py_future = pool.submit(check_output, (Config.python, '-V')) if runner_type_python not in _validated_runners else None
+        version_futures = [] if Config.install else [pool.submit(_probe_version, probe[3]) for probe in version_probes]
+        if py_future:
+            trace('Looking for python executable...')
+            re_py_ver = re.compile(r'^[Pp]ython (\d)\.(\d{1,2})\.(\d+)$')
+            out_py = py_future.result()
+            out_py_str = out_py.decode().strip()
+            match_py_ver = re_py_ver.fullmatch(out_py_str)
+            if not match_py_ver:
+                raise OSError(f'Error: invalid python executable \'{Config.python}\'!')
+            fetched_py_ver = int(match_py_ver.group(1)), int(match_py_ver.group(2))
+            if fetched_py_ver < MIN_PYTHON_VERSION:
+                raise OSError(f'Minimum python version required is {MIN_PYTHON_VERSION_STR}!')
+            _validated_runners.add(runner_type_python)
+            runner_cache.store(py_key, py_fingerprint)
+            trace(f'Found python {".".join(match_py_ver.groups())}')
+        if Config.test is True:
+            return
+        if Config.install:
+            for dtr, rpath in queries.sequences_paths_reqs.items():
+                runner_type_install = f'{dtr}_install'
+                if not rpath or runner_type_install in _validated_runners or dtr not in Config.downloaders:
+                    continue
+                if rpath in checked_reqs:
+                    trace(f'{dtr} requirements path is already checked!')
+                    continue
+                checked_reqs.add(rpath)
+                install_key, install_fingerprint = f'{runner_type_install}:{rpath}', f'{py_fingerprint}|{contents_fingerprint(rpath)}'
+                if runner_cache.is_valid(install_key, install_fingerprint):
+                    _validated_runners.add(runner_type_install)
+                    trace(f'{dtr} requirements \'{rpath}\' are unchanged since last install, skipped')
+                    continue
+                try:
+                    trace(f'Installing {dtr} requirements...')
+                    trace(check_output((Config.python, '-m', 'pip', 'install', '-r', rpath), universal_newlines=True).strip())
+                    _validated_runners.add(runner_type_install)
+                    runner_cache.store(install_key, install_fingerprint)
+                    trace('Done')
+                except Exception:
+                    trace(f'Error: invalid {dtr} requirements path found: \'{rpath}\'!')
+                    raise OSError
+            version_futures = [pool.submit(_probe_version, probe[3]) for probe in version_probes]
+        for (runner_type, dt, runner_kind, path, location), version_future in zip(version_probes, version_futures, strict=True):
             try:
-                trace(f'Looking for {dtu} updater...')
-                out_u = check_output((Config.python, upath, '--version'))
-                out_u_str = out_u.decode().strip()
-                out_u_str = out_u_str[out_u_str.rfind('\n') + 1:]
-                assert out_u_str.startswith(APP_NAMES[dtu]), f'Unexpected output for {dtu}: {out_u_str[:min(len(out_u_str), 20)]}!'
-                _validated_runners.add(runner_type_update)
-                trace(f'Found \'{upath}\'')
+                trace(f'Looking for {dt} {runner_kind}...')
+                out_str = version_future.result()
+                assert out_str.startswith(APP_NAMES[dt]), f'Unexpected output for {dt}: {out_str[:min(len(out_str), 20)]}!'
+                _validated_runners.add(runner_type)
+                runner_cache.store(f'{runner_type}:{path}', f'{py_fingerprint}|{path_fingerprint(path)}')
+                trace(f'Found \'{path}\'')
             except Exception:
-                trace(f'Error: invalid {dtu} updater found at: \'{upath}\'!')
+                for pending_future in version_futures:
+                    pending_future.cancel()
+                trace(f'Error: invalid {dt} {runner_kind} found at: \'{path}\'{location}!')
                 raise OSError
     _validated_runners.add('all')
 
@@ -132,19 +184,7 @@ def validate_sequences(queries: Queries) -> None:
                 trace(f'Warning: category \'{cat}\' is not in enabled categories list! Will be skipped!')
                 Config.disabled_downloaders[cat] = set(DOWNLOADERS)
     for dt in DOWNLOADERS:
-        for cat in queries.sequences_ids:
-            intseq: IntSequence | None = queries.sequences_ids[cat][dt]
-            ivlist = list(intseq.ints if intseq else [])
-            for iv in range(1, len(ivlist)):
-                if ivlist[iv - 1] >= ivlist[iv]:
-                    if ivlist[iv - 1] > ivlist[iv] or iv > 1:
-                        trace(f'Error: {cat}:{dt} ids sequence is corrupted at idx {iv - 1:d}, {ivlist[iv - 1]:d} >= {ivlist[iv]:d}!')
-                        raise OSError
-                    else:
-                        trace(f'{cat}:{dt} ids sequence forms zero-length range {ivlist[iv - 1]:d}-{ivlist[iv] - 1:d}! Will be skipped!')
-                        if cat not in Config.disabled_downloaders:
-                            Config.disabled_downloaders[cat] = set()
-                        Config.disabled_downloaders[cat].add(dt)
+        validate_ids_sequences(queries, dt)
         for cat in queries.sequences_paths:
             if bool(queries.sequences_paths[cat][dt]) != (bool(queries.sequences_ids[cat][dt] or queries.sequences_tags[cat][dt])):
                 trace(f'Error: sequence list existance for {cat}:{dt} paths/ids mismatch!')
@@ -156,74 +196,169 @@ def validate_sequences(queries: Queries) -> None:
                 raise OSError
 
 
-def _get_base_qs(queries: Queries) -> DownloadCollection[str]:
-    def has_ids(cat: str, cdt: str) -> bool:
-        return bool(queries.sequences_ids[cat] and queries.sequences_ids[cat][cdt])
+def validate_ids_sequences(queries: Queries, dt: str) -> None:
+    for cat in queries.sequences_ids:
+        intseq: IntSequence | None = queries.sequences_ids[cat][dt]
+        ivlist = list(intseq.ints if intseq else [])
+        for iv in range(1, len(ivlist)):
+            if ivlist[iv - 1] >= ivlist[iv]:
+                if ivlist[iv - 1] > ivlist[iv] or iv > 1:
+                    trace(f'Error: {cat}:{dt} ids sequence is corrupted at idx {iv - 1:d}, {ivlist[iv - 1]:d} >= {ivlist[iv]:d}!')
+                    raise OSError
+                else:
+                    trace(f'{cat}:{dt} ids sequence forms zero-length range {ivlist[iv - 1]:d}-{ivlist[iv] - 1:d}! Will be skipped!')
+                    if cat not in Config.disabled_downloaders:
+                        Config.disabled_downloaders[cat] = set()
+                    Config.disabled_downloaders[cat].add(dt)
 
-    def has_pages(cat: str, cdt: str) -> bool:
-        return bool(queries.sequences_pages[cat] and queries.sequences_pages[cat][cdt])
 
-    def pure_ids(cat: str, cdt: str) -> bool:
-        return has_ids(cat, cdt) and not has_pages(cat, cdt)
+def _get_base_args(queries: Queries, pending: Collection[str] = ()) -> DownloadCollection[list[str]]:
+    """Base command args (python, downloader, ids / pages range) of every category downloader which has a sequence"""
+    ri, rp, rpi = RANGE_TEMPLATE_IDS, RANGE_TEMPLATE_PAGES, RANGE_TEMPLATE_PAGE_IDS
+    base_args: DownloadCollection[list[str]] = DownloadCollection()
+    for k in queries.sequences_paths:
+        iseqs, pseqs, paths = queries.sequences_ids[k], queries.sequences_pages[k], queries.sequences_paths[k]
+        base_args_k: dict[str, list[str]] = {}
+        for dt in DOWNLOADERS:
+            iseq: IntSequence | None = iseqs[dt] if iseqs else None
+            pseq: IntSequence | None = pseqs[dt] if pseqs else None
+            if not (iseq or pseq) or dt in pending:
+                continue
+            irng = IntPair(*iseq[:2]) if iseq else None
+            if not pseq:
+                range_args = f'{ri[dt].first % irng.first}{ri[dt].second % (irng.second - 1)}'
+            else:
+                prng = IntPair(*pseq[:2])
+                range_args = (f'{rp[dt].first % prng.first}{rp[dt].second % prng.second}'
+                              f'{f" {rpi[dt].first % irng.first}" if irng and irng.first else ""}'
+                              f'{f" {rpi[dt].second % (irng.second - 1)}" if irng and irng.second else ""}')
+            piargs = ['pages'] if pseq else ['ids'] if dt in PAGE_DOWNLOADERS else []
+            base_args_k[dt] = [Config.python, paths[dt], *piargs, *range_args.split(' ')]
+        base_args[k] = base_args_k
+    return base_args
 
-    def page_ids(cat: str, cdt: str) -> bool:
-        return has_ids(cat, cdt) and has_pages(cat, cdt)
 
-    ri, rp, rpi = RANGE_TEMPLATE_IDS, RANGE_TEMPLATE_PAGES, RANGE_TEMPLATE_PAGE_IDS
-    irngs: dict[str, dict[str, IntPair]]
-    prngs: dict[str, dict[str, IntPair]]
-    irngs, prngs = ({
-        k: {dt: IntPair(*ipseqs[k][dt][:2]) for dt in DOWNLOADERS if ipseqs[k][dt]} for k in ipseqs
-    } for ipseqs in (queries.sequences_ids, queries.sequences_pages))
-    piargs: dict[str, dict[str, str]]
-    piargs = ({
-        k: {dt: 'pages ' if has_pages(k, dt) else 'ids ' if dt in PAGE_DOWNLOADERS else '' for dt in DOWNLOADERS}
-        for k in queries.sequences_paths
-    })
-    base_qs: DownloadCollection[str] = DownloadCollection()
-    [base_qs.update({
-        k: {
-            dt: (f'{Config.python} "{queries.sequences_paths[k][dt]}" {piargs[k][dt]}'
-                 f'{(ri[dt].first % irngs[k][dt].first) if pure_ids(k, dt) else (rp[dt].first % prngs[k][dt].first)}'
-                 f'{(ri[dt].second % (irngs[k][dt].second - 1)) if pure_ids(k, dt) else (rp[dt].second % prngs[k][dt].second)}'
-                 f'{f" {rpi[dt].first % irngs[k][dt].first}" if page_ids(k, dt) and irngs[k][dt].first else ""}'
-                 f'{f" {rpi[dt].second % (irngs[k][dt].second - 1)}" if page_ids(k, dt) and irngs[k][dt].second else ""}')
-            for dt in DOWNLOADERS if (dt in irngs[k] or dt in prngs[k])
-        },
-    }) for k in queries.sequences_paths]
-    return base_qs
+class QueryTemplate:
+    """
+    Invariant parts of queries of a single category downloader: base command args, category destination path
+    and common args, along with their display forms. Query argv and display string are assembled from these with a single join
+    """
+    __slots__ = ('base_args', 'cat_path', 'cat_path_str', 'common', 'common_args', 'prefix')
+
+    def __init__(self, base_args: list[str], cat_path: pathlib.Path, common: list[str]) -> None:
+        self.base_args = base_args
+        self.prefix = f'{base_args[0]} "{base_args[1]}" {" ".join(base_args[2:])} -path "'
+        self.cat_path = cat_path
+        self.cat_path_str = cat_path.as_posix()
+        self.common = ' '.join(common)
+        # common args keep script quoting (quoted values with spaces, extra args), so they are tokenized as a part of cmdline
+        self.common_args = split_into_args(f'_ {self.common} _')[1:-1] if self.common else []
 
+    def sub_path_str(self, sub: str) -> str:
+        if not sub:
+            return self.cat_path_str
+        if sub != '.' and not self.cat_path_str.endswith('/') and not _re_complex_sub.search(sub):
+            return f'{self.cat_path_str}/{sub}'
+        return self.cat_path.joinpath(sub).as_posix()
 
-def form_queries(qs: Queries) -> DownloadCollection[list[str]]:
-    stags, ssubs, scomms, spaths = qs.sequences_tags, qs.sequences_subfolders, qs.sequences_common, qs.sequences_paths
-    base_qs = _get_base_qs(qs)
-    queries_final: DownloadCollection[list[str]] = DownloadCollection()
-    [queries_final.update({
+    def query(self, sub: str, tags: list[str]) -> Query:
+        sub_path_str = self.sub_path_str(sub)
+        return Query([*self.base_args, '-path', sub_path_str, *self.common_args, *tags],
+                     ''.join((self.prefix, sub_path_str, '" ', self.common, ' ', ' '.join(tags))))
+
+    def script_query(self, subs: list[str], staglists: list[list[str]]) -> Query:
+        script = '; '.join(' '.join((f'{sub}:', *staglist)) for sub, staglist in zip(subs, staglists, strict=True))
+        return Query([*self.base_args, '-path', self.cat_path_str, *self.common_args, '-script', script],
+                     ''.join((self.prefix, self.cat_path_str, '" ', self.common, ' -script "', script, '"')))
+
+
+def _get_query_templates(qs: Queries, pending: Collection[str] = ()) -> DownloadCollection[QueryTemplate]:
+    """Query templates of every category downloader which has a sequence, computed once per queries formation"""
+    base_args = _get_base_args(qs, pending)
+    templates: DownloadCollection[QueryTemplate] = DownloadCollection()
+    for k in base_args:
+        cat_path = Config.dest_base.joinpath(date_str_md(k.strip())) if Config.datesub else Config.dest_base
+        templates[k] = {dt: QueryTemplate(args, cat_path, qs.sequences_common[k][dt]) for dt, args in base_args[k].items()}
+    return templates
+
+
+def _uses_search(staglist: list[str]) -> bool:
+    return any(sarg.startswith('-search') for sarg in staglist)
+
+
+def _query_groups(staglists: list[list[str]], dt: str) -> list[tuple[list[int], bool]]:
+    """
+    Subs (indices) processed by each query of downloader **dt**, in query order, paired with 'uses -script' flag.
+    RV family merges all subs into a single '-script' query unless search is used. With **Config.coalesce_queries**
+    subs not using search are still merged, while subs using search get a query of their own
+    """
+    if not staglists:
+        return []
+    if dt in RUXX_DOWNLOADERS:
+        return [([i], False) for i, staglist in enumerate(staglists) if staglist]
+    search_flags = [_uses_search(staglist) for staglist in staglists]
+    if not any(search_flags):
+        return [(list(range(len(staglists))), True)]
+    if not Config.coalesce_queries:
+        return [([i], False) for i, staglist in enumerate(staglists) if staglist]
+    mergeable = [i for i, staglist in enumerate(staglists) if staglist and not search_flags[i]]
+    if len(mergeable) < 2:
+        return [([i], False) for i, staglist in enumerate(staglists) if staglist]
+    groups: list[tuple[list[int], bool]] = []
+    for i, staglist in enumerate(staglists):
+        if i == mergeable[0]:
+            groups.append((mergeable, True))
+        elif staglist and search_flags[i]:
+            groups.append(([i], False))
+    return groups
+
+
+def form_queries(qs: Queries, pending: Collection[str] = ()) -> DownloadCollection[list[Query]]:
+    """
+    Forms final queries. Queries of **pending** downloaders (which id sequences aren't resolved yet)
+    are replaced with placeholders, formed queries count is preserved
+    """
+    stags, ssubs, spaths = qs.sequences_tags, qs.sequences_subfolders, qs.sequences_paths
+    templates = _get_query_templates(qs, pending)
+    queries_final: DownloadCollection[list[Query]] = DownloadCollection()
+    for k in spaths:
+        queries_final_k: dict[str, list[Query]] = {}
+        for dt in DOWNLOADERS:
+            staglists, subs = stags[k][dt], ssubs[k][dt]
+            query_groups = _query_groups(staglists, dt)
+            if dt in pending:
+                queries_final_k[dt] = [Query([], QUERY_PENDING_PLACEHOLDER)] * len(query_groups)
+                continue
+            template = templates[k].get(dt) if query_groups else None
+            queries_final_k[dt] = [
+                template.script_query([subs[i] for i in idxs], [staglists[i] for i in idxs]) if is_script else
+                template.query(subs[idxs[0]], staglists[idxs[0]])
+                for idxs, is_script in query_groups
+            ]
+        queries_final[k] = queries_final_k
+    return queries_final
+
+
+def form_query_subs(qs: Queries) -> DownloadCollection[list[str]]:
+    """Subfolder(s) of every query formed by **form_queries()**, comma-separated if query processes multiple subs"""
+    stags, ssubs, spaths = qs.sequences_tags, qs.sequences_subfolders, qs.sequences_paths
+    query_subs: DownloadCollection[list[str]] = DownloadCollection()
+    [query_subs.update({
         k: {
-            dt: ([f'{base_qs[k][dt]} {path_args(Config.dest_base, k, ssubs[k][dt][i], Config.datesub)} '
-                  f'{" ".join(scomms[k][dt])} {" ".join(staglist)}'
-                  for i, staglist in enumerate(stags[k][dt]) if staglist])
-            if dt in RUXX_DOWNLOADERS or any(any(sarg.startswith('-search') for sarg in slist) for slist in stags[k][dt]) else
-                ([f'{base_qs[k][dt]} {path_args(Config.dest_base, k, "", Config.datesub)} '
-                  f'{" ".join(scomms[k][dt])} '
-                  f'-script "'
-                  f'{"; ".join(" ".join([f"{ssubs[k][dt][i]}:", *staglist]) for i, staglist in enumerate(stags[k][dt]))}'
-                  f'"'] if stags[k][dt] else [])
+            dt: [','.join(ssubs[k][dt][i] for i in idxs) for idxs, _ in _query_groups(stags[k][dt], dt)]
             for dt in DOWNLOADERS
         },
     }) for k in spaths]
-    return queries_final
+    return query_subs
 
 
 def report_unoptimized(qs: Queries) -> None:
-    stags, ssubs, scomms, spaths = qs.sequences_tags, qs.sequences_subfolders, qs.sequences_common, qs.sequences_paths
-    base_qs = _get_base_qs(qs)
-    queries: DownloadCollection[list[str]] = DownloadCollection()
+    stags, ssubs, spaths = qs.sequences_tags, qs.sequences_subfolders, qs.sequences_paths
+    templates = _get_query_templates(qs)
+    queries: DownloadCollection[list[Query]] = DownloadCollection()
     [queries.update({
         k: {
-            dt: ([f'{base_qs[k][dt]} {path_args(Config.dest_base, k, ssubs[k][dt][i], Config.datesub)} '
-                  f'{" ".join(scomms[k][dt])} {" ".join(staglist)}'
-                  for i, staglist in enumerate(stags[k][dt]) if staglist])
+            dt: ([templates[k][dt].query(ssubs[k][dt][i], staglist) for i, staglist in enumerate(stags[k][dt]) if staglist])
             for dt in DOWNLOADERS
         },
     }) for k in spaths]
@@ -232,7 +367,8 @@ def report_unoptimized(qs: Queries) -> None:
 
 def report_queries(queries: DownloadCollection[list[str]]) -> None:
     for cat in queries:
-        trace(f'\nQueries \'{cat}\':\n{NEWLINE.join(NEWLINE.join(queries[cat][dt]) for dt in queries[cat] if queries[cat][dt])}', False)
+        trace(f'\nQueries \'{cat}\':\n{NEWLINE.join(NEWLINE.join(queries[cat][dt]) for dt in queries[cat] if queries[cat][dt])}', False,
+              level=LOG_LEVEL_DEBUG)
 
 #
 #
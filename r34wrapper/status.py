@@ -0,0 +1,103 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import pathlib
+import time
+from asyncio import sleep
+
+from .containers import CmdRunParams
+from .storage import save_json
+from .strings import datetime_str_full
+
+__all__ = ('QueryStatus', 'RunStatus')
+
+
+class QueryStatus:
+    """Progress of a single running query, updated by output protocol as child output arrives"""
+    __slots__ = ('last_line', 'last_output_time', 'output_bytes', 'params', 'start_time')
+
+    def __init__(self, params: CmdRunParams) -> None:
+        self.params = params
+        self.start_time = time.monotonic()
+        self.last_output_time = self.start_time
+        self.output_bytes = 0
+        self.last_line = ''
+
+    def on_output(self, data_len: int) -> None:
+        self.output_bytes += data_len
+        self.last_output_time = time.monotonic()
+
+    def on_line(self, line: str) -> None:
+        if line.strip():
+            self.last_line = line
+
+    def to_json(self) -> dict:
+        now = time.monotonic()
+        return {
+            'category': self.params.cat.strip(),
+            'downloader': self.params.dwn,
+            'subfolder': self.params.sub,
+            'query': f'{self.params.dqn:d}/{self.params.dqm:d}',
+            'elapsed': round(now - self.start_time, 1),
+            'idle': round(now - self.last_output_time, 1),
+            'log_bytes': self.output_bytes,
+            'last_line': self.last_line,
+        }
+
+
+class RunStatus:
+    """
+    Live status of all running queries, periodically dumped to json file.
+    Query is completed once (after its last attempt), every attempt (including retries) is counted separately
+    """
+    def __init__(self, path: pathlib.Path | None, total: int) -> None:
+        self._path = path
+        self._running: dict[CmdRunParams, QueryStatus] = {}
+        self._total = total
+        self._completed = 0
+        self._attempts = 0
+        self._finished = False
+
+    def attempt_started(self, params: CmdRunParams) -> QueryStatus:
+        qstatus = QueryStatus(params)
+        self._running[params] = qstatus
+        self._attempts += 1
+        return qstatus
+
+    def attempt_finished(self, params: CmdRunParams) -> None:
+        self._running.pop(params, None)
+
+    def query_completed(self) -> None:
+        self._completed += 1
+
+    def to_json(self) -> dict:
+        return {
+            'updated': datetime_str_full(),
+            'finished': self._finished,
+            'completed': self._completed,
+            'total': self._total,
+            'attempts': self._attempts,
+            'running': [qstatus.to_json() for qstatus in self._running.values()],
+        }
+
+    def write(self) -> None:
+        if self._path:
+            save_json(self._path, self.to_json())
+
+    async def keep_writing(self, interval: float) -> None:
+        while not self._finished:
+            self.write()
+            await sleep(interval)
+
+    def finish(self) -> None:
+        self._finished = True
+        self.write()
+
+#
+#
+#########################################
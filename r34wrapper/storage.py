@@ -0,0 +1,195 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import gzip
+import json
+import os
+import pathlib
+import pickle
+import shutil
+import time
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from platform import system as running_system
+
+from .defs import OS_WINDOWS, UTF8
+
+__all__ = ('TextFileLines', 'file_lock', 'load_json', 'load_pickle', 'patch_text_lines', 'prune_files', 'save_gzip_copy', 'save_json',
+           'save_pickle')
+
+FILE_LOCK_POLL_INTERVAL = 0.25
+
+
+class TextFileLines:
+    """
+    Re-iterable lazy view of text file lines: yields (byte offset of line beginning, line) pairs,
+    reading the file one line at a time on every iteration. Line endings are normalized to '\\n'
+    """
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self._stat = self._get_stat()
+
+    def _get_stat(self) -> tuple[int, int]:
+        path_stat = self.path.stat()
+        return path_stat.st_size, path_stat.st_mtime_ns
+
+    def is_modified(self) -> bool:
+        """Whether file was changed (size or modification time) since this view was created"""
+        return self._get_stat() != self._stat
+
+    def __iter__(self) -> Iterator[tuple[int, str]]:
+        offset = 0
+        with open(self.path, 'rb') as infile:
+            for raw_line in infile:
+                yield offset, raw_line.decode(UTF8).replace('\r\n', '\n')
+                offset += len(raw_line)
+
+
+@contextmanager
+def file_lock(path: pathlib.Path, timeout: float) -> Iterator[None]:
+    """
+    Exclusive inter-process lock on file **path** (created if missing), waits up to **timeout** seconds.
+    Lock is held by open file handle, so it is released by OS if process dies
+    """
+    with open(path, 'a+b') as lock_file:
+        wait_until = time.monotonic() + timeout
+        while True:
+            try:
+                if running_system() == OS_WINDOWS:
+                    import msvcrt
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= wait_until:
+                    raise TimeoutError(f'Unable to lock \'{path.as_posix()}\' in {timeout:.0f} seconds')
+                time.sleep(FILE_LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            if running_system() == OS_WINDOWS:
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _fsync_dir(path: pathlib.Path) -> None:
+    if running_system() != OS_WINDOWS:
+        dir_fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def load_json(path: pathlib.Path) -> dict:
+    """Read json object from **path**, returns empty dict if file is missing or unreadable"""
+    try:
+        with open(path, 'rt', encoding=UTF8) as infile:
+            data = json.load(infile)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json(path: pathlib.Path, data: dict) -> None:
+    """Write json object to **path** atomically: readers see either old or new contents, never a partial file"""
+    temp_path = path.with_name(f'{path.name}.{os.getpid():d}.tmp')
+    try:
+        with open(temp_path, 'wt', encoding=UTF8) as outfile:
+            json.dump(data, outfile, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.is_file():
+            temp_path.unlink()
+
+
+def load_pickle(path: pathlib.Path) -> object | None:
+    """Read pickled object from **path**, returns None if file is missing or unreadable"""
+    try:
+        with open(path, 'rb') as infile:
+            return pickle.load(infile)
+    except Exception:
+        return None
+
+
+def save_pickle(path: pathlib.Path, data: object) -> None:
+    """Write pickled object to **path** atomically (see **save_json()**)"""
+    temp_path = path.with_name(f'{path.name}.{os.getpid():d}.tmp')
+    try:
+        with open(temp_path, 'wb') as outfile:
+            pickle.dump(data, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.is_file():
+            temp_path.unlink()
+
+
+def patch_text_lines(path: pathlib.Path, patches: Mapping[int, Callable[[str], str]]) -> None:
+    """
+    Replace lines of text file at **path** starting at given byte offsets with **patches[offset](old line)**
+    (old line and new line exclude line ending, original line ending is preserved). File is streamed into a temporary file
+    which is flushed to disk and then atomically replaces the original, so the file is never left partially written
+    """
+    temp_path = path.with_name(f'{path.name}.{os.getpid():d}.tmp')
+    try:
+        with open(path, 'rb') as infile, open(temp_path, 'wb') as outfile:
+            offset = 0
+            for raw_line in infile:
+                patch = patches.get(offset)
+                offset += len(raw_line)
+                if patch:
+                    line = raw_line.decode(UTF8)
+                    line_body = line.rstrip('\r\n')
+                    line_ending = line[len(line_body):] or '\n'
+                    outfile.write(f'{patch(line_body)}{line_ending}'.encode(UTF8))
+                else:
+                    outfile.write(raw_line)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+        _fsync_dir(path.parent)
+    finally:
+        if temp_path.is_file():
+            temp_path.unlink()
+
+
+def save_gzip_copy(src_path: pathlib.Path, dest_path: pathlib.Path) -> None:
+    """Write gzip-compressed copy of **src_path** to **dest_path**"""
+    temp_path = dest_path.with_name(f'{dest_path.name}.{os.getpid():d}.tmp')
+    try:
+        with open(src_path, 'rb') as infile, gzip.open(temp_path, 'wb') as outfile:
+            shutil.copyfileobj(infile, outfile)
+        os.replace(temp_path, dest_path)
+    finally:
+        if temp_path.is_file():
+            temp_path.unlink()
+
+
+def prune_files(dir_path: pathlib.Path, pattern: str, keep: int) -> list[pathlib.Path]:
+    """Remove all but **keep** newest (by name) files matching **pattern** in **dir_path**. Returns removed files"""
+    removed: list[pathlib.Path] = []
+    for old_path in sorted(dir_path.glob(pattern), reverse=True)[keep:]:
+        try:
+            old_path.chmod(0o600)  # backups are read-only
+            old_path.unlink()
+            removed.append(old_path)
+        except OSError:
+            pass
+    return removed
+
+#
+#
+#########################################
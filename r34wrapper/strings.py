@@ -8,10 +8,13 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 
 import datetime
 import pathlib
+import time
 from collections.abc import Iterable
 
 NEWLINE = '\n'
 
+_timestamp_cache: list[int | str] = [-1, '']
+
 
 def unquote(tag: str) -> str:
     return tag.strip('"\'')
@@ -76,8 +79,16 @@ def remove_trailing_comments(line: str) -> str:
     return result
 
 
+def log_timestamp() -> str:
+    """'[yyyy-mm-dd_hh_mm_ss] ' log line prefix, formatted once per second"""
+    now = int(time.time())
+    if now != _timestamp_cache[0]:
+        _timestamp_cache[:] = now, f'[{time.strftime("%Y-%m-%d_%H_%M_%S", time.localtime(now))}] '
+    return _timestamp_cache[1]
+
+
 def timestamped_string(msg: str) -> str:
-    ts = f'[{datetime_str_nfull()}] '
+    ts = log_timestamp()
     nts = f'{NEWLINE}{ts}'
     return msg.replace(NEWLINE, nts) if msg.startswith(NEWLINE) else f'{ts}{msg.replace(NEWLINE, nts)}'
 
@@ -7,15 +7,29 @@ Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
 #
 
 import functools
+import gzip
+import json
 import os
 import pathlib
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import venv
+from asyncio import gather, new_event_loop, sleep
 from collections.abc import Callable
 from contextlib import ExitStack
+from io import StringIO
 from platform import system
-from unittest import TestCase
+from unittest import TestCase, mock, skipUnless
 
+from ._parsers.parse_cache import parse_cache_dir, parse_cache_path
+from ._parsers.tag_list import TagList
 from .cmdargs import parse_arglist
 from .config import Config
+from .containers import CmdRunParams, CmdRunResult, Queries, Query
 from .defs import (
     DOWNLOADER_BB,
     DOWNLOADER_EN,
@@ -28,12 +42,56 @@ from .defs import (
     DOWNLOADER_RV,
     DOWNLOADER_RX,
     DOWNLOADER_XB,
+    DOWNLOADERS,
+    LOG_LEVEL_DEBUG,
+    LOG_LEVEL_TRACE,
+    LOG_LEVELS,
+    PATH_APPEND_DOWNLOADER_RUXX,
+    QUERY_OUTCOME_OK,
+    QUERY_OUTCOME_STALLED,
+    RUN_PHASE_EXECUTE,
+    UTF8,
+    IntSequence,
 )
-from .executor import queries_all
-from .logger import close_logfile
+from .executor import (
+    QueryOutputProtocol,
+    QueryRun,
+    downloader_preparers,
+    executor_event_loop,
+    new_process_group_kwargs,
+    process_budget,
+    queries_all,
+    query_history,
+    run_cmd_queue,
+    run_journal,
+    run_results,
+    run_status,
+    terminate_process_group,
+    worker_pool,
+)
+from .history import QueryHistory, order_longest_first
+from .journal import RunJournal
+from .log_codecs import LOG_CODECS, codec_for_path, open_log_file
+from .logger import calculate_title_suffix, close_logfile, ensure_logfile, flush_log, json_logfile, logfile, set_run_phase, trace
+from .logtail import LogReader, tail_log
 from .main import main_sync
-from .queries import make_parser, prepare_queries, read_queries_file
-from .strings import date_str_md, split_into_args
+from .maxids import MaxIdCache, fetch_maxids_async
+from .queries import _next_ids_line, _script_backups_pattern, make_parser, prepare_queries, read_queries_file, register_pipelined_fetches
+from .runners import RunnerCache, path_fingerprint, python_fingerprint, python_prefix
+from .scheduler import ProcessBudget, RetryQueue
+from .sequences import (
+    QUERY_PENDING_PLACEHOLDER,
+    QueryTemplate,
+    _collect_version_probes,
+    _query_groups,
+    _validate_runners,
+    _validated_runners,
+    form_queries,
+)
+from .status import RunStatus
+from .storage import TextFileLines, file_lock, patch_text_lines, prune_files, save_gzip_copy
+from .strings import date_str_md, datetime_str_nfull, path_args, split_into_args
+from .workers import WorkerPool
 
 __all__ = ()
 
@@ -43,6 +101,9 @@ args_argparse_str_2_2 = args_argparse_str_2_1.replace('queries.list', 'queries.j
 args_argparse_str_3 = '-script ./tests/queries2.list -append VIDEOS,nm,-continue'
 args_argparse_str_4_1 = '--debug -script ./examples/plain1.list'
 args_argparse_str_4_2 = args_argparse_str_4_1.replace('plain1.list', 'json1.json')
+args_argparse_str_5 = '-concurrency rx,4 -concurrency NM,2 -script ./tests/queries.list'
+
+BENCHMARKS_ENV_VAR = 'R34WRAPPER_BENCHMARKS'
 
 
 def test_prepare(*, console_log=False) -> Callable[[], Callable[[], None]]:
@@ -64,6 +125,74 @@ def test_prepare(*, console_log=False) -> Callable[[], Callable[[], None]]:
     return invoke1
 
 
+def run_test_cmds(params_list: list[CmdRunParams], *, workers=False, concurrency=1, max_processes=0,
+                  status_path: pathlib.Path | None = None) -> list[int]:
+    """
+    Run queries of **params_list** as executor does (optionally by query workers): from a shared queue by **concurrency** query runners,
+    within **max_processes** budget. Run status is written to **status_path** if provided. Returns pids of alive workers
+    """
+    async def run_all() -> list[int]:
+        cmd_queue: RetryQueue[CmdRunParams | QueryRun] = RetryQueue(params_list)
+        await gather(*(run_cmd_queue(cmd_queue) for _ in range(concurrency)))
+        worker_pids = worker_pool.val.pids if worker_pool else []
+        if worker_pool:
+            await worker_pool.val.close()
+        run_status.val.finish()
+        return worker_pids
+    run_results.clear()
+    executor_event_loop.reset(new_event_loop())
+    run_status.reset(RunStatus(status_path, len(params_list)))
+    run_journal.reset(RunJournal(None, resume=False))
+    query_history.reset(QueryHistory())
+    process_budget.reset(ProcessBudget(max_processes, {}))
+    if workers:
+        worker_pool.reset(WorkerPool())
+    try:
+        return executor_event_loop.val.run_until_complete(run_all())
+    finally:
+        worker_pool.reset()
+        executor_event_loop.val.close()
+        executor_event_loop.reset()
+
+
+def synthetic_queries(num_categories: int, num_subfolders: int) -> Queries:
+    """
+    Parsed script of **num_categories** categories with all downloaders enabled, each having **num_subfolders** subfolders
+    (last two are nested and empty ones)
+    """
+    queries = Queries()
+    subs = [f's{j:d}' for j in range(num_subfolders - 2)] + ['s/nested', '']
+    for n in range(num_categories):
+        cat = f'C{n:d}'
+        queries.sequences_ids.add_category(cat)
+        queries.sequences_pages.add_category(cat)
+        queries.sequences_paths.add_category(cat)
+        queries.sequences_common.add_category(cat, list)
+        queries.sequences_tags.add_category(cat, list)
+        queries.sequences_subfolders.add_category(cat, list)
+        for dt in DOWNLOADERS:
+            queries.sequences_ids[cat][dt] = IntSequence([n + 1, n + 100], 1)
+            if dt == DOWNLOADER_NM:
+                queries.sequences_pages[cat][dt] = IntSequence([5, 1], 2)
+            queries.sequences_paths[cat][dt] = f'/{dt}/{dt}'
+            queries.sequences_common[cat][dt] = ['-dmode', 'touch', f'-c{n:d}']
+            queries.sequences_subfolders[cat][dt] = subs.copy()
+            queries.sequences_tags[cat][dt] = [['-search', f'a{j:d}'] if j % 2 else [f'a{j:d}', f'(b{j:d}~c{j:d})']
+                                               for j in range(num_subfolders)]
+    return queries
+
+
+def synthetic_script_lines(num_categories: int, num_subfolders: int) -> list[str]:
+    """Text script of **num_categories** categories, each having **num_subfolders** subfolders with 2 tag lines"""
+    script_lines = ['### TITLE:synth\n', '### PYTHON:python3\n']
+    for n in range(num_categories):
+        script_lines.extend((f'### (C{n:d}) ###\n', '# rx\n', f'# {n + 1:d} {n + 2:d}\n', '# downloader:/ruxx\n', '# common:-dmode 1\n'))
+        for j in range(num_subfolders):
+            script_lines.extend((f'# sub:s{j:d}\n', f'a{j:d} b{j:d}\n', f'(c{j:d}~d{j:d})\n', '# send\n'))
+        script_lines.append('# end\n')
+    return script_lines
+
+
 class ArgParseTests(TestCase):
     @test_prepare()
     def test_argparse1(self) -> None:
@@ -98,6 +227,19 @@ class ArgParseTests(TestCase):
         )
         print(f'{self._testMethodName} passed')
 
+    @test_prepare()
+    def test_argparse3(self) -> None:
+        parse_arglist(args_argparse_str_5.split())
+        make_parser()
+        read_queries_file()
+        Config.parser.parse_queries_file()
+        self.assertEqual({'rx': 2, 'xb': 3}, Config.concurrency)
+        self.assertEqual(4, Config.max_concurrent_queries(DOWNLOADER_RX))
+        self.assertEqual(3, Config.max_concurrent_queries(DOWNLOADER_XB))
+        self.assertEqual(2, Config.max_concurrent_queries(DOWNLOADER_NM))
+        self.assertEqual(1, Config.max_concurrent_queries(DOWNLOADER_RV))
+        print(f'{self._testMethodName} passed')
+
 
 class QueriesFormTests(TestCase):
     @test_prepare(console_log=True)
@@ -258,6 +400,311 @@ class QueriesFormTests(TestCase):
         )
         print(f'{self._testMethodName} passed')
 
+    @test_prepare()
+    def test_query_args1(self) -> None:
+        parse_arglist(args_argparse_str_1.split())
+        make_parser()
+        read_queries_file()
+        prepare_queries()
+        queries = [query for cat in queries_all for dt in DOWNLOADERS for query in queries_all[cat][dt]]
+        self.assertLess(10, len(queries))
+        for query in queries:
+            self.assertIsInstance(query, Query)
+            self.assertEqual(split_into_args(query), query.args)
+        self.assertEqual(queries[0].args, pickle.loads(pickle.dumps(queries[0])).args)
+        template = QueryTemplate(['/py thon/python3', 'D:/ruxx/ruxx', 'id:>=1', 'id:<=9'], pathlib.Path('/dest'), [])
+        self.assertEqual(['/py thon/python3', 'D:/ruxx/ruxx', 'id:>=1', 'id:<=9', '-path', '/dest/a', 'a', '(b~c)'],
+                         template.query('a', ['a', '(b~c)']).args)
+        self.assertEqual('/py thon/python3 "D:/ruxx/ruxx" id:>=1 id:<=9 -path "/dest/a"  a (b~c)', template.query('a', ['a', '(b~c)']))
+        template = QueryTemplate(['python3', 'D:/RV/rv', '-start', '1', '-end', '9'], pathlib.Path('/dest'),
+                                 ['-header', '"x', 'y"', '"-z"'])
+        self.assertEqual(['python3', 'D:/RV/rv', '-start', '1', '-end', '9', '-path', '/dest', '-header', 'x y', '-z',
+                          '-script', 'a: -a; b: b'],
+                         template.script_query(['a', 'b'], [['-a'], ['b']]).args)
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_queries_coalesce1(self) -> None:
+        staglists = [['-quality', '1080p', 'a'], ['-search', 'b'], [], ['c', '(d~e)'], ['-search_tag', 'f,g'], ['h']]
+        self.assertEqual([([0], False), ([1], False), ([3], False), ([4], False), ([5], False)], _query_groups(staglists, DOWNLOADER_RV))
+        self.assertEqual([([0, 1, 2], True)], _query_groups([staglists[0], staglists[2], staglists[3]], DOWNLOADER_RV))
+        Config.coalesce_queries = True
+        self.assertEqual([([0, 3, 5], True), ([1], False), ([4], False)], _query_groups(staglists, DOWNLOADER_RV))
+        self.assertEqual([([0], False), ([2], False)], _query_groups(staglists[1:4], DOWNLOADER_RV))
+        self.assertEqual([([0], False), ([1], False), ([3], False), ([4], False), ([5], False)], _query_groups(staglists, DOWNLOADER_RX))
+        parse_arglist([*args_argparse_str_1.split(), '--coalesce-queries'])
+        make_parser()
+        read_queries_file()
+        prepare_queries()
+        self.assertEqual(3, len(queries_all['VIDEOS'][DOWNLOADER_RV]))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_parse_cache1(self) -> None:
+        def parse(line_edits: dict[int, str], cached: bool) -> Queries:
+            script_lines = pathlib.Path('./tests/queries.list').read_text(encoding=UTF8).splitlines(True)
+            for line_idx, line in line_edits.items():
+                script_lines[line_idx] = line
+            script_path.write_text(''.join(script_lines), encoding=UTF8)
+            Config._reset()
+            Config.test = True
+            parse_arglist(['-script', script_path.as_posix()])
+            make_parser()
+            read_queries_file()
+            if cached:
+                Config.parser.parse_queries_file_cached(cache_path)
+            else:
+                Config.parser.parse_lines()
+            return Config.parser.queries
+        with tempfile.TemporaryDirectory() as tempdir, ExitStack() as ctx:
+            cache_base = pathlib.Path(tempdir) / 'cache'
+            ctx.enter_context(mock.patch.dict(os.environ, {'LOCALAPPDATA': cache_base.as_posix(), 'XDG_CACHE_HOME': cache_base.as_posix()}))
+            script_path = pathlib.Path(tempdir) / 'queries.list'
+            cache_path = parse_cache_path(script_path)
+            # cache is kept apart from script, per script path
+            self.assertEqual(parse_cache_dir(), cache_path.parent)
+            self.assertTrue(cache_path.is_relative_to(cache_base))
+            self.assertNotEqual(cache_path, parse_cache_path(pathlib.Path(tempdir) / 'sub' / 'queries.list'))
+            self.assertEqual(parse({}, False), parse({}, True))
+            self.assertTrue(cache_path.is_file())
+            cache_mtime = cache_path.stat().st_mtime_ns
+            ids_edits = {15: '# 3 4\n', 168: '# 12345 12400\n'}
+            queries_full, queries_cached = parse(ids_edits, False), parse(ids_edits, True)
+            self.assertEqual(queries_full, queries_cached)
+            self.assertEqual(cache_mtime, cache_path.stat().st_mtime_ns)
+            self.assertEqual([3, 4], queries_cached.sequences_ids['VIDEOS'][DOWNLOADER_NM].ints)
+            self.assertEqual(16, queries_cached.sequences_ids['VIDEOS'][DOWNLOADER_NM].line_num)
+            self.assertEqual('script_0', Config.title)
+            self.assertEqual(pathlib.Path('./tests').resolve(), Config.dest_base)
+            time.sleep(0.01)
+            tags_edits = {**ids_edits, 24: 'ggg hhh\n'}
+            self.assertEqual(parse(tags_edits, False), parse(tags_edits, True))
+            self.assertNotEqual(cache_mtime, cache_path.stat().st_mtime_ns)
+            dest_path = pathlib.Path(tempdir) / 'dest'
+            dest_path.mkdir()
+            dest_edits = {**tags_edits, 2: f'### DESTPATH:{dest_path.as_posix()}\n'}
+            parse(dest_edits, True)
+            parse(dest_edits, True)
+            self.assertEqual(dest_path.resolve(), Config.dest_base)
+            dest_path.rmdir()
+            # restored destination no longer exists, cache is rejected and full parse fails
+            with self.assertRaises(Exception):
+                parse(dest_edits, True)
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_parse_cache2(self) -> None:
+        def parse() -> Queries:
+            Config._reset()
+            parse_arglist(['-script', script_path.as_posix(), '-downloaders', DOWNLOADER_RX])
+            make_parser()
+            read_queries_file()
+            try:
+                Config.parser.parse_queries_file_cached(cache_path)
+            finally:
+                close_logfile()
+            return Config.parser.queries
+        with tempfile.TemporaryDirectory() as tempdir:
+            temp_path = pathlib.Path(tempdir)
+            script_path = temp_path / 'script.list'
+            cache_path = temp_path / 'script.list.parsed'
+            downloader_path = temp_path / 'base' / PATH_APPEND_DOWNLOADER_RUXX
+            downloader_path.mkdir(parents=True)
+            script_path.write_text(f'### LOGPATH:{tempdir}\n### (C0) ###\n# rx\n# 1 2\n# downloader:{(temp_path / "base").as_posix()}\n'
+                                   '# sub:s0\na0\n# send\n# end\n', encoding=UTF8)
+            Config.test = False
+            try:
+                self.assertEqual(parse(), parse())
+                self.assertEqual(downloader_path.as_posix(), Config.parser.queries.sequences_paths['C0'][DOWNLOADER_RX])
+                downloader_path.rmdir()
+                # cached downloader path no longer exists, cache is rejected and full parse reports it
+                with self.assertRaises(AssertionError) as ctx:
+                    parse()
+                self.assertIn('downloader path', str(ctx.exception))
+            finally:
+                Config.test = True
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_parse_synthetic1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            script_path = pathlib.Path(tempdir) / 'synthetic.list'
+            script_path.write_text(''.join(synthetic_script_lines(3, 4)), encoding=UTF8)
+            parse_arglist(['-script', script_path.as_posix()])
+            make_parser()
+            read_queries_file()
+            Config.parser.parse_lines()
+            queries = Config.parser.queries
+        self.assertEqual(('synth', 'python3'), (Config.title, Config.python))
+        self.assertEqual(['C0', 'C1', 'C2'], list(queries.sequences_tags))
+        for n, cat in enumerate(queries.sequences_tags):
+            self.assertEqual([n + 1, n + 2], queries.sequences_ids[cat][DOWNLOADER_RX].ints)
+            self.assertEqual('/ruxx/ruxx', queries.sequences_paths[cat][DOWNLOADER_RX])
+            self.assertEqual(['-dmode', '1'], queries.sequences_common[cat][DOWNLOADER_RX])
+            self.assertEqual(['s0', 's1', 's2', 's3'], queries.sequences_subfolders[cat][DOWNLOADER_RX])
+            self.assertEqual(4, len(queries.sequences_tags[cat][DOWNLOADER_RX]))
+            self.assertEqual(['a3', 'b3', '(c3~d3)'], queries.sequences_tags[cat][DOWNLOADER_RX][3][-3:])
+            self.assertEqual([], queries.sequences_tags[cat][DOWNLOADER_NM])
+        print(f'{self._testMethodName} passed')
+
+    @skipUnless(os.environ.get(BENCHMARKS_ENV_VAR), f'set {BENCHMARKS_ENV_VAR}=1 to run benchmarks')
+    @test_prepare()
+    def test_parse_bench1(self) -> None:
+        def bench_parse(script_path: str) -> float:
+            Config._reset()
+            Config.test = True
+            parse_arglist(['-script', script_path])
+            make_parser()
+            read_queries_file()
+            num_lines = sum(1 for _ in Config.parser.queries.queries_file)
+            time_start = time.perf_counter()
+            Config.parser.parse_lines()
+            return (time.perf_counter() - time_start) / num_lines
+        synthetic_lines = synthetic_script_lines(100, 249)
+        self.assertLessEqual(100000, len(synthetic_lines))
+        with tempfile.TemporaryDirectory() as tempdir:
+            synthetic_path = pathlib.Path(tempdir) / 'synthetic.list'
+            synthetic_path.write_text(''.join(synthetic_lines), encoding=UTF8)
+            per_line_costs = {
+                'plain1.list': bench_parse('./examples/plain1.list'),
+                'queries.list': bench_parse('./tests/queries.list'),
+                f'synthetic ({len(synthetic_lines):d} lines)': bench_parse(synthetic_path.as_posix()),
+            }
+        for script_name, per_line_cost in per_line_costs.items():
+            print(f'{script_name}: {per_line_cost * 1000000:.2f} us per line')
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_form_queries_synthetic1(self) -> None:
+        Config.python = 'python3'
+        Config.dest_base = pathlib.Path('/dest').resolve()
+        Config.datesub = True
+        queries = synthetic_queries(3, 5)
+        queries_final = form_queries(queries)
+        self.assertEqual(3 * len(DOWNLOADERS) * 5, sum(len(queries_final[cat][dt]) for cat in queries_final for dt in DOWNLOADERS))
+        for cat in ('C0', 'C2'):
+            for dt in (DOWNLOADER_NM, DOWNLOADER_RX, DOWNLOADER_EN):
+                subs = queries.sequences_subfolders[cat][dt]
+                for j in range(5):
+                    self.assertTrue(queries_final[cat][dt][j].startswith(f'python3 "/{dt}/{dt}" '))
+                    self.assertIn(f' {path_args(Config.dest_base, cat, subs[j], True)} -dmode touch -c{cat[1:]} '
+                                  f'{" ".join(queries.sequences_tags[cat][dt][j])}', queries_final[cat][dt][j])
+        for sub in ('a', 'a/b', 'a\\b', './a', 'a/', '.', '..', 'a:b', ' a ', '/abs'):
+            sub_path_str = QueryTemplate(['python3', 'x'], Config.dest_base / date_str_md('C0'), []).sub_path_str(sub)
+            self.assertEqual(path_args(Config.dest_base, 'C0', sub, True), f'-path "{sub_path_str}"')
+        print(f'{self._testMethodName} passed')
+
+    @skipUnless(os.environ.get(BENCHMARKS_ENV_VAR), f'set {BENCHMARKS_ENV_VAR}=1 to run benchmarks')
+    @test_prepare()
+    def test_form_queries_bench1(self) -> None:
+        Config.python = 'python3'
+        Config.dest_base = pathlib.Path('/dest').resolve()
+        Config.datesub = True
+        queries = synthetic_queries(1000, 50)
+        time_start = time.perf_counter()
+        queries_final = form_queries(queries)
+        form_time = time.perf_counter() - time_start
+        num_queries = sum(len(queries_final[cat][dt]) for cat in queries_final for dt in DOWNLOADERS)
+        self.assertEqual(1000 * len(DOWNLOADERS) * 50, num_queries)
+        print(f'{num_queries:d} queries: {form_time * 1000000 / num_queries:.2f} us per query')
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_next_ids_patch1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            script_path = pathlib.Path(tempdir) / 'script.list'
+            script_path.write_bytes('### (Кат) ###\r\n# rx\r\n# 1 100\r\n# rv\n# 5 60\n# nm\n# 9 10'.encode(UTF8))
+            script_lines = list(TextFileLines(script_path))
+            self.assertEqual('### (Кат) ###\n', script_lines[0][1])
+            ids_offsets = [offset for offset, line in script_lines if line[2].isdigit()]
+            self.assertEqual([script_path.read_bytes().find(ids_line) for ids_line in (b'# 1 ', b'# 5 ', b'# 9 ')], ids_offsets)
+            patch_text_lines(script_path, {ids_offsets[0]: functools.partial(_next_ids_line, maxid=1234),
+                                           ids_offsets[2]: functools.partial(_next_ids_line, maxid=11)})
+            self.assertEqual('### (Кат) ###\r\n# rx\r\n# 100 1234\r\n# rv\n# 5 60\n# nm\n# 10 11\n'.encode(UTF8),
+                             script_path.read_bytes())
+            self.assertEqual([script_path.name], [p.name for p in pathlib.Path(tempdir).iterdir()])
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_script_backups1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            temp_path = pathlib.Path(tempdir)
+            script_path = temp_path / 'script.list'
+            script_path.write_bytes(b'# rx\n# 1 100\n')
+            script_lines = TextFileLines(script_path)
+            self.assertFalse(script_lines.is_modified())
+            for i in range(5):
+                bak_path = temp_path / f'script.list_bak_2026-01-0{i + 1:d}.list.gz'
+                save_gzip_copy(script_path, bak_path)
+                bak_path.chmod(0o444)
+                self.assertEqual(script_path.read_bytes(), gzip.decompress(bak_path.read_bytes()))
+            (temp_path / 'script.list_bak_2025-12-31.list').write_bytes(b'')
+            removed = prune_files(temp_path, _script_backups_pattern('script.list'), 3)
+            self.assertEqual(['script.list_bak_2026-01-02.list.gz', 'script.list_bak_2026-01-01.list.gz'], [p.name for p in removed])
+            self.assertEqual(['script.list', 'script.list_bak_2025-12-31.list', 'script.list_bak_2026-01-03.list.gz',
+                              'script.list_bak_2026-01-04.list.gz', 'script.list_bak_2026-01-05.list.gz'],
+                             sorted(p.name for p in temp_path.iterdir()))
+            # script name is not a pattern
+            for i in range(2):
+                (temp_path / f'q[1].list_bak_2026-01-0{i + 1:d}.list.gz').write_bytes(b'')
+            (temp_path / 'q1.list_bak_2026-01-01.list.gz').write_bytes(b'')
+            removed = prune_files(temp_path, _script_backups_pattern('q[1].list'), 1)
+            self.assertEqual(['q[1].list_bak_2026-01-01.list.gz'], [p.name for p in removed])
+            patch_text_lines(script_path, {5: functools.partial(_next_ids_line, maxid=200)})
+            self.assertTrue(script_lines.is_modified())
+            lock_path = temp_path / '.script.list.lock'
+            with file_lock(lock_path, 0.0):
+                if system() != 'Windows':
+                    lock_script = (f'import fcntl\n'
+                                   f'fcntl.flock(open({lock_path.as_posix()!r}, "a+b").fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)')
+                    self.assertNotEqual(0, subprocess.run([sys.executable, '-c', lock_script], capture_output=True).returncode)
+            with file_lock(lock_path, 0.0):
+                pass
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_tag_list1(self) -> None:
+        def reference_remove(tags: list[str], tags_to_remove: list[str]) -> list[str]:
+            tags_to_remove = tags_to_remove.copy()
+            for k in reversed(range(len(tags_to_remove))):
+                for j in reversed(range(len(tags))):
+                    if tags[j] == tags_to_remove[k]:
+                        del tags[j]
+                        del tags_to_remove[k]
+                        break
+            return tags_to_remove
+
+        def reference_exclude(tags: list[str], tags_split: list[str]) -> str | None:
+            tags_rem, tags_search = '~'.join(tags_split), ','.join(tags_split)
+            for j in reversed(range(len(tags))):
+                if j > 0 and tags[j - 1].startswith('-search') and tags[j] == tags_search:
+                    search_arg = tags[j - 1]
+                    del tags[j - 1:j + 1]
+                    return search_arg
+                if tags[j] == (tags_rem if len(tags_split) == 1 else f'({tags_rem})'):
+                    del tags[j]
+                    return ''
+            return None
+        rng = random.Random(17)
+        names = ['a', 'b', 'c', 'a,b', '(a~b)', '(b~c)', 'b,c', '-search', '-search_tag', '-search_rule_tag', 'any']
+        for _ in range(300):
+            tag_list, reference = TagList(), []
+            for _ in range(rng.randint(1, 200)):
+                op = rng.random()
+                if op < 0.5:
+                    new_tags = rng.choices(names, k=rng.randint(1, 3))
+                    tag_list.extend(new_tags)
+                    reference.extend(new_tags)
+                elif op < 0.75:
+                    tags_to_remove = rng.choices(names, k=rng.randint(1, 2))
+                    self.assertEqual(reference_remove(reference, tags_to_remove), tag_list.remove_tags(tags_to_remove))
+                else:
+                    tags_split = rng.choices(['a', 'b', 'c'], k=rng.randint(1, 2))
+                    self.assertEqual(reference_exclude(reference, tags_split), tag_list.exclude(tags_split))
+                self.assertEqual(reference, tag_list.to_list())
+                self.assertEqual(len(reference), len(tag_list))
+        print(f'{self._testMethodName} passed')
+
     @test_prepare()
     def test_queries2(self) -> None:
         cat_vid = 'VIDEOS'
@@ -271,6 +718,32 @@ class QueriesFormTests(TestCase):
         self.assertEqual(pathlib.Path().resolve().parent, Config.dest_run_base)
         self.assertEqual(pathlib.Path().resolve().parent, Config.dest_logs_base)
         self.assertIn('-continue', queries_all[cat_vid][DOWNLOADER_NM][0])
+        queries_pending = form_queries(Config.parser.queries, [DOWNLOADER_NM])
+        self.assertEqual(len(queries_all[cat_vid][DOWNLOADER_NM]), len(queries_pending[cat_vid][DOWNLOADER_NM]))
+        self.assertTrue(all(q == QUERY_PENDING_PLACEHOLDER for q in queries_pending[cat_vid][DOWNLOADER_NM]))
+        self.assertEqual(queries_all[cat_vid][DOWNLOADER_RV], queries_pending[cat_vid][DOWNLOADER_RV])
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_pipelined_fetches1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            script_path = pathlib.Path(tempdir) / 'queries.list'
+            script_path.write_text(pathlib.Path('./tests/queries2.list').read_text(encoding=UTF8).replace('# p5\n', '# 5\n'), encoding=UTF8)
+            parse_arglist(['-script', script_path.as_posix()])
+            make_parser()
+            read_queries_file()
+            Config.parser.parse_queries_file()
+            queries = Config.parser.queries
+            try:
+                self.assertEqual([DOWNLOADER_NM], register_pipelined_fetches())
+                self.assertIn(DOWNLOADER_NM, downloader_preparers)
+                downloader_preparers.clear()
+                queries.sequences_paths_update[DOWNLOADER_NM] = None
+                with self.assertRaises(AssertionError):
+                    register_pipelined_fetches()
+                self.assertNotIn(DOWNLOADER_NM, downloader_preparers)
+            finally:
+                downloader_preparers.clear()
         print(f'{self._testMethodName} passed')
 
     @test_prepare()
@@ -322,6 +795,510 @@ class QueriesFormTests(TestCase):
         print(f'{self._testMethodName} passed')
 
 
+class SchedulerTests(TestCase):
+    @test_prepare()
+    def test_budget1(self) -> None:
+        budget = ProcessBudget(3, {DOWNLOADER_NM: 2})
+        running: list[str] = []
+        grants: list[str] = []
+        max_used = 0
+
+        async def run_one(params: CmdRunParams) -> None:
+            nonlocal max_used
+            await budget.acquire(params)
+            running.append(params.dwn)
+            grants.append(params.dwn)
+            max_used = max(max_used, budget.used)
+            await sleep(0.01)
+            running.remove(params.dwn)
+            budget.release(params)
+
+        async def run_all() -> None:
+            await gather(*(run_one(CmdRunParams('', dt, n, 4, '', n, 4)) for n in range(1, 5)
+                           for dt in (DOWNLOADER_RX, DOWNLOADER_RX, DOWNLOADER_NM, DOWNLOADER_RS)))
+
+        loop = new_event_loop()
+        loop.run_until_complete(run_all())
+        loop.close()
+        self.assertEqual(3, max_used)
+        self.assertEqual(0, budget.used)
+        self.assertEqual(16, len(grants))
+        self.assertLess(grants.index(DOWNLOADER_RS), 4)
+        self.assertLess(grants.index(DOWNLOADER_NM), 6)
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_retry_queue1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            Config.dest_logs_base = pathlib.Path(tempdir)
+            Config.query_retries = 1
+            Config.query_timeouts = {DOWNLOADER_RX: 1}
+            entry_path = pathlib.Path(tempdir) / 'dwn.py'
+            runs_path = pathlib.Path(tempdir) / 'runs.txt'
+            entry_path.write_text(
+                'import pathlib, sys\n'
+                f'runs_path = pathlib.Path({runs_path.as_posix()!r})\n'
+                'runs = runs_path.read_text().split() if runs_path.is_file() else []\n'
+                'runs_path.write_text(" ".join([*runs, sys.argv[1]]))\n'
+                'if sys.argv[1] == "q1" and "q1" not in runs:\n'
+                '    import time; time.sleep(60)\n')
+            queries = [Query([sys.executable, entry_path.as_posix(), f'q{n:d}'], f'q{n:d}') for n in (1, 2)]
+            params_list = [CmdRunParams(query, DOWNLOADER_RX, n, 2, 'IMAGES ', n, 2) for n, query in enumerate(queries, 1)]
+            status_path = pathlib.Path(tempdir) / 'status.json'
+            with mock.patch('r34wrapper.executor.RETRY_BACKOFF_BASE', 0):
+                run_test_cmds(params_list, status_path=status_path)
+            # failed query doesn't block the runner while waiting for retry
+            self.assertEqual(['q1', 'q2', 'q1'], runs_path.read_text().split())
+            self.assertEqual([(QUERY_OUTCOME_OK, 0, 2), (QUERY_OUTCOME_OK, 0, 1)],
+                             [(result.outcome, result.returncode, result.attempts) for result in run_results])
+            self.assertEqual(0, process_budget.val.used)
+            # retried query is completed once
+            status = json.loads(status_path.read_text(encoding=UTF8))
+            self.assertEqual((True, 2, 2, 3, []), tuple(status[k] for k in ('finished', 'completed', 'total', 'attempts', 'running')))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_budget2(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            Config.dest_logs_base = pathlib.Path(tempdir)
+            entry_path = pathlib.Path(tempdir) / 'dwn.py'
+            runs_path = pathlib.Path(tempdir) / 'runs.txt'
+            entry_path.write_text(
+                'import pathlib, sys, time\n'
+                f'logs_count = len(list(pathlib.Path({tempdir!r}).glob("log_*.log")))\n'
+                f'with open({runs_path.as_posix()!r}, "at") as runs_file:\n'
+                '    runs_file.write(f"{sys.argv[1]}:{logs_count:d} ")\n'
+                'time.sleep(0.2)\n')
+            queries = [Query([sys.executable, entry_path.as_posix(), f'q{n:d}'], f'q{n:d}') for n in (1, 2)]
+            params_list = [CmdRunParams(query, DOWNLOADER_RX, n, 2, 'IMAGES ', n, 2) for n, query in enumerate(queries, 1)]
+            run_test_cmds(params_list, concurrency=2, max_processes=1)
+            # query waiting for a budget slot is not started (no log file) yet
+            self.assertEqual(['q1:1', 'q2:2'], runs_path.read_text().split())
+            self.assertEqual(0, process_budget.val.used)
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_run_status1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            status_path = pathlib.Path(tempdir) / 'status.json'
+            params = CmdRunParams('', DOWNLOADER_RX, 1, 1, 'IMAGES ', 1, 1, 'a')
+            rstatus = RunStatus(status_path, 1)
+            for _ in range(2):
+                rstatus.attempt_started(params).on_line('line1')
+                rstatus.write()
+                status = json.loads(status_path.read_text(encoding=UTF8))
+                self.assertEqual((False, 0, 1), tuple(status[k] for k in ('finished', 'completed', 'total')))
+                running_keys = ('category', 'downloader', 'subfolder', 'query', 'last_line')
+                self.assertEqual([('IMAGES', DOWNLOADER_RX, 'a', '1/1', 'line1')],
+                                 [tuple(qs[k] for k in running_keys) for qs in status['running']])
+                rstatus.attempt_finished(params)
+            rstatus.query_completed()
+            rstatus.finish()
+            status = json.loads(status_path.read_text(encoding=UTF8))
+            self.assertEqual((True, 1, 1, 2, []), tuple(status[k] for k in ('finished', 'completed', 'total', 'attempts', 'running')))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_history1(self) -> None:
+        history = QueryHistory()
+        params_list = [CmdRunParams('', DOWNLOADER_RX, n, 4, 'IMAGES', n, 4, f's{n:d}') for n in range(1, 5)]
+        self.assertEqual(params_list, order_longest_first(params_list, history))
+        history.record(params_list[0], 10.0)
+        history.record(params_list[1], 30.0)
+        history.record(params_list[1], 50.0)
+        history.record(params_list[3], 20.0)
+        self.assertEqual(40.0, history.expected_duration(params_list[1]))
+        self.assertEqual(40.0, history.expected_duration(params_list[1]._replace(query='id:>=5 id:<=9')))
+        self.assertIsNone(history.expected_duration(params_list[2]))
+        self.assertEqual([params_list[i] for i in (2, 1, 3, 0)], order_longest_first(params_list, history))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_journal1(self) -> None:
+        params_list = [CmdRunParams(f'id:>={n:d}', DOWNLOADER_RX, n, 3, 'IMAGES', n, 3, '') for n in range(1, 4)]
+        with tempfile.TemporaryDirectory() as tempdir:
+            journal_path = pathlib.Path(tempdir) / 'journal.jsonl'
+            journal = RunJournal(journal_path, resume=False)
+            outcomes = (QUERY_OUTCOME_OK, QUERY_OUTCOME_STALLED, QUERY_OUTCOME_OK)
+            for params, outcome, returncode in zip(params_list, outcomes, (0, -15, 1), strict=True):
+                journal.query_started(params, 1)
+                journal.query_finished(params, outcome, returncode, 1.0)
+            journal.query_started(params_list[1], 2)
+            journal.close()
+            with open(journal_path, 'at', encoding=UTF8) as journal_file:
+                journal_file.write('{"event":"finish","ke')
+            journal = RunJournal(journal_path, resume=True)
+            self.assertEqual([True, False, False], [journal.is_completed(params) for params in params_list])
+            journal.query_finished(params_list[1], QUERY_OUTCOME_OK, 0, 1.0)
+            journal.close()
+            journal = RunJournal(journal_path, resume=True)
+            journal.close()
+            self.assertEqual(2, len(journal))
+            RunJournal(journal_path, resume=False).close()
+            journal = RunJournal(journal_path, resume=True)
+            journal.close()
+            self.assertEqual(0, len(journal))
+        print(f'{self._testMethodName} passed')
+
+
+class ExecutorTests(TestCase):
+    @test_prepare()
+    def test_output1(self) -> None:
+        loop = new_event_loop()
+        fut = loop.create_future()
+        log_file = StringIO()
+        protocol = QueryOutputProtocol(fut, log_file, 'rx01')
+        data = 'line 1\r\nстрока 2\npartial'.encode()
+        protocol.pipe_data_received(1, data[:12])
+        protocol.pipe_data_received(2, b'err\n')
+        protocol.pipe_data_received(1, data[12:])
+        self.assertEqual('line 1\nerr\nстрока 2\n', log_file.getvalue())
+        protocol.process_exited()
+        self.assertFalse(fut.done())
+        protocol.pipe_connection_lost(1, None)
+        protocol.pipe_connection_lost(2, None)
+        self.assertTrue(fut.done())
+        self.assertEqual('line 1\nerr\nстрока 2\npartial\n', log_file.getvalue())
+        loop.close()
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_log_writer1(self) -> None:
+        def legacy_trace(msg: str) -> None:  # formatted timestamp and line buffered write per message
+            ts = f'[{datetime_str_nfull()}] '
+            legacy_file.write(f'{ts}{msg.replace(chr(10), chr(10) + ts)}\n')
+        num_messages = 200000
+        messages = [f'[rx{n % 8:02d}] {n:d} {"x" * (n % 100)}' for n in range(num_messages)]
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(pathlib.Path(tempdir) / 'legacy.log', 'wt', encoding=UTF8, buffering=1) as legacy_file:
+                time_start = time.perf_counter()
+                for message in messages:
+                    legacy_trace(message)
+                legacy_time = time.perf_counter() - time_start
+            Config.dest_logs_base = pathlib.Path(tempdir)
+            trace('before logfile')
+            ensure_logfile()
+            time_start = time.perf_counter()
+            for message in messages:
+                trace(message)
+            flush_log()
+            batched_time = time.perf_counter() - time_start
+            log_lines = pathlib.Path(logfile.val.name).read_text(encoding=UTF8).splitlines()
+            close_logfile()
+        self.assertTrue(log_lines[0].endswith('] before logfile'))
+        self.assertEqual('#^^Buffered strings dumped^^#', log_lines[2])
+        self.assertEqual(len(messages), len(log_lines) - 4)
+        self.assertTrue(all(line[line.find('] ') + 2:] == message for line, message in zip(log_lines[4:], messages, strict=True)))
+        print(f'{num_messages:d} messages: legacy trace {legacy_time * 1000000 / num_messages:.2f} us, '
+              f'batched trace {batched_time * 1000000 / num_messages:.2f} us per message')
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_log_levels1(self) -> None:
+        params = CmdRunParams(Query(['python3', 'x'], 'x'), DOWNLOADER_RX, 2, 3, 'IMAGES ', 2, 3, 'sub1')
+        with tempfile.TemporaryDirectory() as tempdir:
+            Config.dest_logs_base = pathlib.Path(tempdir)
+            Config.log_json = True
+            Config.log_level = LOG_LEVELS['debug']
+            ensure_logfile()
+            set_run_phase(RUN_PHASE_EXECUTE)
+            trace('Error: e1')
+            trace('  Warning: w1')
+            trace('i1', params=params)
+            trace('d1', level=LOG_LEVEL_DEBUG)
+            trace('[rx02] t1', level=LOG_LEVEL_TRACE, params=params)
+            flush_log()
+            log_lines = pathlib.Path(logfile.val.name).read_text(encoding=UTF8).splitlines()
+            records = [json.loads(line) for line in pathlib.Path(json_logfile.val.name).read_text(encoding=UTF8).splitlines()]
+            close_logfile()
+        self.assertEqual(['Error: e1', '  Warning: w1', 'i1', 'd1'], [line[line.find('] ') + 2:] for line in log_lines])
+        self.assertEqual(['error', 'warn', 'info', 'debug'], [record['level'] for record in records])
+        self.assertEqual(['Error: e1', '  Warning: w1', 'i1', 'd1'], [record['msg'] for record in records])
+        self.assertTrue(all(record['phase'] == RUN_PHASE_EXECUTE for record in records))
+        self.assertEqual({'category': 'IMAGES', 'downloader': DOWNLOADER_RX, 'query': 2, 'sub': 'sub1'},
+                         {k: v for k, v in records[2].items() if k not in ('time', 'level', 'phase', 'msg')})
+        self.assertNotIn('category', records[0])
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_title_index1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            Config.dest_logs_base = pathlib.Path(tempdir)
+            Config.title, Config.title_increment = 'tt', 3
+            (Config.dest_logs_base / 'log_tt005_2026-01-01_00_00_00.log').touch()
+            (Config.dest_logs_base / 'log_tt041_2026-01-01_00_00_00.log').touch()
+            ensure_logfile()
+            self.assertEqual('tt042', Config.full_title)
+            index_path = Config.dest_logs_base / '.title_tt.index'
+            index = json.loads(index_path.read_text(encoding=UTF8))
+            self.assertEqual({'title': 'tt', 'suffix': '042', 'log': pathlib.Path(logfile.val.name).name}, index)
+            (Config.dest_logs_base / 'log_tt041_2026-01-01_00_00_00.log').unlink()
+            calculate_title_suffix(index)
+            self.assertEqual('043', Config.title_increment_value)
+            calculate_title_suffix({'title': 'tt', 'suffix': '0099', 'log': 'log_tt0099_2026-01-01_00_00_00.log'})
+            self.assertEqual('043', Config.title_increment_value)
+            calculate_title_suffix({**index, 'title': 'ttt'})
+            self.assertEqual('043', Config.title_increment_value)
+            (Config.dest_logs_base / 'log_tt0099_2026-01-01_00_00_00.log').touch()
+            calculate_title_suffix({'title': 'tt', 'suffix': '0099', 'log': 'log_tt0099_2026-01-01_00_00_00.log'})
+            self.assertEqual('0100', Config.title_increment_value)
+            close_logfile()
+            self.assertFalse(index_path.exists())
+            Config.debug, Config.title_increment_value = True, ''
+            ensure_logfile()
+            self.assertEqual(('tt0100', 'log.log'), (Config.full_title, pathlib.Path(logfile.val.name).name))
+            self.assertFalse(index_path.exists())
+            close_logfile()
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_log_compression1(self) -> None:
+        lines = [f'[{n:d}/500] Saving post {1000000 + n:d} ({"tag " * (n % 7)})...' for n in range(500)]
+        with tempfile.TemporaryDirectory() as tempdir:
+            log_path = pathlib.Path(tempdir) / 'log_rx01_a01.log.gz'
+            self.assertIs(LOG_CODECS['gzip'], codec_for_path(log_path))
+            self.assertIsNone(codec_for_path(log_path.with_suffix('')))
+            reader = LogReader(log_path)
+            with open_log_file(log_path, codec_for_path(log_path)) as log_file:
+                log_file.write(''.join(f'{line}\n' for line in lines[:300]))
+                log_file.flush()
+                self.assertEqual(lines[:300], reader.read().splitlines())
+                log_file.write(''.join(f'{line}\n' for line in lines[300:]))
+            self.assertEqual(lines[300:], reader.read().splitlines())
+            self.assertEqual('', reader.read())
+            text_size = sum(len(line) + 1 for line in lines)
+            self.assertLess(log_path.stat().st_size * 5, text_size)
+            with open(log_path, 'ab') as log_file:
+                log_file.write(gzip.compress('appended\npartial'.encode(UTF8)))
+            self.assertEqual([f'{lines[-1]}\n', 'appended\n', 'partial'], tail_log(LogReader(log_path), 3))
+            plain_path = log_path.with_suffix('')
+            plain_path.write_text('a\nb\nc\n', encoding=UTF8)
+            self.assertEqual(['b\n', 'c\n'], tail_log(LogReader(plain_path), 2))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_log_compression2(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            Config.dest_logs_base = pathlib.Path(tempdir)
+            Config.log_compression = 'gzip'
+            missing_path = pathlib.Path(tempdir) / 'missing_executable'
+            params = CmdRunParams(Query([missing_path.as_posix(), 'dwn.py', 'q1'], 'q1'), DOWNLOADER_RX, 1, 1, 'IMAGES ', 1, 1)
+            with self.assertRaises(OSError):
+                run_test_cmds([params])
+            # query which failed to start is still recorded, its compressed log is complete
+            self.assertEqual(1, len(run_results))
+            result = run_results[0]
+            self.assertTrue(result.failed)
+            self.assertEqual((1, True), (result.attempts, bool(result.end_time)))
+            log_paths = list(pathlib.Path(tempdir).glob('log_*.log.gz'))
+            self.assertEqual(1, len(log_paths))
+            self.assertEqual(log_paths[0].stat().st_size, result.log_size)
+            self.assertIn('Executing \'IMAGES :rx\' query 1 / 1', gzip.decompress(log_paths[0].read_bytes()).decode(UTF8))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_terminate1(self) -> None:
+        async def run_and_terminate() -> None:
+            fut = loop.create_future()
+            tr, _ = await loop.subprocess_exec(lambda: QueryOutputProtocol(fut, StringIO(), 'rx01'),
+                                               sys.executable, '-c', 'import time; time.sleep(60)', **new_process_group_kwargs())
+            await terminate_process_group(tr.get_pid(), fut)
+            self.assertTrue(fut.done())
+            tr.close()
+        loop = new_event_loop()
+        start_time = time.monotonic()
+        loop.run_until_complete(run_and_terminate())
+        loop.close()
+        self.assertLess(time.monotonic() - start_time, 30.0)
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_result1(self) -> None:
+        result = CmdRunResult(CmdRunParams('id:>=1', DOWNLOADER_RX, 1, 1, 'IMAGES ', 1, 1, 'a'))
+        self.assertTrue(result.failed)
+        self.assertEqual('not finished', result.to_json()['outcome'])
+        result.outcome, result.returncode = QUERY_OUTCOME_OK, 0
+        self.assertFalse(result.failed)
+        result.returncode = 1
+        self.assertTrue(result.failed)
+        result.outcome, result.returncode = QUERY_OUTCOME_STALLED, None
+        self.assertTrue(result.failed)
+        self.assertEqual(('IMAGES', 'a', None), tuple(result.to_json()[k] for k in ('category', 'subfolder', 'rc')))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_runner_cache1(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            runner_dir = pathlib.Path(tempdir) / 'dwn'
+            (runner_dir / 'src').mkdir(parents=True)
+            (runner_dir / '__main__.py').write_text('')
+            fingerprint1 = path_fingerprint(runner_dir.as_posix())
+            self.assertEqual(fingerprint1, path_fingerprint(runner_dir.as_posix()))
+            (runner_dir / 'src' / 'version.py').write_text('APP_VERSION = \'1.0\'')
+            fingerprint2 = path_fingerprint(runner_dir.as_posix())
+            self.assertNotEqual(fingerprint1, fingerprint2)
+            cache_path = pathlib.Path(tempdir) / 'cache.json'
+            runner_cache = RunnerCache(cache_path)
+            self.assertFalse(runner_cache.is_valid('rx_download:dwn', fingerprint2))
+            runner_cache.store('rx_download:dwn', fingerprint2)
+            runner_cache.save()
+            self.assertTrue(RunnerCache(cache_path).is_valid('rx_download:dwn', fingerprint2))
+            self.assertFalse(RunnerCache(cache_path).is_valid('rx_download:dwn', fingerprint1))
+            self.assertFalse(RunnerCache(cache_path, load=False).is_valid('rx_download:dwn', fingerprint2))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_runner_cache2(self) -> None:
+        self.assertEqual(pathlib.Path(sys.prefix).resolve(), python_prefix(sys.executable).resolve())
+        with tempfile.TemporaryDirectory() as tempdir:
+            venv_pythons: list[str] = []
+            for venv_name in ('venv1', 'venv2'):
+                venv_dir = pathlib.Path(tempdir) / venv_name
+                venv.create(venv_dir, with_pip=False)
+                venv_pythons.append(subprocess.check_output(
+                    [venv_dir / ('Scripts' if system() == 'Windows' else 'bin') / 'python', '-c', 'import sys; print(sys.executable)'],
+                    text=True).strip())
+                venv_prefix = subprocess.check_output([venv_pythons[-1], '-c', 'import sys; print(sys.prefix)'], text=True).strip()
+                self.assertEqual(pathlib.Path(venv_prefix).resolve(), python_prefix(venv_pythons[-1]).resolve())
+            self.assertNotEqual(python_fingerprint(venv_pythons[0]), python_fingerprint(venv_pythons[1]))
+            self.assertNotEqual(python_fingerprint(sys.executable), python_fingerprint(venv_pythons[0]))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_runner_probes1(self) -> None:
+        def make_runner(name: str, version: str, returncode: int) -> str:
+            runner_dir = temp_path / name
+            runner_dir.mkdir()
+            # every probe waits for all of them to start, so sequential probes would fail
+            (runner_dir / '__main__.py').write_text(
+                'import pathlib, sys, time\n'
+                f'marks_dir = pathlib.Path({marks_dir.as_posix()!r})\n'
+                f'(marks_dir / {name!r}).touch()\n'
+                'wait_until = time.monotonic() + 10\n'
+                f'while len(list(marks_dir.iterdir())) < {len(runners):d}:\n'
+                '    assert time.monotonic() < wait_until\n'
+                '    time.sleep(0.01)\n'
+                f'print("starting...\\n{version}")\n'
+                f'sys.exit({returncode:d})\n')
+            return runner_dir.as_posix()
+
+        def validate(queries: Queries) -> None:
+            for marks_file in marks_dir.iterdir():
+                marks_file.unlink()
+            _validated_runners.clear()
+            Config.test = False
+            try:
+                _validate_runners(queries, RunnerCache(None))
+            finally:
+                Config.test = True
+        validated_before = _validated_runners.copy()
+        try:
+            with tempfile.TemporaryDirectory() as tempdir:
+                temp_path = pathlib.Path(tempdir)
+                marks_dir = temp_path / 'marks'
+                marks_dir.mkdir()
+                Config.python = sys.executable
+                Config.downloaders = DOWNLOADERS
+                Config.update = True
+                runners = {DOWNLOADER_RX: ('ruxx', 'Ruxx 1.0', 0), DOWNLOADER_NM: ('nm', 'NM 1.0', 0), DOWNLOADER_RV: ('rv', 'RV 1.0', 0)}
+                runner_paths = {dt: make_runner(*runner) for dt, runner in runners.items()}
+                queries = Queries()
+                for cat in ('IMAGES', 'VIDEOS'):
+                    queries.sequences_paths.add_category(cat)
+                    queries.sequences_paths[cat][DOWNLOADER_RX] = runner_paths[DOWNLOADER_RX]
+                    queries.sequences_paths[cat][DOWNLOADER_NM] = runner_paths[DOWNLOADER_NM]
+                queries.sequences_paths_update[DOWNLOADER_RV] = runner_paths[DOWNLOADER_RV]
+                queries.sequences_paths_update[DOWNLOADER_RX] = runner_paths[DOWNLOADER_RX]
+                # same path is probed once
+                self.assertEqual([('nm_download', DOWNLOADER_NM, 'downloader', runner_paths[DOWNLOADER_NM], ' (IMAGES)'),
+                                  ('rx_download', DOWNLOADER_RX, 'downloader', runner_paths[DOWNLOADER_RX], ' (IMAGES)'),
+                                  ('rv_update', DOWNLOADER_RV, 'updater', runner_paths[DOWNLOADER_RV], '')],
+                                 _collect_version_probes(queries))
+                validate(queries)
+                self.assertEqual({'python', 'rx_download', 'nm_download', 'rv_update', 'all'}, _validated_runners)
+                self.assertEqual({runner[0] for runner in runners.values()}, {mark.name for mark in marks_dir.iterdir()})
+                failing_path = pathlib.Path(runner_paths[DOWNLOADER_NM]) / '__main__.py'
+                failing_path.write_text(failing_path.read_text().replace('sys.exit(0)', 'sys.exit(1)'))
+                with self.assertRaises(OSError):
+                    validate(queries)
+                self.assertNotIn('nm_download', _validated_runners)
+                self.assertNotIn('all', _validated_runners)
+        finally:
+            _validated_runners.clear()
+            _validated_runners.update(validated_before)
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_maxids1(self) -> None:
+        results = fetch_maxids_async({DOWNLOADER_RX: [sys.executable, '-c', 'print("starting...\\nRX: 12345")']})
+        self.assertEqual({DOWNLOADER_RX: '12345'}, results)
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache_path = pathlib.Path(tempdir) / 'maxids.json'
+            maxid_cache = MaxIdCache(cache_path)
+            self.assertIsNone(maxid_cache.get('rx|'))
+            maxid_cache.put('rx|', '12345')
+            maxid_cache.save()
+            self.assertEqual('12345', MaxIdCache(cache_path).get('rx|'))
+            self.assertIsNone(MaxIdCache(cache_path).get('rx|127.0.0.1:1080'))
+            self.assertIsNone(MaxIdCache(cache_path, ttl=0).get('rx|'))
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_worker1(self) -> None:
+        async def run_queries() -> list[tuple[int | None, bytes]]:
+            pool = WorkerPool(env={**os.environ, 'PYTHONPATH': lib_dir.as_posix()})
+            results: list[tuple[int | None, bytes]] = []
+            for args in (['a', 'b'], ['c'], ['exit']):
+                worker = await pool.acquire(sys.executable, entry_dir.as_posix())
+                output = bytearray()
+                rc = await worker.run_query(args, output.extend)
+                results.append((rc, bytes(output)))
+                pool.release(worker)
+            self.assertEqual(1, len(pool.pids))
+            await pool.close()
+            self.assertEqual(0, len(pool.pids))
+            return results
+        with tempfile.TemporaryDirectory() as tempdir:
+            entry_dir = pathlib.Path(tempdir) / 'dwn'
+            entry_dir.mkdir()
+            lib_dir = pathlib.Path(tempdir) / 'lib'
+            lib_dir.mkdir()
+            (entry_dir / 'counter.py').write_text('runs = 0\n')
+            (lib_dir / 'lib_counter.py').write_text('runs = 0\n')
+            (entry_dir / '__main__.py').write_text(
+                'import sys\nimport counter\nimport lib_counter\ncounter.runs += 1\nlib_counter.runs += 1\n'
+                'print(counter.runs, lib_counter.runs, *sys.argv[1:])\n'
+                'print("err", file=sys.stderr)\nsys.exit(3 if sys.argv[1:] == ["exit"] else 0)\n')
+            loop = new_event_loop()
+            results = loop.run_until_complete(run_queries())
+            loop.close()
+        # downloader modules are reloaded for every query, dependencies are not
+        self.assertEqual([(0, b'1 1 a b\nerr\n'), (0, b'1 2 c\nerr\n'), (3, b'1 3 exit\nerr\n')], results)
+        print(f'{self._testMethodName} passed')
+
+    @test_prepare()
+    def test_worker2(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            Config.dest_logs_base = Config.dest_run_base = pathlib.Path(tempdir)
+            Config.worker_downloaders = (DOWNLOADER_NM,)
+            Config.max_cmd_len = 20
+            entry_dir = pathlib.Path(tempdir) / 'dwn'
+            entry_dir.mkdir()
+            (entry_dir / '__main__.py').write_text(
+                'import sys\nassert sys.argv[1:3] == ["file", "-path"]\n'
+                'print(open(sys.argv[3]).read().replace(chr(10), " "))\n')
+            queries = [Query([sys.executable, entry_dir.as_posix(), '-tags', f'long_tag_{n:d}'], f'python dwn long_tag_{n:d}')
+                       for n in (1, 2)]
+            params_list = [CmdRunParams(query, DOWNLOADER_NM, n, 2, 'VIDEOS ', n, 2) for n, query in enumerate(queries, 1)]
+            worker_pids = run_test_cmds(params_list, workers=True)
+            self.assertEqual(1, len(worker_pids))
+            self.assertEqual([(QUERY_OUTCOME_OK, 0)] * 2, [(result.outcome, result.returncode) for result in run_results])
+            log_texts = [path.read_text(encoding=UTF8) for path in sorted(pathlib.Path(tempdir).glob('log_nm*.log'))]
+            self.assertEqual(2, len(log_texts))
+            self.assertTrue(all(f'-tags long_tag_{n:d}' in log_text for n, log_text in zip((1, 2), log_texts, strict=True)))
+        print(f'{self._testMethodName} passed')
+
+
 class RunTests(TestCase):
     @test_prepare()
     def test_main1(self) -> None:
@@ -66,6 +66,19 @@ def valid_downloaders_list(downloaders_str: str) -> tuple[str, ...]:
         raise ArgumentError
 
 
+def valid_downloaders_dict(values: dict[str, int], value_name: str, *, lb: int) -> dict[str, int]:
+    invalid_dts: list[str] = []
+    for dt, value in values.items():
+        if dt not in DOWNLOADERS:
+            invalid_dts.append(dt)
+            trace(f'Error: invalid downloader type: \'{dt}\'')
+        elif not isinstance(value, int) or value < lb:
+            invalid_dts.append(dt)
+            trace(f'Error: invalid {dt} {value_name} value: \'{value!s}\'')
+    assert not invalid_dts, f'Invalid {value_name} value(s): {values!s}'
+    return values
+
+
 def valid_categories_list(categories_str: str) -> list[str]:
     try:
         listed_categories: list[str] = []
@@ -0,0 +1,142 @@
+# coding=UTF-8
+"""
+Author: trickerer (https://github.com/trickerer, https://github.com/trickerer01)
+"""
+#########################################
+#
+#
+
+import asyncio
+import json
+import pathlib
+from asyncio import create_subprocess_exec, wait_for
+from asyncio.subprocess import PIPE, Process
+from collections.abc import Callable
+
+from ._worker import SENTINEL
+from .defs import UTF8
+
+__all__ = ('QueryWorker', 'WorkerPool')
+
+WORKER_SCRIPT_PATH = pathlib.Path(__file__).parent / '_worker.py'
+WORKER_READ_CHUNK_SIZE = 64 * 1024
+WORKER_CLOSE_TIMEOUT = 5.0
+SENTINEL_MARK = f'\n{SENTINEL} '.encode(UTF8)
+
+
+class QueryWorker:
+    """
+    Long-lived child process which runs queries of a single downloader in-process (see _worker.py),
+    so interpreter startup and downloader imports are paid once instead of once per query
+    """
+    def __init__(self, key: tuple[str, str], proc: Process) -> None:
+        self.key = key
+        self._proc = proc
+        self._buffer = b''
+
+    @staticmethod
+    async def start(python: str, entry_path: str, **kwargs) -> 'QueryWorker':
+        proc = await create_subprocess_exec(python, WORKER_SCRIPT_PATH.as_posix(), entry_path, stdin=PIPE, stdout=PIPE, **kwargs)
+        return QueryWorker((python, entry_path), proc)
+
+    @property
+    def pid(self) -> int:
+        return self._proc.pid
+
+    @property
+    def alive(self) -> bool:
+        return self._proc.returncode is None
+
+    async def run_query(self, args: list[str], on_output: Callable[[bytes], None]) -> int | None:
+        """
+        Run query with **args**, **on_output(bytes)** receives query output as it arrives.
+        Returns query exit code or None if worker process died (its exit code is then available via **returncode**)
+        """
+        self._proc.stdin.write(f'{json.dumps(args, ensure_ascii=False)}\n'.encode(UTF8))
+        await self._proc.stdin.drain()
+        self._buffer = b''
+        while True:
+            chunk = await self._proc.stdout.read(WORKER_READ_CHUNK_SIZE)
+            if not chunk:
+                if self._buffer:
+                    on_output(self._buffer)
+                await self._proc.wait()
+                return None
+            self._buffer += chunk
+            mark_idx = self._buffer.find(SENTINEL_MARK)
+            if mark_idx >= 0:
+                rc_end = self._buffer.find(b'\n', mark_idx + len(SENTINEL_MARK))
+                if rc_end >= 0:
+                    if mark_idx:
+                        on_output(self._buffer[:mark_idx])
+                    rc = int(self._buffer[mark_idx + len(SENTINEL_MARK):rc_end])
+                    self._buffer = b''
+                    return rc
+                continue
+            keep_len = len(SENTINEL_MARK) - 1
+            if len(self._buffer) > keep_len:
+                on_output(self._buffer[:-keep_len])
+                self._buffer = self._buffer[-keep_len:]
+
+    @property
+    def returncode(self) -> int | None:
+        return self._proc.returncode
+
+    async def kill(self) -> None:
+        if self.alive:
+            self._proc.kill()
+            await self._proc.wait()
+
+    async def close(self) -> None:
+        if self.alive:
+            self._proc.stdin.close()
+            try:
+                await wait_for(self._proc.wait(), WORKER_CLOSE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._proc.kill()
+                await self._proc.wait()
+
+
+class WorkerPool:
+    """Idle query workers per (python, downloader path). Workers are started on demand, so pool size follows concurrency"""
+    def __init__(self, **kwargs) -> None:
+        self._start_kwargs = kwargs
+        self._idle: dict[tuple[str, str], list[QueryWorker]] = {}
+        self._all: set[QueryWorker] = set()
+
+    async def acquire(self, python: str, entry_path: str) -> QueryWorker:
+        idle_workers = self._idle.get((python, entry_path))
+        while idle_workers:
+            worker = idle_workers.pop()
+            if worker.alive:
+                return worker
+            self._all.discard(worker)
+        worker = await QueryWorker.start(python, entry_path, **self._start_kwargs)
+        self._all.add(worker)
+        return worker
+
+    def release(self, worker: QueryWorker) -> None:
+        if worker.alive:
+            self._idle.setdefault(worker.key, []).append(worker)
+        else:
+            self._all.discard(worker)
+
+    async def discard(self, worker: QueryWorker) -> None:
+        """Remove **worker** from pool, killing it if it's still alive"""
+        self._all.discard(worker)
+        await worker.kill()
+
+    @property
+    def pids(self) -> list[int]:
+        return [worker.pid for worker in self._all if worker.alive]
+
+    async def close(self) -> None:
+        workers = list(self._all)
+        self._all.clear()
+        self._idle.clear()
+        for worker in workers:
+            await worker.close()
+
+#
+#
+#########################################